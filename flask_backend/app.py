@@ -1,9 +1,9 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, redirect, request, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import shutil
-from werkzeug.utils import secure_filename
+import time
+import uuid
 
 # Load environment variables
 load_dotenv()
@@ -16,18 +16,38 @@ from upload_and_summary.landmark_detection import (
 )
 from upload_and_summary.summary_generator import get_openai_summary, generate_audio_summary
 from upload_and_summary.places import find_nearby_places
-from upload_and_summary.map_generator import generate_custom_leaflet_map_from_api_output
+from upload_and_summary.map_generator import render_leaflet_map_html
+from upload_and_summary.map_cache import (
+    MapRenderCache, map_key, etag_for, if_none_match, map_headers, tile_map_input, with_origin
+)
+from upload_and_summary.places_cache import geohash_encode, tile_center_and_half_diagonal_m
+from upload_and_summary.tts import audio_extension
+from upload_and_summary.audio_store import AUDIO_CACHE_CONTROL, audio_url, get_audio_store, media_type_for
+from upload_and_summary.artifact_store import ArtifactCollector, artifact_stats, get_store
+from upload_and_summary.upload_stream import MAX_UPLOAD_BYTES, UPLOAD_PERSIST, persist_upload
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Rendered maps are kept in memory instead of one shared leaflet_map.html
+map_cache = MapRenderCache()
+# Generated audio, addressed by content id rather than by a client-supplied path
+audio_store = get_audio_store()
+# Kept photos get the "images" retention; a background thread enforces both stores' limits
+image_store = get_store("images")
+artifact_gc = ArtifactCollector()
+
 def create_app():
     app = Flask(__name__)
     app.secret_key = os.getenv('SECRET_KEY')
+    # Werkzeug answers 413 as soon as the body is known to exceed this
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024
     
     # Enable CORS for Next.js frontend
     CORS(app, resources={r"/*": {"origins": os.getenv('FRONTEND_URL')}}, supports_credentials=True)
     
+    artifact_gc.start()
+
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
     
@@ -41,15 +61,17 @@ def create_app():
             return jsonify({"error": "No image provided"}), 400
         
         image = request.files['image']
-        filename = secure_filename(image.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        image.save(file_path)
+        data = image.read()
+        if len(data) > MAX_UPLOAD_BYTES:
+            return jsonify({"error": "Image too large"}), 413
+        if UPLOAD_PERSIST:
+            persist_upload(data, image_store, image.filename)
 
-        vision_result = detect_landmark_google_vision(file_path)
+        vision_result = detect_landmark_google_vision(data)
         if vision_result:
             return jsonify(vision_result)
 
-        predicted, lat, lng = predict_landmark_custom_model(file_path)
+        predicted, lat, lng = predict_landmark_custom_model(data)
         return jsonify({"name": predicted, "lat": lat, "lng": lng})
 
     @app.route('/generate_summary/', methods=['POST'])
@@ -61,16 +83,39 @@ def create_app():
             return jsonify({"error": "Landmark name is required"}), 400
             
         summary = get_openai_summary(landmark, language)
-        audio_path = f"{UPLOAD_FOLDER}/summary_{landmark}_{language}.mp3"
-        audio_file = generate_audio_summary(summary, language, save_path=audio_path)
-        return jsonify({"summary": summary, "audio_file": audio_path})
+        tmp_path = os.path.join(audio_store.root, f"{uuid.uuid4().hex}.{audio_extension()}.tmp")
+        audio_file = generate_audio_summary(summary, language, save_path=tmp_path)
+        if audio_file != tmp_path:
+            return jsonify({"summary": summary, "audio_file": None, "error": audio_file})
+        audio_id = audio_store.put_file(tmp_path, audio_extension())
+        return jsonify({"summary": summary, "audio_id": audio_id, "audio_url": audio_url(audio_id),
+                        "audio_file": audio_store.path(audio_id)})
+
+    @app.route('/audio/<audio_id>')
+    def get_audio(audio_id):
+        path = audio_store.path(audio_id)
+        if path is None:
+            return jsonify({"error": "Audio not found"}), 404
+        # conditional=True answers Range and If-None-Match from the file itself
+        try:
+            response = send_file(path, mimetype=media_type_for(audio_id), conditional=True, etag=audio_id)
+        except FileNotFoundError:
+            # Deleted by the collector since path() found it
+            return jsonify({"error": "Audio not found"}), 404
+        response.headers["Cache-Control"] = AUDIO_CACHE_CONTROL
+        return response
+
+    @app.route('/artifacts/stats')
+    def artifacts_stats():
+        return jsonify(artifact_stats())
 
     @app.route('/download_audio/')
     def download_audio():
-        path = request.args.get('path')
-        if not path:
-            return jsonify({"error": "Path is required"}), 400
-        return send_file(path)
+        # Deprecated: only the path of a stored audio file resolves, as a redirect to /audio/<id>
+        audio_id = os.path.basename(request.args.get('path') or "")
+        if audio_store.path(audio_id) is None:
+            return jsonify({"error": "Audio not found"}), 404
+        return redirect(audio_url(audio_id), code=308)
 
     @app.route('/nearby_places/')
     def nearby_places():
@@ -83,11 +128,24 @@ def create_app():
     def generate_map():
         lat = float(request.args.get('lat'))
         lng = float(request.args.get('lng'))
+        started = time.perf_counter()
         results = find_nearby_places(lat, lng)
-        map_ = generate_custom_leaflet_map_from_api_output(results)
-        map_path = f"{UPLOAD_FOLDER}/leaflet_map.html"
-        map_.save(map_path)
-        return send_file(map_path)
+        places_s = time.perf_counter() - started
+        # One rendered page per tile and POI set; the caller's position is spliced in
+        tile = geohash_encode(lat, lng)
+        key = map_key(tile, results["nearby_places"])
+        headers = map_headers(etag_for(key, "html", (lat, lng)), places_s, 0.0)
+        if if_none_match(request.headers.get("If-None-Match"), headers["ETag"]):
+            return Response(status=304, headers=headers)
+        html = map_cache.get(key)
+        if html is None:
+            started = time.perf_counter()
+            center = tile_center_and_half_diagonal_m(tile)[:2]
+            html = render_leaflet_map_html(tile_map_input(center, results["nearby_places"]), False).encode("utf-8")
+            render_s = time.perf_counter() - started
+            map_cache.put(key, html, render_s)
+            headers = map_headers(headers["ETag"], places_s, render_s)
+        return Response(with_origin(html, lat, lng), mimetype="text/html", headers=headers)
     
     return app
 
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# How long a resolved user row is trusted before Supabase is asked again
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+class UserCache:
+    """
+    user_id -> users row, kept for `ttl` seconds (LRU bounded). Writers call
+    `invalidate` after changing a user so the next request reads it fresh.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() >= entry[0]:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            # Copy, so a handler editing its user dict cannot change the cache
+            return dict(entry[1])
+
+    def set(self, user_id: str, user: Dict[str, Any]):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def get_or_load(self, user_id: str, load: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Cached row, or `load(user_id)` on a miss; a None result is not cached."""
+        user = self.get(user_id)
+        if user is None:
+            user = load(user_id)
+            if user is not None:
+                self.set(user_id, user)
+        return user
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+class TokenCache:
+    """Verified JWT -> decoded payload, remembered until the token's `exp`."""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, token: str, verify: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Memoized `verify(token)`; invalid tokens are never cached."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                if now < entry[0]:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    # Copy, so a handler adding fields to its payload cannot change the cache
+                    return dict(entry[1])
+                del self._entries[token]
+            self.misses += 1
+
+        payload = verify(token)
+        if payload and isinstance(payload.get("exp"), (int, float)) and payload["exp"] > now:
+            with self._lock:
+                self._entries[token] = (payload["exp"], dict(payload))
+                self._entries.move_to_end(token)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+user_cache = UserCache()
+token_cache = TokenCache()
@@ -1,13 +1,14 @@
 import os
 import json
-import requests
 from flask import current_app, request, redirect, url_for
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 
+from .cache import user_cache, token_cache
+from .oidc import OIDC_HTTP_TIMEOUT, get_google_provider_cfg, verify_google_id_token
+from .oidc import session as oidc_session
+
 # Supabase client setup
 from supabase import create_client, Client
 
@@ -15,9 +16,6 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
 
-def get_google_provider_cfg():
-    return requests.get(os.getenv("GOOGLE_DISCOVERY_URL")).json()
-
 def get_google_auth_url():
     # Get Google provider configuration
     google_provider_cfg = get_google_provider_cfg()
@@ -50,13 +48,12 @@ def process_google_callback():
     }
     
     # Exchange auth code for tokens
-    token_response = requests.post(token_url, data=data)
+    token_response = oidc_session.post(token_url, data=data, timeout=OIDC_HTTP_TIMEOUT)
     token_json = token_response.json()
     
     # Get user info
-    id_info = id_token.verify_oauth2_token(
+    id_info = verify_google_id_token(
         token_json['id_token'],
-        google_requests.Request(),
         os.getenv('GOOGLE_CLIENT_ID')
     )
     
@@ -95,6 +92,7 @@ def create_or_update_user(user_info):
         }
         
         supabase.table('users').update(update_data).eq('user_id', user_id).execute()
+        user_cache.invalidate(user_id)
         return response.data[0]
     else:
         # Create new user
@@ -127,6 +125,10 @@ def verify_auth_token(token):
     except:
         return None
 
+def fetch_user(user_id):
+    response = supabase.table('users').select('*').eq('user_id', user_id).execute()
+    return response.data[0] if response.data else None
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -140,18 +142,16 @@ def token_required(f):
         if not token:
             return {'message': 'Token is missing'}, 401
         
-        # Verify token
-        data = verify_auth_token(token)
+        # Verify token (memoized until it expires)
+        data = token_cache.verify(token, verify_auth_token)
         if not data:
             return {'message': 'Invalid token'}, 401
         
-        # Get user from database
-        response = supabase.table('users').select('*').eq('user_id', data['user_id']).execute()
-        if len(response.data) == 0:
+        # Get user from the identity cache, falling back to the database
+        current_user = user_cache.get_or_load(data['user_id'], fetch_user)
+        if current_user is None:
             return {'message': 'User not found'}, 401
         
-        current_user = response.data[0]
-        
         return f(current_user, *args, **kwargs)
     
     return decorated
\ No newline at end of file
@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from google.auth import jwt as google_jwt
+
+GOOGLE_DISCOVERY_URL = os.getenv("GOOGLE_DISCOVERY_URL", "https://accounts.google.com/.well-known/openid-configuration")
+# PEM certificates used to sign Google ID tokens (what verify_oauth2_token fetches)
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = tuple(os.getenv("GOOGLE_ISSUERS", "accounts.google.com,https://accounts.google.com").split(","))
+# Used when a response carries no Cache-Control max-age
+OIDC_DEFAULT_MAX_AGE = float(os.getenv("OIDC_DEFAULT_MAX_AGE", "3600"))
+# Refresh in the background once this fraction of the lifetime has passed
+OIDC_REFRESH_AHEAD = float(os.getenv("OIDC_REFRESH_AHEAD", "0.8"))
+OIDC_HTTP_TIMEOUT = float(os.getenv("OIDC_HTTP_TIMEOUT", "10"))
+
+# One connection pool for discovery, certs and the token exchange
+session = requests.Session()
+
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+def cache_lifetime(headers, default: float = OIDC_DEFAULT_MAX_AGE) -> float:
+    """Seconds a response may be reused, from Cache-Control (no-store/no-cache -> 0)."""
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        age = float(headers.get("Age", "0") or 0)
+        return max(0.0, float(match.group(1)) - age)
+    return default
+
+class CachedDocument:
+    """
+    A JSON document fetched over HTTP and reused for its Cache-Control
+    lifetime. Callers past `refresh_ahead` of the lifetime still get the
+    cached copy while one background thread refreshes it; only a missing or
+    expired document blocks, and concurrent callers share that one fetch.
+    If a refresh fails, the stale copy keeps being served.
+    """
+
+    def __init__(self, url: Callable[[], str], refresh_ahead: float = OIDC_REFRESH_AHEAD):
+        self.url = url
+        self.refresh_ahead = refresh_ahead
+        self._value: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.fetches = 0
+        self.hits = 0
+        self.last_error: Optional[str] = None
+
+    def _fetch(self) -> Dict[str, Any]:
+        response = session.get(self.url(), timeout=OIDC_HTTP_TIMEOUT)
+        response.raise_for_status()
+        value = response.json()
+        now = time.monotonic()
+        self._value = value
+        self._fetched_at = now
+        self._expires_at = now + cache_lifetime(response.headers)
+        self.fetches += 1
+        self.last_error = None
+        return value
+
+    def get(self, force_refresh: bool = False) -> Dict[str, Any]:
+        now = time.monotonic()
+        value = self._value
+        if value is not None and not force_refresh and now < self._expires_at:
+            self.hits += 1
+            refresh_at = self._fetched_at + (self._expires_at - self._fetched_at) * self.refresh_ahead
+            if now >= refresh_at and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return value
+
+        with self._lock:
+            # Another caller may have fetched while we waited for the lock
+            if self._value is not None and time.monotonic() < self._expires_at and \
+                    (not force_refresh or self._fetched_at > now):
+                self.hits += 1
+                return self._value
+            try:
+                return self._fetch()
+            except Exception as e:
+                self.last_error = str(e)
+                if self._value is not None:
+                    print(f"OIDC refresh of {self.url()} failed, serving stale copy: {e}")
+                    return self._value
+                raise
+
+    def _refresh(self):
+        try:
+            with self._lock:
+                self._fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"OIDC background refresh of {self.url()} failed: {e}")
+        finally:
+            self._refreshing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url(),
+            "cached": self._value is not None,
+            "expires_in_s": round(max(0.0, self._expires_at - time.monotonic()), 1) if self._value else None,
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "last_error": self.last_error,
+        }
+
+# URLs are read at fetch time so tests can point them at a stub server
+discovery_cache = CachedDocument(lambda: os.getenv("GOOGLE_DISCOVERY_URL", GOOGLE_DISCOVERY_URL))
+certs_cache = CachedDocument(lambda: os.getenv("GOOGLE_CERTS_URL", GOOGLE_CERTS_URL))
+
+def get_google_provider_cfg() -> Dict[str, Any]:
+    return discovery_cache.get()
+
+def verify_google_id_token(token: str, audience: Optional[str], clock_skew_in_seconds: int = 10) -> Dict[str, Any]:
+    """
+    Same checks as google.oauth2.id_token.verify_oauth2_token (signature,
+    audience, expiry, issuer), using the cached certificates. An unknown key
+    id triggers one forced refresh, which covers Google's key rotation.
+    """
+    try:
+        claims = google_jwt.decode(token, certs=certs_cache.get(), audience=audience,
+                                   clock_skew_in_seconds=clock_skew_in_seconds)
+    except ValueError as e:
+        if "Certificate for key id" not in str(e):
+            raise
+        claims = google_jwt.decode(token, certs=certs_cache.get(force_refresh=True), audience=audience,
+                                   clock_skew_in_seconds=clock_skew_in_seconds)
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer. 'iss' should be one of {GOOGLE_ISSUERS} but got {claims.get('iss')!r}")
+    return claims
+
+def oidc_stats() -> Dict[str, Any]:
+    return {"discovery": discovery_cache.stats(), "certs": certs_cache.stats()}
+
+if __name__ == "__main__":
+    # Stub provider check: a burst of lookups must cost one request per document.
+    # Run from flask_backend/: python -m auth.oidc
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    requests_seen = {"/.well-known/openid-configuration": 0, "/certs": 0}
+
+    class StubProvider(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen[self.path] = requests_seen.get(self.path, 0) + 1
+            base = f"http://127.0.0.1:{self.server.server_port}"
+            body = {"issuer": base, "authorization_endpoint": f"{base}/auth",
+                    "token_endpoint": f"{base}/token", "jwks_uri": f"{base}/certs"}
+            if self.path == "/certs":
+                body = {"stub-key": "-----BEGIN CERTIFICATE-----\n...\n-----END CERTIFICATE-----\n"}
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "public, max-age=2")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["GOOGLE_DISCOVERY_URL"] = f"http://127.0.0.1:{server.server_port}/.well-known/openid-configuration"
+    os.environ["GOOGLE_CERTS_URL"] = f"http://127.0.0.1:{server.server_port}/certs"
+
+    threads = [threading.Thread(target=lambda: (get_google_provider_cfg(), certs_cache.get())) for _ in range(200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("after a 200-login burst:", requests_seen)
+
+    # Past 80% of max-age=2 a lookup is still served from cache and refreshes in the background
+    time.sleep(1.7)
+    get_google_provider_cfg()
+    time.sleep(0.3)
+    print("after refresh-ahead:    ", requests_seen)
+    print(json.dumps(oidc_stats(), indent=2))
+    server.shutdown()
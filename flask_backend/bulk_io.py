@@ -0,0 +1,171 @@
+import os
+import asyncio
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Rows per multi-row INSERT
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+# Largest import accepted in one request
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+# Per-row errors echoed back; the counts always cover every row
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+# Rows per keyset page while exporting
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+TRIP_REQUIRED_FIELDS = ["lat", "lng", "description", "place_name"]
+TRIP_OPTIONAL_FIELDS = ["start_date", "end_date"]
+
+def missing_trip_fields(body: Dict[str, Any]) -> List[str]:
+    """Required-field rule shared by POST /trips and the bulk import."""
+    return [field for field in TRIP_REQUIRED_FIELDS if field not in body]
+
+def bulk_format(content_type: Optional[str], requested: Optional[str] = None) -> str:
+    if requested:
+        fmt = requested.lower()
+    else:
+        content_type = (content_type or "").split(";")[0].strip().lower()
+        fmt = "csv" if content_type in ("text/csv", "application/csv") else "ndjson"
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"Unsupported format {fmt!r}, expected ndjson or csv")
+    return fmt
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines (with their newline) without buffering the whole body."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig") + "\n"
+    if buffer:
+        yield buffer.decode("utf-8-sig")
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """(line number, object) per non-blank line; unparsable lines yield a ValueError instead."""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {e}")
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    (line number, dict) per CSV record, keyed by the header row. Quoted
+    fields may span lines; records are parsed as soon as they are complete.
+    """
+    header = None
+    pending = ""
+    start = 0
+    number = 0
+    async for line in lines:
+        number += 1
+        if not pending:
+            start = number
+        pending += line
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield start, ValueError(f"Invalid CSV: {e}")
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield start, {name: value for name, value in zip(header, values) if value != ""}
+    if pending.strip():
+        yield start, ValueError("Unterminated quoted field")
+
+def validate_trip(row: Any) -> Dict[str, Any]:
+    """Fields for a new trip from one imported row; raises ValueError when invalid."""
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    missing = missing_trip_fields(row)
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    trip = {field: row[field] for field in TRIP_REQUIRED_FIELDS + TRIP_OPTIONAL_FIELDS if field in row}
+    # CSV values arrive as text
+    for field in ("lat", "lng"):
+        try:
+            trip[field] = float(trip[field])
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a number")
+    return trip
+
+def record_bulk_error(result: Dict[str, Any], line: int, message: str):
+    result["failed"] += 1
+    if len(result["errors"]) < BULK_MAX_ERRORS:
+        result["errors"].append({"line": line, "error": message})
+
+async def import_rows(rows: AsyncIterator[Tuple[int, Any]], prepare: Callable[[Any], Dict[str, Any]],
+                      insert_batch: Callable[[List[Tuple[int, Dict[str, Any]]], Dict[str, Any]], Awaitable[None]],
+                      max_rows: int = BULK_MAX_ROWS, batch_size: int = BULK_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Insert streamed (line, row) pairs in batches, parsing the next batch
+    while the previous one is inserted. `prepare(row)` gives the row to
+    insert or raises ValueError; `insert_batch(batch, result)` adds to the
+    counts. Past `max_rows` rows the import stops reading: the rows before
+    are still inserted, the result says `truncated` and names the first
+    line left out, so the counts always match what is in the table.
+    """
+    result = {"received": 0, "inserted": 0, "failed": 0, "truncated": False, "errors": []}
+    batch = []
+    pending = None
+    try:
+        async for line, row in rows:
+            if result["received"] >= max_rows:
+                result["truncated"] = True
+                result["errors"].append({"line": line, "error": f"At most {max_rows} rows per import; "
+                                                                 "this row and the ones after it were not imported"})
+                break
+            result["received"] += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                prepared = prepare(row)
+            except ValueError as e:
+                record_bulk_error(result, line, str(e))
+                continue
+            batch.append((line, prepared))
+            if len(batch) >= batch_size:
+                # Parse the next batch while this one is being inserted
+                if pending is not None:
+                    await pending
+                pending = asyncio.create_task(insert_batch(batch, result))
+                batch = []
+        if pending is not None:
+            await pending
+        if batch:
+            await insert_batch(batch, result)
+    except BaseException:
+        # A failed read (e.g. the client went away) still lets the batch in flight finish, never orphaned
+        if pending is not None and not pending.done():
+            await asyncio.wait([pending])
+        raise
+    return result
+
+def ndjson_lines(rows: Iterable[Dict[str, Any]]) -> Iterable[str]:
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+def csv_lines(rows: Iterable[Dict[str, Any]], columns: List[str], header: bool) -> Iterable[str]:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+    yield out.getvalue()
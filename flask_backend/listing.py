@@ -0,0 +1,91 @@
+import os
+import base64
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Page size for a cursor without a limit, and the largest limit a client may ask for
+LIST_PAGE_DEFAULT = int(os.getenv("LIST_PAGE_DEFAULT", "100"))
+LIST_PAGE_MAX = int(os.getenv("LIST_PAGE_MAX", "500"))
+
+# Columns per table; "list" drops the free-text description
+LIST_COLUMNS = {
+    "trips": ["trip_id", "user_id", "lat", "lng", "description", "place_name",
+              "start_date", "end_date", "created_at", "updated_at"],
+    "journeys": ["journey_id", "user_id", "lat", "lng", "description", "place_name",
+                 "start_date", "end_date", "created_at"],
+}
+LIST_VIEWS = {
+    "full": None,
+    "list": ["place_name", "lat", "lng", "start_date", "end_date", "created_at"],
+}
+
+class ListingError(ValueError):
+    pass
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(created_at), str(row_id)
+    except Exception:
+        raise ListingError("Invalid cursor")
+
+def page_size(limit: Optional[int], cursor: Optional[str] = None) -> Optional[int]:
+    """
+    Rows per page, or None for the whole list: clients that pass neither
+    `limit` nor `cursor` predate pagination and expect every row.
+    """
+    if limit is None:
+        return LIST_PAGE_DEFAULT if cursor else None
+    if limit < 1:
+        raise ListingError("limit must be at least 1")
+    return min(limit, LIST_PAGE_MAX)
+
+def select_columns(table: str, id_column: str, view: str = "full", fields: Optional[str] = None) -> str:
+    """
+    PostgREST select list for a view name or an explicit comma-separated
+    `fields` list. The id and created_at are always included, since the
+    next-page cursor is built from them.
+    """
+    allowed = LIST_COLUMNS[table]
+    if fields:
+        columns = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in columns if name not in allowed]
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+    else:
+        if view not in LIST_VIEWS:
+            raise ListingError(f"Unknown view {view!r}, expected one of {', '.join(LIST_VIEWS)}")
+        columns = LIST_VIEWS[view]
+        if columns is None:
+            return "*"
+    return ",".join(dict.fromkeys([id_column, "created_at", *columns]))
+
+def keyset_filter(id_column: str, cursor: str) -> str:
+    """
+    PostgREST `or` filter for rows after the cursor in (created_at desc, id desc)
+    order, i.e. created_at < c or (created_at = c and id < id).
+    """
+    created_at, row_id = decode_cursor(cursor)
+    created_at = created_at.replace('"', "")
+    row_id = row_id.replace('"', "")
+    return f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",{id_column}.lt."{row_id}")'
+
+def page_etag(rows: List[Dict[str, Any]], columns: str) -> str:
+    body = json.dumps([columns, rows], sort_keys=True, separators=(",", ":"), default=str)
+    return f'W/"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [_opaque_tag(tag) for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" name the same representation
+    return "*" in candidates or _opaque_tag(etag) in candidates
@@ -1,28 +1,47 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request, Response, Header
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, Header
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, Dict, Any, List
 import os
 import json
-import requests
-import shutil
 from datetime import datetime, timedelta
 from functools import wraps
 import uuid
 import jwt
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from supabase import create_client, Client
+from postgrest import DEFAULT_POSTGREST_CLIENT_HEADERS, SyncPostgrestClient
 from dotenv import load_dotenv
 
-# Import backend modules
-from upload_and_summary.landmark_detection import (
-    detect_landmark_google_vision,
-    predict_landmark_custom_model
+from auth.cache import user_cache, token_cache
+from auth.oidc import OIDC_HTTP_TIMEOUT, get_google_provider_cfg, verify_google_id_token, oidc_stats
+from auth.oidc import session as oidc_session
+from bulk_io import (
+    EXPORT_PAGE_SIZE,
+    bulk_format,
+    csv_lines,
+    import_rows,
+    iter_lines,
+    missing_trip_fields,
+    ndjson_lines,
+    parse_csv,
+    parse_ndjson,
+    record_bulk_error,
+    validate_trip
+)
+from listing import (
+    LIST_COLUMNS,
+    ListingError,
+    encode_cursor,
+    etag_matches,
+    keyset_filter,
+    page_etag,
+    page_size,
+    select_columns
 )
-from upload_and_summary.summary_generator import get_openai_summary, generate_audio_summary
-from upload_and_summary.places import find_nearby_places
-from upload_and_summary.map_generator import generate_custom_leaflet_map_from_api_output
+
+# Import backend modules
+from upload_and_summary.executors import io_pool, PoolSaturated, PoolTimeout
+from upload_and_summary.routes import router as media_router
 
 # Load environment variables
 load_dotenv()
@@ -31,6 +50,9 @@ load_dotenv()
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
+# The project's JWT secret: signs the short-lived tokens that let database
+# functions see the calling user as auth.uid()
+supabase_jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
 
 # Create FastAPI app
 app = FastAPI(title="Tourism App API")
@@ -42,16 +64,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination and caching headers the frontend needs to read
+    expose_headers=["ETag", "Link", "X-Next-Cursor", "Server-Timing"],
 )
 
-# Setup upload folder
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Landmark detection, summaries, audio, places and maps, shared with the standalone app
+app.state.use_vision = True
+app.include_router(media_router)
 
-# OAuth helper functions
-def get_google_provider_cfg():
-    return requests.get(os.getenv("GOOGLE_DISCOVERY_URL")).json()
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
+# OAuth helper functions
 def get_google_auth_url(request: Request):
     # Get Google provider configuration
     google_provider_cfg = get_google_provider_cfg()
@@ -89,16 +118,15 @@ def process_google_callback(request: Request):
     }
     
     # Exchange auth code for tokens
-    token_response = requests.post(token_url, data=data)
+    token_response = oidc_session.post(token_url, data=data, timeout=OIDC_HTTP_TIMEOUT)
     token_json = token_response.json()
     
     if 'id_token' not in token_json:
         return None, None
     
     # Get user info
-    id_info = id_token.verify_oauth2_token(
+    id_info = verify_google_id_token(
         token_json['id_token'],
-        google_requests.Request(),
         os.getenv('GOOGLE_CLIENT_ID')
     )
     
@@ -135,6 +163,7 @@ def create_or_update_user(user_info):
         }
         
         supabase.table('users').update(update_data).eq('user_id', user_id).execute()
+        user_cache.invalidate(user_id)
         return response.data[0]
     else:
         # Create new user
@@ -167,23 +196,30 @@ def verify_auth_token(token):
     except:
         return None
 
+def fetch_user(user_id):
+    response = supabase.table('users').select('*').eq('user_id', user_id).execute()
+    return response.data[0] if response.data else None
+
 # FastAPI Dependency for authentication
 async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization or not authorization.startswith('Bearer '):
         raise HTTPException(status_code=401, detail="Token is missing")
     
     token = authorization.split(' ')[1]
-    data = verify_auth_token(token)
+    data = token_cache.verify(token, verify_auth_token)
     
     if not data:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    # Get user from database
-    response = supabase.table('users').select('*').eq('user_id', data['user_id']).execute()
-    if len(response.data) == 0:
-        raise HTTPException(status_code=401, detail="User not found")
+    # Get user from the identity cache, falling back to the database
+    user = user_cache.get(data['user_id'])
+    if user is None:
+        user = await io_pool.run(fetch_user, data['user_id'])
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(data['user_id'], user)
     
-    return response.data[0]
+    return user
 
 # Authentication routes
 @app.get("/")
@@ -193,13 +229,13 @@ async def index():
 @app.get("/auth/login")
 async def login(request: Request):
     """Redirect to Google OAuth login"""
-    auth_url = get_google_auth_url(request)
+    auth_url = await io_pool.run(get_google_auth_url, request)
     return RedirectResponse(auth_url)
 
 @app.get("/auth/login/callback")
 async def callback(request: Request):
     """Handle Google OAuth callback"""
-    user, token = process_google_callback(request)
+    user, token = await io_pool.run(process_google_callback, request)
     
     if not user or not token:
         return RedirectResponse(f"{os.getenv('FRONTEND_URL')}/login?error=auth_failed")
@@ -217,43 +253,10 @@ async def verify_token(current_user: Dict = Depends(get_current_user)):
     """Verify if token is valid"""
     return {'valid': True, 'user': current_user}
 
-# Backend functionality routes
-@app.post("/detect_landmark/")
-async def detect_landmark(image: UploadFile = File(...)):
-    file_path = os.path.join(UPLOAD_FOLDER, image.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
-
-    vision_result = detect_landmark_google_vision(file_path)
-    if vision_result:
-        return vision_result
-
-    predicted, lat, lng = predict_landmark_custom_model(file_path)
-    return {"name": predicted, "lat": lat, "lng": lng}
-
-@app.post("/generate_summary/")
-async def generate_summary(landmark: str = Form(...), language: str = Form("en")):
-    summary = get_openai_summary(landmark, language)
-    audio_path = f"{UPLOAD_FOLDER}/summary_{landmark}_{language}.mp3"
-    audio_file = generate_audio_summary(summary, language, save_path=audio_path)
-    return {"summary": summary, "audio_file": audio_path}
-
-@app.get("/download_audio/")
-async def download_audio(path: str):
-    return FileResponse(path)
-
-@app.get("/nearby_places/")
-async def nearby_places(lat: float, lng: float):
-    results = find_nearby_places(lat, lng)
-    return results
-
-@app.get("/generate_map/")
-async def generate_map(lat: float, lng: float):
-    results = find_nearby_places(lat, lng)
-    map_ = generate_custom_leaflet_map_from_api_output(results)
-    map_path = f"{UPLOAD_FOLDER}/leaflet_map.html"
-    map_.save(map_path)
-    return FileResponse(map_path)
+@app.get("/auth/cache")
+async def auth_cache_status():
+    """Hit rates of the user and token caches"""
+    return {"users": user_cache.stats(), "tokens": token_cache.stats(), "oidc": oidc_stats()}
 
 # Trips endpoints
 @app.post("/trips")
@@ -268,8 +271,7 @@ async def create_trip(request: Request, current_user: Dict = Depends(get_current
             raise HTTPException(status_code=400, detail=f"Invalid request body: {str(e)}")
         
         # Validate required fields
-        required_fields = ["lat", "lng", "description", "place_name"]
-        missing_fields = [field for field in required_fields if field not in body]
+        missing_fields = missing_trip_fields(body)
         if missing_fields:
             raise HTTPException(status_code=400, detail=f"Missing required fields: {', '.join(missing_fields)}")
         
@@ -290,7 +292,7 @@ async def create_trip(request: Request, current_user: Dict = Depends(get_current
         print(f"Creating trip with data: {new_trip}")
         
         try:
-            response = supabase.table('trips').insert(new_trip).execute()
+            response = await io_pool.run(insert_trips, [new_trip])
             if not response.data or len(response.data) == 0:
                 print(f"Supabase error: {response}")
                 raise HTTPException(status_code=500, detail="Failed to create trip in database")
@@ -306,42 +308,187 @@ async def create_trip(request: Request, current_user: Dict = Depends(get_current
         print(f"Error creating trip: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+def fetch_page(table, id_column, user_id, columns, limit, cursor):
+    # Keyset pagination: cost depends on the page size, not on how far back the page is.
+    # Served by the (user_id, created_at, id) indexes in migrations/002_listing_indexes.sql
+    query = supabase.table(table).select(columns).eq('user_id', user_id)
+    if cursor:
+        query = query.or_(keyset_filter(id_column, cursor))
+    query = query.order('created_at', desc=True).order(id_column, desc=True)
+    # One extra row tells whether another page follows; no limit returns every row
+    return (query.limit(limit + 1) if limit is not None else query).execute()
+
+async def list_user_rows(request: Request, table: str, id_column: str, user_id: str,
+                         limit: Optional[int], cursor: Optional[str], view: str, fields: Optional[str]):
+    try:
+        size = page_size(limit, cursor)
+        columns = select_columns(table, id_column, view, fields)
+        response = await io_pool.run(fetch_page, table, id_column, user_id, columns, size, cursor)
+    except ListingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = response.data[:size]
+    print(f"Found {len(rows)} {table}")
+    headers = {"ETag": page_etag(rows, columns), "Cache-Control": "private, no-cache"}
+    if size is not None and len(response.data) > size:
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1][id_column])
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(rows, headers=headers)
+
 @app.get("/trips")
-async def get_user_trips(current_user: Dict = Depends(get_current_user)):
-    """Get all trips for the current user"""
+async def get_user_trips(request: Request, limit: Optional[int] = None, cursor: Optional[str] = None,
+                         view: str = "full", fields: Optional[str] = None,
+                         current_user: Dict = Depends(get_current_user)):
+    """Get the current user's trips, newest first; with limit or cursor, one page (next via X-Next-Cursor)"""
     try:
         # Log user info for debugging
         print(f"Fetching trips for user: {current_user['user_id']}")
         
-        response = supabase.table('trips').select('*').eq('user_id', current_user["user_id"]).order('created_at', desc=True).execute()
-        print(f"Found {len(response.data)} trips")
-        return response.data
+        return await list_user_rows(request, "trips", "trip_id", current_user["user_id"],
+                                    limit, cursor, view, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching trips: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def insert_trips(rows):
+    # One multi-row INSERT for the whole batch
+    return supabase.table('trips').insert(rows).execute()
+
+async def insert_trip_batch(batch, result):
+    rows = [row for _, row in batch]
+    try:
+        response = await io_pool.run(insert_trips, rows)
+        result["inserted"] += len(response.data)
+        return
+    except Exception as e:
+        print(f"Bulk insert of {len(rows)} trips failed, retrying row by row: {str(e)}")
+    # Isolate the offending rows so the rest of the batch still lands
+    for line, row in batch:
+        try:
+            await io_pool.run(insert_trips, [row])
+            result["inserted"] += 1
+        except Exception as e:
+            record_bulk_error(result, line, str(e))
+
+@app.post("/trips/bulk")
+async def bulk_import_trips(request: Request, format: Optional[str] = None,
+                            current_user: Dict = Depends(get_current_user)):
+    """Import trips from a streamed JSON-lines or CSV body (with a header row); stops with truncated: true past BULK_MAX_ROWS"""
+    try:
+        fmt = bulk_format(request.headers.get("content-type"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def prepare(row):
+        trip = validate_trip(row)
+        trip.update({
+            "trip_id": str(uuid.uuid4()),
+            "user_id": current_user["user_id"],
+            "start_date": trip.get("start_date", datetime.now().isoformat()),
+            "created_at": "now()"
+        })
+        return trip
+
+    parse = parse_csv if fmt == "csv" else parse_ndjson
+    result = await import_rows(parse(iter_lines(request.stream())), prepare, insert_trip_batch)
+    print(f"Bulk import for {current_user['user_id']}: {result['inserted']} inserted, {result['failed']} failed"
+          + (" (truncated)" if result["truncated"] else ""))
+    return result
+
+async def export_rows(table, id_column, user_id, fmt):
+    # Walk the keyset pages so memory stays at one page however many rows there are
+    cursor = None
+    first = True
+    while True:
+        response = await io_pool.run(fetch_page, table, id_column, user_id, "*", EXPORT_PAGE_SIZE, cursor)
+        rows = response.data[:EXPORT_PAGE_SIZE]
+        if fmt == "csv":
+            for chunk in csv_lines(rows, LIST_COLUMNS[table], header=first):
+                yield chunk
+        else:
+            yield "".join(ndjson_lines(rows))
+        first = False
+        if len(response.data) <= EXPORT_PAGE_SIZE:
+            break
+        cursor = encode_cursor(rows[-1]["created_at"], rows[-1][id_column])
+
+def export_response(table, id_column, user_id, format):
+    try:
+        fmt = bulk_format(None, format or "ndjson")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_rows(table, id_column, user_id, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'}
+    )
+
+@app.get("/trips/export")
+async def export_trips(format: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+    """Stream all of the user's trips as JSON lines (default) or CSV"""
+    return export_response("trips", "trip_id", current_user["user_id"], format)
+
+@app.get("/journeys/export")
+async def export_journeys(format: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+    """Stream all of the user's completed journeys as JSON lines (default) or CSV"""
+    return export_response("journeys", "journey_id", current_user["user_id"], format)
+
+def fetch_trip(trip_id, user_id):
+    return supabase.table('trips').select('*').eq('trip_id', trip_id).eq('user_id', user_id).execute()
+
 @app.get("/trips/{trip_id}")
 async def get_trip_details(trip_id: str, current_user: Dict = Depends(get_current_user)):
     """Get details of a specific trip"""
     try:
         # Verify the trip belongs to the user
-        response = supabase.table('trips').select('*').eq('trip_id', trip_id).eq('user_id', current_user["user_id"]).execute()
+        response = await io_pool.run(fetch_trip, trip_id, current_user["user_id"])
         if len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Trip not found or does not belong to user")
         
         return response.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def update_trip_row(trip_id, user_id, update_data):
+    # Ownership check and update in one statement; no row means not found or not owned
+    return supabase.table('trips').update(update_data).eq('trip_id', trip_id).eq('user_id', user_id).execute()
+
+def delete_trip_row(trip_id, user_id):
+    return supabase.table('trips').delete().eq('trip_id', trip_id).eq('user_id', user_id).execute()
+
+def supabase_user_token(user_id):
+    # Signed like a Supabase session for user_id, so the database takes the user from auth.uid()
+    now = datetime.utcnow()
+    payload = {'sub': user_id, 'role': 'authenticated', 'aud': 'authenticated',
+               'iat': now, 'exp': now + timedelta(minutes=1)}
+    return jwt.encode(payload, supabase_jwt_secret, algorithm='HS256')
+
+def move_trip_to_journeys(trip_id, user_id):
+    # Server-side transactional move, see migrations/001_complete_trip.sql. The function
+    # only trusts auth.uid(), so it is called as the user rather than with the anon key alone
+    headers = {**DEFAULT_POSTGREST_CLIENT_HEADERS, 'apikey': supabase_key,
+               'Authorization': f'Bearer {supabase_user_token(user_id)}'}
+    with SyncPostgrestClient(f"{supabase_url}/rest/v1", headers=headers) as client:
+        response = client.rpc('complete_trip', {'p_trip_id': trip_id}).execute()
+    data = response.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = data.get('complete_trip') or data.get('journey_id')
+    return data
+
 @app.put("/trips/{trip_id}")
 async def update_trip(trip_id: str, request: Request, current_user: Dict = Depends(get_current_user)):
     """Update a trip"""
     try:
-        # Verify the trip belongs to the user
-        trip_response = supabase.table('trips').select('*').eq('trip_id', trip_id).eq('user_id', current_user["user_id"]).execute()
-        if len(trip_response.data) == 0:
-            raise HTTPException(status_code=404, detail="Trip not found or does not belong to user")
-        
         # Parse the request body
         body = await request.json()
         
@@ -353,14 +500,18 @@ async def update_trip(trip_id: str, request: Request, current_user: Dict = Depen
                 update_data[field] = body[field]
                 
         if not update_data:
-            return trip_response.data[0]  # No updates to make
-            
-        # Add updated_at timestamp
-        update_data["updated_at"] = "now()"
+            # No updates to make
+            response = await io_pool.run(fetch_trip, trip_id, current_user["user_id"])
+        else:
+            # Add updated_at timestamp
+            update_data["updated_at"] = "now()"
+            response = await io_pool.run(update_trip_row, trip_id, current_user["user_id"], update_data)
         
-        # Update the trip
-        response = supabase.table('trips').update(update_data).eq('trip_id', trip_id).execute()
+        if len(response.data) == 0:
+            raise HTTPException(status_code=404, detail="Trip not found or does not belong to user")
         return response.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -368,15 +519,13 @@ async def update_trip(trip_id: str, request: Request, current_user: Dict = Depen
 async def delete_trip(trip_id: str, current_user: Dict = Depends(get_current_user)):
     """Delete a trip"""
     try:
-        # Verify the trip belongs to the user
-        trip_response = supabase.table('trips').select('*').eq('trip_id', trip_id).eq('user_id', current_user["user_id"]).execute()
-        if len(trip_response.data) == 0:
+        response = await io_pool.run(delete_trip_row, trip_id, current_user["user_id"])
+        if len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Trip not found or does not belong to user")
         
-        # Delete the trip
-        supabase.table('trips').delete().eq('trip_id', trip_id).execute()
-        
         return {"message": "Trip deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -384,49 +533,30 @@ async def delete_trip(trip_id: str, current_user: Dict = Depends(get_current_use
 async def complete_trip(trip_id: str, current_user: Dict = Depends(get_current_user)):
     """Mark a trip as completed by moving it to journeys table"""
     try:
-        # Verify the trip belongs to the user
-        trip_response = supabase.table('trips').select('*').eq('trip_id', trip_id).eq('user_id', current_user["user_id"]).execute()
-        if len(trip_response.data) == 0:
+        journey_id = await io_pool.run(move_trip_to_journeys, trip_id, current_user["user_id"])
+        if not journey_id:
             raise HTTPException(status_code=404, detail="Trip not found or does not belong to user")
         
-        trip_data = trip_response.data[0]
-        
-        # Create a new journey record
-        journey_data = {
-            "journey_id": str(uuid.uuid4()),
-            "user_id": current_user["user_id"],
-            "lat": trip_data["lat"],
-            "lng": trip_data["lng"],
-            "description": trip_data["description"],
-            "place_name": trip_data["place_name"],
-            "start_date": trip_data["start_date"],
-            "end_date": trip_data["end_date"],
-            "created_at": "now()"
-        }
-        
-        # Insert into journeys table
-        journey_response = supabase.table('journeys').insert(journey_data).execute()
-        if not journey_response.data or len(journey_response.data) == 0:
-            raise HTTPException(status_code=500, detail="Failed to create journey record")
-            
-        # Delete the trip from trips table
-        supabase.table('trips').delete().eq('trip_id', trip_id).execute()
-        
-        return {"message": "Trip marked as completed and moved to journeys", "journey_id": journey_data["journey_id"]}
+        return {"message": "Trip marked as completed and moved to journeys", "journey_id": journey_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error completing trip: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/journeys/history")
-async def get_journey_history(current_user: Dict = Depends(get_current_user)):
-    """Get all completed journeys for the current user"""
+async def get_journey_history(request: Request, limit: Optional[int] = None, cursor: Optional[str] = None,
+                              view: str = "full", fields: Optional[str] = None,
+                              current_user: Dict = Depends(get_current_user)):
+    """Get a page of completed journeys for the current user, paginated like /trips"""
     try:
         # Log user info for debugging
         print(f"Fetching journey history for user: {current_user['user_id']}")
         
-        response = supabase.table('journeys').select('*').eq('user_id', current_user["user_id"]).order('created_at', desc=True).execute()
-        print(f"Found {len(response.data)} journeys")
-        return response.data
+        return await list_user_rows(request, "journeys", "journey_id", current_user["user_id"],
+                                    limit, cursor, view, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching journey history: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
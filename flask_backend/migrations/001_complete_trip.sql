@@ -0,0 +1,51 @@
+-- Moves a trip into journeys in one statement, so a completed trip can never
+-- be both in trips and journeys (or in neither). Called by
+-- POST /trips/{trip_id}/complete via the PostgREST rpc endpoint.
+--
+-- The DELETE takes the row lock: a concurrent second call waits, then finds
+-- nothing to delete and inserts nothing. Returns the new journey_id, or NULL
+-- when the trip does not exist or belongs to another user.
+--
+-- The function runs as its owner (security definer), so it takes the user
+-- from auth.uid() alone and never from an argument: the backend calls it
+-- with a short-lived token for the signed-in user, signed with the
+-- project's JWT secret (SUPABASE_JWT_SECRET). Only the authenticated role
+-- may execute it; anon cannot.
+--
+-- Apply in the Supabase SQL editor (or psql) once per database. Re-applying
+-- also drops the earlier two-argument version, which trusted p_user_id.
+
+drop function if exists public.complete_trip(uuid, uuid);
+
+create or replace function public.complete_trip(p_trip_id uuid)
+returns uuid
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_user_id uuid := auth.uid();
+  v_journey_id uuid;
+begin
+  if v_user_id is null then
+    raise exception 'complete_trip: not signed in'
+      using errcode = '42501';
+  end if;
+
+  with moved as (
+    delete from public.trips
+    where trip_id = p_trip_id and user_id = v_user_id
+    returning user_id, lat, lng, description, place_name, start_date, end_date
+  )
+  insert into public.journeys
+    (journey_id, user_id, lat, lng, description, place_name, start_date, end_date, created_at)
+  select gen_random_uuid(), user_id, lat, lng, description, place_name, start_date, end_date, now()
+  from moved
+  returning journey_id into v_journey_id;
+
+  return v_journey_id;
+end;
+$$;
+
+revoke execute on function public.complete_trip(uuid) from public, anon;
+grant execute on function public.complete_trip(uuid) to authenticated;
@@ -0,0 +1,19 @@
+-- Indexes for the keyset-paginated GET /trips and GET /journeys/history.
+--
+-- Both endpoints run
+--   where user_id = $1 [and (created_at, id) < cursor]
+--   order by created_at desc, id desc limit n + 1
+-- With these indexes each page is an index range scan of n + 1 entries, so
+-- its cost no longer grows with the user's history, and no sort is needed.
+--
+-- CONCURRENTLY avoids locking writes on large tables; it cannot run inside a
+-- transaction block, so run each statement on its own.
+
+create index concurrently if not exists trips_user_created_idx
+  on public.trips (user_id, created_at desc, trip_id desc);
+
+create index concurrently if not exists journeys_user_created_idx
+  on public.journeys (user_id, created_at desc, journey_id desc);
+
+-- A plain (user_id) index becomes redundant once these exist:
+-- drop index concurrently if exists trips_user_id_idx;
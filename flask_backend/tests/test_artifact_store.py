@@ -0,0 +1,28 @@
+import os
+import time
+
+from upload_and_summary.artifact_store import ArtifactStore
+
+def test_scan_indexes_sharded_files_and_leaves_others_in_place(tmp_path):
+    store = ArtifactStore("images", root=str(tmp_path))
+    sharded = store.write("a.jpg", b"12345")
+    stray = os.path.join(store.root, "b.jpg")
+    with open(stray, "wb") as f:
+        f.write(b"xyz")
+
+    rescanned = ArtifactStore("images", root=str(tmp_path))
+    rescanned.scan()
+    assert rescanned.stats()["files"] == 1 and rescanned.total_bytes == 5
+    assert os.path.exists(sharded) and os.path.exists(stray)
+
+def test_collect_expires_then_evicts_least_recently_used(tmp_path):
+    writer = ArtifactStore("images", root=str(tmp_path))
+    now = time.time()
+    for name, age in (("old.jpg", 7200), ("a.jpg", 60), ("b.jpg", 30), ("c.jpg", 0)):
+        path = writer.write(name, b"12345")
+        os.utime(path, (now - age, now - age))
+
+    # A restarted store learns last use from the files' mtimes
+    store = ArtifactStore("images", root=str(tmp_path), max_age=3600, max_bytes=10)
+    assert store.collect(now) == {"expired": 1, "evicted": 1, "freed_bytes": 10}
+    assert store.path("a.jpg") is None and store.path("b.jpg") is not None and store.path("c.jpg") is not None
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from upload_and_summary.audio_store import AudioStore, RangeNotSatisfiable, iter_file_range, parse_range
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_single_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", [
+    None, "", "items=0-10", "bytes=0-10,20-30", "bytes=-", "bytes=a-b",
+    # start > end is a syntactically invalid range: ignored, the whole body is sent
+    "bytes=500-100",
+])
+def test_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-2000", "bytes=-0"])
+def test_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable) as error:
+        parse_range(header, 1000)
+    assert str(error.value) == "bytes */1000"
+
+def test_iter_file_range_reads_the_range_and_closes(tmp_path):
+    path = tmp_path / "clip.mp3"
+    path.write_bytes(bytes(range(256)) * 4)
+    f = open(path, "rb")
+    assert b"".join(iter_file_range(f, 10, 299, chunk_size=64)) == (bytes(range(256)) * 4)[10:300]
+    assert f.closed
+
+@pytest.mark.skipif(os.name == "nt", reason="Windows cannot delete an open file")
+def test_open_handle_survives_removal(tmp_path):
+    store = AudioStore(root=str(tmp_path))
+    audio_id = store.put(b"ID3" + b"\x00" * 100, "mp3")
+    f = open(store.path(audio_id), "rb")
+    store.remove(audio_id)
+    assert store.path(audio_id) is None
+    assert b"".join(iter_file_range(f, 0, 2)) == b"ID3"
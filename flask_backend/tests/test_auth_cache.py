@@ -0,0 +1,33 @@
+import time
+
+from auth.cache import TokenCache, UserCache
+
+def test_token_payload_edits_do_not_reach_the_cache():
+    cache = TokenCache()
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        return {"sub": "u1", "exp": time.time() + 60}
+
+    first = cache.verify("t", verify)
+    first["user_id"] = "changed"
+    second = cache.verify("t", verify)
+    second["user_id"] = "changed again"
+    assert "user_id" not in cache.verify("t", verify)
+    assert calls == ["t"]
+
+def test_expired_and_invalid_tokens_are_not_cached():
+    cache = TokenCache()
+    assert cache.verify("old", lambda token: {"exp": time.time() - 1}) is not None
+    assert cache.verify("bad", lambda token: None) is None
+    assert cache.stats()["entries"] == 0
+
+def test_user_rows_are_copied_both_ways():
+    cache = UserCache(ttl=60)
+    row = {"id": "u1", "name": "A"}
+    cache.set("u1", row)
+    row["name"] = "B"
+    cached = cache.get("u1")
+    cached["name"] = "C"
+    assert cache.get("u1")["name"] == "A"
@@ -0,0 +1,44 @@
+import asyncio
+
+from bulk_io import import_rows, iter_lines, parse_csv, parse_ndjson, validate_trip
+
+async def chunks(body: bytes, size: int = 7):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+def trip_line(i):
+    return f'{{"lat": 27.1, "lng": 78.0, "description": "d{i}", "place_name": "p{i}"}}\n'
+
+def run_import(body: bytes, parse=parse_ndjson, **kwargs):
+    table = []
+
+    async def insert_batch(batch, result):
+        await asyncio.sleep(0)
+        table.extend(row for _, row in batch)
+        result["inserted"] += len(batch)
+
+    result = asyncio.run(import_rows(parse(iter_lines(chunks(body))), validate_trip, insert_batch, **kwargs))
+    return result, table
+
+def test_rows_are_inserted_in_batches_with_errors_per_line():
+    body = "".join(trip_line(i) for i in range(5)) + '{"lat": "x"}\nnot json\n' + trip_line(5)
+    result, table = run_import(body.encode(), batch_size=2)
+    assert result["received"] == 8 and result["inserted"] == 6 and result["failed"] == 2
+    assert [error["line"] for error in result["errors"]] == [6, 7]
+    assert not result["truncated"]
+    assert [row["description"] for row in table] == [f"d{i}" for i in range(6)]
+
+def test_over_limit_stops_and_reports_what_was_inserted():
+    body = "".join(trip_line(i) for i in range(10)).encode()
+    result, table = run_import(body, max_rows=5, batch_size=2)
+    assert result["truncated"]
+    assert result["received"] == 5
+    # Every row before the limit is inserted, including the in-flight and the partial batch
+    assert result["inserted"] == len(table) == 5
+    assert result["errors"] == [{"line": 6, "error": "At most 5 rows per import; "
+                                                     "this row and the ones after it were not imported"}]
+
+def test_csv_records_may_span_lines():
+    body = b'lat,lng,description,place_name\n27.1,78.0,"two\nlines",Agra\n'
+    result, table = run_import(body, parse=parse_csv)
+    assert result["inserted"] == 1 and table[0]["description"] == "two\nlines" and table[0]["lat"] == 27.1
@@ -0,0 +1,61 @@
+from upload_and_summary.conversation_store import ConversationStore, estimate_tokens
+
+def filled(store, session_id="s1", turns=5):
+    for i in range(1, turns + 1):
+        store.append(session_id, f"question {i}", f"answer {i}", "en")
+    return store
+
+def test_append_numbers_turns_per_session():
+    store = ConversationStore(db_path="")
+    assert store.append("a", "q", "r", "en")["seq"] == 1
+    assert store.append("a", "q", "r", "en")["seq"] == 2
+    assert store.append("b", "q", "r", "en")["seq"] == 1
+
+def test_ring_buffer_keeps_the_latest_turns():
+    store = filled(ConversationStore(db_path="", max_turns=3), turns=5)
+    turns, cursor = store.history("s1", limit=10)
+    assert [turn["seq"] for turn in turns] == [5, 4, 3]
+    assert cursor is None
+
+def test_context_is_oldest_first_within_turn_and_token_limits():
+    store = filled(ConversationStore(db_path=""), turns=5)
+    messages = store.context_messages("s1", max_turns=2)
+    assert [m["content"] for m in messages] == ["question 4", "answer 4", "question 5", "answer 5"]
+    assert [m["role"] for m in messages] == ["user", "assistant"] * 2
+    one_turn = estimate_tokens("question 5") + estimate_tokens("answer 5")
+    assert len(store.context_messages("s1", token_budget=one_turn)) == 2
+    assert store.context_messages("s1", token_budget=one_turn - 1) == []
+    assert store.context_messages("unknown") == []
+
+def test_history_pages_with_a_cursor():
+    store = filled(ConversationStore(db_path=""), turns=5)
+    page, cursor = store.history("s1", limit=2)
+    assert [turn["seq"] for turn in page] == [5, 4] and cursor == 4
+    page, cursor = store.history("s1", limit=2, before=cursor)
+    assert [turn["seq"] for turn in page] == [3, 2] and cursor == 2
+    page, cursor = store.history("s1", limit=2, before=cursor)
+    assert [turn["seq"] for turn in page] == [1] and cursor is None
+
+def test_sessions_are_lru_bounded():
+    store = ConversationStore(db_path="", max_sessions=2)
+    store.append("a", "q", "r", "en")
+    store.append("b", "q", "r", "en")
+    store.context_messages("a")
+    store.append("c", "q", "r", "en")
+    stats = store.stats()
+    assert stats["sessions"] == 2 and stats["evictions"] == 1
+    assert store.history("b")[0] == []
+    assert len(store.history("a")[0]) == 1
+
+def test_sqlite_reloads_evicted_and_restarted_sessions(tmp_path):
+    db_path = str(tmp_path / "conversations.db")
+    store = filled(ConversationStore(db_path=db_path, max_sessions=1, max_turns=3), turns=5)
+    store.append("other", "q", "r", "en")
+    # Evicted from memory, reloaded from disk on its next use
+    assert [m["content"] for m in store.context_messages("s1", max_turns=1)] == ["question 5", "answer 5"]
+    assert store.stats()["loads_from_disk"] == 1
+    # History on disk reaches past the in-memory ring buffer
+    restarted = ConversationStore(db_path=db_path, max_turns=3)
+    page, _ = restarted.history("s1", limit=10)
+    assert [turn["seq"] for turn in page] == [5, 4, 3, 2, 1]
+    assert restarted.append("s1", "question 6", "answer 6", "en")["seq"] == 6
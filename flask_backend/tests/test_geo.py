@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pytest
+
+from upload_and_summary.geo import EARTH_RADIUS_KM, GeoIndex, bounding_box, haversine_km, haversine_km_scalar
+
+def random_points(rng, n):
+    # Uniform on the sphere, not in lat/lng
+    return np.degrees(np.arcsin(rng.uniform(-1, 1, n))), rng.uniform(-180, 180, n)
+
+def chord_km(lat1, lng1, lat2, lng2):
+    def unit(lat, lng):
+        lat, lng = np.radians(lat), np.radians(lng)
+        return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)])
+    chord = np.linalg.norm(unit(lat1, lng1) - unit(lat2, lng2), axis=0)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+def test_haversine_matches_the_chord_reference():
+    rng = np.random.default_rng(0)
+    lat1, lng1 = random_points(rng, 5000)
+    lat2, lng2 = random_points(rng, 5000)
+    # Pairs straddling the antimeridian
+    lng1[:1000], lng2[:1000] = rng.uniform(179, 180, 1000), rng.uniform(-180, -179, 1000)
+    ours = haversine_km(lat1, lng1, lat2, lng2)
+    assert np.abs(ours - chord_km(lat1, lng1, lat2, lng2)).max() < 1e-3
+    for i in range(0, 5000, 97):
+        assert math.isclose(haversine_km_scalar(lat1[i], lng1[i], lat2[i], lng2[i]), ours[i], abs_tol=1e-9)
+
+def test_one_degree_of_longitude_at_the_equator():
+    assert haversine_km(0, 0, 0, 1) == pytest.approx(2 * math.pi * EARTH_RADIUS_KM / 360)
+    assert haversine_km_scalar(0, 179.5, 0, -179.5) == pytest.approx(2 * math.pi * EARTH_RADIUS_KM / 360)
+
+def test_bounding_box_opens_up_at_the_poles():
+    assert bounding_box(89.99, 0, 10)[2] is None
+    lat_min, lat_max, half_width = bounding_box(0, 0, 111.19)
+    assert lat_min == pytest.approx(-1, abs=1e-3) and lat_max == pytest.approx(1, abs=1e-3)
+    assert half_width == pytest.approx(1, abs=1e-3)
+
+@pytest.mark.parametrize("cell_km", [2.0, 50.0, 77.0])
+def test_columns_tile_the_globe_exactly(cell_km):
+    index = GeoIndex(cell_km)
+    assert index._cols * index.cell_deg == pytest.approx(360)
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3, 4])
+@pytest.mark.parametrize("cell_km", [2.0, 50.0])
+def test_index_matches_brute_force(seed, cell_km):
+    rng = np.random.default_rng(seed)
+    lats, lngs = random_points(rng, 5000)
+    # Clusters around a pole and across the antimeridian
+    lats = np.concatenate([lats, rng.uniform(89.5, 90, 300), rng.uniform(-10, 10, 300)])
+    lngs = np.concatenate([lngs, rng.uniform(-180, 180, 300), rng.uniform(179.8, 180.2, 300) % 360 - 180])
+    index = GeoIndex(cell_km)
+    index.extend(lats, lngs, list(range(len(lats))))
+    for _ in range(150):
+        qlat = float(np.clip(rng.choice(lats) + rng.normal(0, 0.5), -90, 90))
+        qlng = float(rng.uniform(-180, 180))
+        distances = haversine_km(qlat, qlng, lats, lngs)
+        radius = float(rng.choice([1, 10, 100, 1000, 5000]))
+        got = {item for item, _ in index.within(qlat, qlng, radius)}
+        assert got == set(np.flatnonzero(distances <= radius).tolist()), (qlat, qlng, radius)
+        k = int(rng.integers(1, 20))
+        assert np.allclose([d for _, d in index.nearest(qlat, qlng, k)], np.sort(distances)[:k]), (qlat, qlng, k)
+
+def test_points_on_both_sides_of_the_antimeridian_are_neighbours():
+    index = GeoIndex(50.0)
+    index.extend([0.0, 0.0, 0.0], [179.99, -179.99, 90.0], ["east", "west", "far"])
+    assert [item for item, _ in index.within(0.0, 180.0, 10)] in (["east", "west"], ["west", "east"])
+    assert {item for item, _ in index.nearest(0.0, -180.0, 2)} == {"east", "west"}
@@ -0,0 +1,56 @@
+import pytest
+
+from listing import (
+    LIST_PAGE_DEFAULT, LIST_PAGE_MAX, ListingError, decode_cursor, encode_cursor, etag_matches,
+    keyset_filter, page_etag, page_size, select_columns
+)
+
+def test_no_limit_and_no_cursor_returns_the_whole_list():
+    assert page_size(None) is None
+    assert page_size(None, None) is None
+
+def test_cursor_without_limit_uses_the_default_page():
+    assert page_size(None, encode_cursor("2024-01-01T00:00:00", "a")) == LIST_PAGE_DEFAULT
+
+def test_limit_is_capped_and_validated():
+    assert page_size(10) == 10
+    assert page_size(LIST_PAGE_MAX + 1) == LIST_PAGE_MAX
+    with pytest.raises(ListingError):
+        page_size(0)
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-05-01T10:00:00+00:00", "7b0f")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2024-05-01T10:00:00+00:00", "7b0f")
+
+def test_malformed_cursor_is_a_listing_error():
+    with pytest.raises(ListingError):
+        decode_cursor("not-a-cursor")
+
+def test_keyset_filter_orders_by_created_at_then_id():
+    cursor = encode_cursor("2024-05-01T10:00:00", "t2")
+    assert keyset_filter("trip_id", cursor) == (
+        'created_at.lt."2024-05-01T10:00:00",and(created_at.eq."2024-05-01T10:00:00",trip_id.lt."t2")'
+    )
+
+def test_keyset_filter_strips_quotes_from_the_cursor():
+    cursor = encode_cursor('2024"),user_id.neq.("x', 't"')
+    assert keyset_filter("trip_id", cursor).count('"') == 6
+
+def test_select_columns_always_keeps_the_cursor_columns():
+    assert select_columns("trips", "trip_id") == "*"
+    assert select_columns("trips", "trip_id", fields="place_name") == "trip_id,created_at,place_name"
+    assert select_columns("journeys", "journey_id", view="list").startswith("journey_id,created_at,")
+    with pytest.raises(ListingError):
+        select_columns("trips", "trip_id", fields="password")
+    with pytest.raises(ListingError):
+        select_columns("trips", "trip_id", view="everything")
+
+def test_etags_compare_weakly():
+    etag = page_etag([{"trip_id": "a"}], "*")
+    assert etag.startswith('W/"')
+    assert etag_matches(etag[2:], etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert etag != page_etag([{"trip_id": "b"}], "*")
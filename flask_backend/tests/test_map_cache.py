@@ -0,0 +1,37 @@
+from upload_and_summary.map_cache import etag_for, map_key, tile_map_input, with_origin
+
+POIS = [
+    {"name": "Taj Museum", "lat": 27.1751, "lng": 78.0421, "type": "museum", "address": "Agra",
+     "marker_color": "blue", "distance_km": 0.2, "route_url": "https://example.test/a"},
+    {"name": "Kinari Bazaar", "lat": 27.1962, "lng": 78.0145, "type": "shopping_mall", "address": "Agra",
+     "marker_color": "orange", "distance_km": 3.1, "route_url": "https://example.test/b"},
+]
+
+def relocalized(pois, distance, route):
+    return [dict(poi, distance_km=distance, route_url=route) for poi in pois]
+
+def test_key_ignores_caller_relative_fields_and_order():
+    other = relocalized(reversed(POIS), 9.9, "https://example.test/elsewhere")
+    assert map_key("tsq4", POIS) == map_key("tsq4", other)
+
+def test_key_follows_tile_and_markers():
+    moved = [dict(POIS[0], lat=27.18)] + POIS[1:]
+    assert map_key("tsq4", POIS) != map_key("tsq5", POIS)
+    assert map_key("tsq4", POIS) != map_key("tsq4", moved)
+    assert map_key("tsq4", POIS) != map_key("tsq4", POIS[:1])
+
+def test_tile_map_input_drops_caller_relative_fields():
+    results = tile_map_input((27.17, 78.04), POIS)
+    assert results["landmark_location"] == {"lat": 27.17, "lng": 78.04}
+    assert all("distance_km" not in poi and "route_url" not in poi for poi in results["nearby_places"])
+
+def test_with_origin_declares_the_callers_position():
+    html = b"<!DOCTYPE html><html><head><meta charset='utf-8'></head><body></body></html>"
+    page = with_origin(html, 27.17, 78.04)
+    assert page.startswith(b"<!DOCTYPE html><html><head><script>var MAP_ORIGIN = [27.17, 78.04];</script>")
+    assert page.endswith(html[len(b"<!DOCTYPE html><html><head>"):])
+
+def test_etag_differs_per_origin_for_one_cached_page():
+    key = map_key("tsq4", POIS)
+    assert etag_for(key, "html", (27.17, 78.04)) != etag_for(key, "html", (27.18, 78.04))
+    assert etag_for(key, "html", (27.17, 78.04)) == etag_for(key, "html", (27.17, 78.04))
@@ -0,0 +1,118 @@
+import asyncio
+import os
+
+from upload_and_summary.geo import GeoIndex
+from upload_and_summary.places_cache import DiskBackend, MemoryBackend, PlacesCache, geohash_encode
+
+# Three points far enough apart to fall in different precision-6 tiles
+AGRA = (27.1751, 78.0421)
+DELHI = (28.6129, 77.2295)
+MUMBAI = (18.9220, 72.8347)
+
+def poi_at(name, lat, lng):
+    return {"name": name, "lat": lat, "lng": lng, "type": "tourist_attraction"}
+
+def fetch_for(calls):
+    async def fetch(lat, lng, radius):
+        calls.append((lat, lng, radius))
+        return [poi_at(f"poi-{len(calls)}", lat, lng)]
+    return fetch
+
+def load(cache, point, calls):
+    return asyncio.run(cache.get_or_fetch(*point, 3000, fetch_for(calls)))
+
+def nearest_names(cache, point, k=10):
+    return {poi["name"] for poi, _ in cache.nearest(*point, k)}
+
+def test_hits_share_one_fetch_per_tile():
+    calls = []
+    cache = PlacesCache(backend=MemoryBackend(), poi_index=GeoIndex())
+    first = load(cache, AGRA, calls)
+    assert load(cache, (AGRA[0] + 0.0001, AGRA[1]), calls) == first
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_concurrent_misses_share_one_fetch():
+    calls = []
+    cache = PlacesCache(backend=MemoryBackend(), poi_index=GeoIndex())
+
+    async def fetch(lat, lng, radius):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [poi_at("shared", lat, lng)]
+
+    async def both():
+        return await asyncio.gather(*(cache.get_or_fetch(*AGRA, 3000, fetch) for _ in range(5)))
+
+    results = asyncio.run(both())
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+
+def test_failed_fetch_is_not_cached():
+    cache = PlacesCache(backend=MemoryBackend(), poi_index=GeoIndex())
+
+    async def failing(lat, lng, radius):
+        raise RuntimeError("quota")
+
+    try:
+        asyncio.run(cache.get_or_fetch(*AGRA, 3000, failing))
+    except RuntimeError:
+        pass
+    calls = []
+    load(cache, AGRA, calls)
+    assert len(calls) == 1
+
+def test_lru_eviction_removes_the_tiles_pois_from_the_index():
+    calls = []
+    cache = PlacesCache(backend=MemoryBackend(max_entries=2), poi_index=GeoIndex())
+    load(cache, AGRA, calls)
+    load(cache, DELHI, calls)
+    assert nearest_names(cache, AGRA) == {"poi-1", "poi-2"}
+    load(cache, MUMBAI, calls)
+    assert cache.backend.evictions == 1
+    assert nearest_names(cache, AGRA) == {"poi-2", "poi-3"}
+    assert cache.stats()["indexed_tiles"] == 2
+
+def test_expired_tiles_leave_the_index_and_are_refetched():
+    calls = []
+    cache = PlacesCache(backend=MemoryBackend(ttl=60), poi_index=GeoIndex())
+    load(cache, AGRA, calls)
+    load(cache, DELHI, calls)
+    # Age the Agra tile past its TTL
+    key = cache.key_for(*AGRA, 3000)
+    stored_at, pois = cache.backend._entries[key]
+    cache.backend._entries[key] = (stored_at - 120, pois)
+    cache._tiles[key] = (stored_at - 120, pois)
+    assert nearest_names(cache, AGRA) == {"poi-2"}
+    load(cache, AGRA, calls)
+    assert len(calls) == 3
+    assert nearest_names(cache, AGRA) == {"poi-2", "poi-3"}
+
+def test_disk_backend_evictions_reach_the_index(tmp_path):
+    calls = []
+    cache = PlacesCache(backend=DiskBackend(str(tmp_path), max_entries=1), poi_index=GeoIndex())
+    load(cache, AGRA, calls)
+    load(cache, DELHI, calls)
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    assert nearest_names(cache, AGRA) == {"poi-2"}
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    calls = []
+    load(PlacesCache(backend=DiskBackend(str(tmp_path)), poi_index=GeoIndex()), AGRA, calls)
+    restarted = PlacesCache(backend=DiskBackend(str(tmp_path)), poi_index=GeoIndex())
+    load(restarted, AGRA, calls)
+    assert len(calls) == 1
+    assert nearest_names(restarted, AGRA) == {"poi-1"}
+
+def test_geohash_tiles_separate_the_test_points():
+    assert len({geohash_encode(*point) for point in (AGRA, DELHI, MUMBAI)}) == 3
+
+def test_disk_hit_survives_the_file_vanishing_before_the_touch(tmp_path, monkeypatch):
+    backend = DiskBackend(str(tmp_path))
+    backend.set("tsq4:3000", [{"place_id": "a"}])
+
+    def vanished(path, times=None):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", vanished)
+    assert backend.get("tsq4:3000") == [{"place_id": "a"}]
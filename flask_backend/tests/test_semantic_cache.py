@@ -0,0 +1,46 @@
+from upload_and_summary.gazetteer import get_gazetteer
+from upload_and_summary.semantic_cache import SemanticCache, hashed_embedding, key_terms
+
+def cache_with(prompt, value="answer", language="en", landmark_id=None, **kwargs):
+    cache = SemanticCache(max_entries=16, embedder=(hashed_embedding, 1024), **kwargs)
+    cache.put(prompt, language, value, landmark_id)
+    return cache
+
+def test_rewording_is_a_hit():
+    cache = cache_with("Tell me the history of the Taj Mahal", landmark_id="taj-mahal")
+    assert cache.get("Taj Mahal history", "en", "taj-mahal") == "answer"
+
+def test_other_visitor_group_is_a_miss():
+    cache = cache_with("What is the entry fee for Indian citizens at the Taj Mahal?", landmark_id="taj-mahal")
+    assert cache.get("What is the entry fee for foreign citizens at the Taj Mahal?", "en", "taj-mahal") is None
+    assert cache.stats()["term_mismatches"] == 1
+
+def test_negation_is_a_miss():
+    cache = cache_with("Is the Taj Mahal open on Friday?", landmark_id="taj-mahal")
+    assert cache.get("Is the Taj Mahal not open on Friday?", "en", "taj-mahal") is None
+    assert cache.get("Isn't the Taj Mahal open on Friday?", "en", "taj-mahal") is None
+    assert cache.get("Is the Taj Mahal open on Friday", "en", "taj-mahal") == "answer"
+
+def test_numbers_must_match():
+    cache = cache_with("Best things to see at the Red Fort in 2 hours")
+    assert cache.get("Best things to see at the Red Fort in 5 hours", "en") is None
+
+def test_other_landmark_or_language_is_a_miss():
+    cache = cache_with("What is the history of the Taj Mahal?", landmark_id="taj-mahal")
+    assert cache.get("What is the history of the Taj Mahal?", "en", "qutub-minar") is None
+    assert cache.get("What is the history of the Taj Mahal?", "hi", "taj-mahal") is None
+
+def test_key_terms():
+    assert key_terms("Don't foreigners pay 1100 on weekends?") == {"not", "foreigners", "1100", "weekends"}
+    assert key_terms("History of the Taj Mahal") == frozenset()
+
+def test_expired_entries_are_dropped():
+    cache = cache_with("Taj Mahal history", ttl=-1)
+    assert cache.get("Taj Mahal history", "en") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_prompt_names_its_landmark():
+    gazetteer = get_gazetteer()
+    record = gazetteer.resolve("Taj Mahal")
+    assert gazetteer.mentioned_in("How old is the Taj Mahal?") is record
+    assert gazetteer.mentioned_in("How old is this building?") is None
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from upload_and_summary.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def create():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.run("k", create) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["value"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert len(flight) == 0
+
+def test_failure_reaches_waiters_and_is_not_remembered():
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(flight.run("k", failing), flight.run("k", failing), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            await flight.run("k", failing)
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def main():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.run("k", slow))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.run("k", slow))
+        await asyncio.sleep(0)
+        assert "k" in flight
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == (42, False)
+
+def test_cancelled_first_caller_does_not_fail_the_others():
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.run("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        result = await follower
+        return flight, result
+
+    flight, result = asyncio.run(main())
+    assert result == ("value", True)
+    assert len(calls) == 1
+    assert len(flight) == 0
@@ -0,0 +1,291 @@
+import os
+import hashlib
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+ARTIFACT_ROOT = os.getenv("ARTIFACT_ROOT", "uploads")
+# Seconds between garbage collection passes
+ARTIFACT_GC_INTERVAL = float(os.getenv("ARTIFACT_GC_INTERVAL", "600"))
+# Last use is written back to the file's mtime at most this often, so recency survives restarts
+ARTIFACT_TOUCH_INTERVAL = 3600
+# Temporary files older than this were left by a crashed write
+STALE_TMP_AGE = 3600
+
+DAY = 24 * 3600
+GB = 1024 ** 3
+# kind: (max age in seconds, max bytes); ARTIFACT_<KIND>_MAX_AGE and ARTIFACT_<KIND>_MAX_BYTES override
+ARTIFACT_POLICIES = {
+    "images": (7 * DAY, 2 * GB),
+    "audio": (30 * DAY, 2 * GB),
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".heic")
+
+def artifact_policy(kind: str):
+    max_age, max_bytes = ARTIFACT_POLICIES.get(kind, (30 * DAY, 1 * GB))
+    return (float(os.getenv(f"ARTIFACT_{kind.upper()}_MAX_AGE", str(max_age))),
+            int(os.getenv(f"ARTIFACT_{kind.upper()}_MAX_BYTES", str(max_bytes))))
+
+def _is_stale_tmp(path: str, now: float) -> bool:
+    try:
+        return path.endswith(".tmp") and os.path.getmtime(path) < now - STALE_TMP_AGE
+    except OSError:
+        return False
+
+class ArtifactStore:
+    """
+    Files of one kind under `<root>/<kind>/<h[:2]>/<h[2:4]>/<name>`, h being
+    the SHA-1 of the name: two levels of 256 directories keep every
+    directory small however many files there are.
+
+    Sizes and last use are indexed in memory. The index is built by the
+    first `collect()`, normally on the garbage collection thread, so startup
+    never walks the tree; files touched before then are indexed as they go.
+    `collect()` deletes files unused for `max_age` seconds, then the least
+    recently used ones until the kind fits in `max_bytes`.
+    """
+
+    def __init__(self, kind: str, root: str = ARTIFACT_ROOT, max_age: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        default_age, default_bytes = artifact_policy(kind)
+        self.kind = kind
+        self.root = os.path.join(root, kind)
+        self.max_age = default_age if max_age is None else max_age
+        self.max_bytes = default_bytes if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        # name -> [last use, bytes]
+        self._index: Dict[str, list] = {}
+        self.total_bytes = 0
+        self.scanned = False
+        self.expired = 0
+        self.evicted = 0
+        self.freed_bytes = 0
+        self.gc_runs = 0
+        self.last_gc_ms = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _shard_path(self, name: str) -> str:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], name)
+
+    def scan(self):
+        """Index every file in its shard under the root; files anywhere else are not the store's."""
+        now = time.time()
+        found = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if name.endswith(".tmp"):
+                        if _is_stale_tmp(path, now):
+                            os.remove(path)
+                        continue
+                    if path != self._shard_path(name):
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found[name] = [stat.st_mtime, stat.st_size]
+        with self._lock:
+            # Entries recorded while the walk ran are newer than what it saw
+            found.update(self._index)
+            self._index = found
+            self.total_bytes = sum(size for _, size in found.values())
+            self.scanned = True
+
+    def _record(self, name: str, size: int):
+        with self._lock:
+            previous = self._index.get(name)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._index[name] = [time.time(), size]
+            self.total_bytes += size
+
+    def path(self, name: str) -> Optional[str]:
+        """The file for `name` if it exists, marking it used."""
+        path = self._shard_path(name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None:
+                entry = self._index[name] = [0.0, size]
+                self.total_bytes += size
+            stale = now - entry[0] > ARTIFACT_TOUCH_INTERVAL
+            entry[0] = now
+        if stale:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return path
+
+    def write(self, name: str, data: bytes) -> str:
+        path = self._shard_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._record(name, len(data))
+        return path
+
+    def move_in(self, name: str, src_path: str) -> str:
+        """Move a finished file into the store; the source is gone afterwards."""
+        path = self._shard_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+        self._record(name, os.path.getsize(path))
+        return path
+
+    def remove(self, name: str) -> int:
+        """Delete `name`; returns the bytes freed."""
+        try:
+            os.remove(self._shard_path(name))
+        except OSError:
+            pass
+        with self._lock:
+            entry = self._index.pop(name, None)
+            if entry is None:
+                return 0
+            self.total_bytes -= entry[1]
+            return entry[1]
+
+    def collect(self, now: Optional[float] = None) -> Dict[str, int]:
+        """One garbage collection pass: expire by age, then evict least recently used by size."""
+        if not self.scanned:
+            self.scan()
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        with self._lock:
+            by_last_use = sorted(self._index.items(), key=lambda item: item[1][0])
+        expired = [name for name, (last_used, _) in by_last_use if last_used < now - self.max_age]
+        freed = sum(self.remove(name) for name in expired)
+        evicted = 0
+        for name, _ in by_last_use[len(expired):]:
+            if self.total_bytes <= self.max_bytes:
+                break
+            freed += self.remove(name)
+            evicted += 1
+        self.expired += len(expired)
+        self.evicted += evicted
+        self.freed_bytes += freed
+        self.gc_runs += 1
+        self.last_gc_ms = (time.perf_counter() - started) * 1000
+        return {"expired": len(expired), "evicted": evicted, "freed_bytes": freed}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self._index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_s": self.max_age,
+            "scanned": self.scanned,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "freed_bytes": self.freed_bytes,
+            "gc_runs": self.gc_runs,
+            "last_gc_ms": round(self.last_gc_ms, 1),
+        }
+
+_stores: Dict[str, ArtifactStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(kind: str, factory: Optional[Callable[[], ArtifactStore]] = None) -> ArtifactStore:
+    """Process-wide store for `kind`, so every module shares one index and one quota."""
+    with _stores_lock:
+        if kind not in _stores:
+            _stores[kind] = factory() if factory is not None else ArtifactStore(kind)
+        return _stores[kind]
+
+def collect_all() -> Dict[str, Dict[str, int]]:
+    return {kind: store.collect() for kind, store in list(_stores.items())}
+
+def sweep_legacy_uploads(folder: str, image_store: ArtifactStore, dry_run: bool = False):
+    """
+    Clear what older versions left directly in `folder`: photos move into
+    `image_store`, where retention applies to them; the shared map file,
+    the summary and answer mp3s (no longer reachable by any URL) and
+    abandoned temporary files are deleted. Subdirectories are left alone.
+    Never run by the servers; see the command line at the end of this file.
+    """
+    now = time.time()
+    moved = removed = 0
+    for entry in os.scandir(folder):
+        if not entry.is_file():
+            continue
+        name = entry.name
+        try:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                if dry_run:
+                    print(f"would move   {entry.path}")
+                else:
+                    image_store.move_in(name, entry.path)
+                moved += 1
+            elif name == "leaflet_map.html" or name.endswith(".mp3") or _is_stale_tmp(entry.path, now):
+                if dry_run:
+                    print(f"would remove {entry.path}")
+                else:
+                    os.remove(entry.path)
+                removed += 1
+        except OSError as e:
+            print(f"Could not clear {entry.path}: {str(e)}")
+    verb = "would be" if dry_run else "were"
+    print(f"Legacy uploads: {moved} photos {verb} moved to {image_store.root}, {removed} files {verb} removed")
+
+class ArtifactCollector:
+    """Calls collect_all() every `interval` seconds on a daemon thread."""
+
+    def __init__(self, interval: float = ARTIFACT_GC_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="artifact-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                for kind, result in collect_all().items():
+                    if result["expired"] or result["evicted"]:
+                        print(f"Artifact GC [{kind}]: {result}")
+            except Exception as e:
+                print(f"Artifact GC failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+def artifact_stats(root: str = ARTIFACT_ROOT) -> Dict[str, Any]:
+    """Per-kind usage, quotas and eviction counts, plus the free space on the disk holding `root`."""
+    usage = shutil.disk_usage(root)
+    return {
+        "disk": {"total_bytes": usage.total, "used_bytes": usage.used, "free_bytes": usage.free},
+        "stores": {kind: store.stats() for kind, store in list(_stores.items())},
+    }
+
+if __name__ == "__main__":
+    # One-off cleanup of the files older versions left directly in the uploads folder.
+    # Run from the directory the server runs in:
+    #     python upload_and_summary/artifact_store.py --sweep-legacy uploads [--dry-run]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the artifact stores")
+    parser.add_argument("--sweep-legacy", metavar="FOLDER",
+                        help="Move loose photos in FOLDER into the image store; delete its mp3s and leaflet_map.html")
+    parser.add_argument("--dry-run", action="store_true", help="List what --sweep-legacy would do")
+    args = parser.parse_args()
+    if not args.sweep_legacy:
+        parser.error("nothing to do; pass --sweep-legacy FOLDER")
+    sweep_legacy_uploads(args.sweep_legacy, get_store("images"), dry_run=args.dry_run)
@@ -1,75 +1,128 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 from openai import OpenAI
-from gtts import gTTS
-import os
+from typing import Optional
+import re
 import uuid
 from config import OPENAI_API_KEY
+from executors import io_pool
+from conversation_store import ConversationStore
+from semantic_cache import SemanticCache
+from gazetteer import get_gazetteer
+from tts import audio_extension, get_tts
+from audio_store import audio_url, get_audio_store
 
 # Setup
 router = APIRouter()
 openai = OpenAI(api_key=OPENAI_API_KEY)
 
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+audio_store = get_audio_store()
 
-# 🔁 Temporary memory (in-memory chat history)
-chat_log = []
+# 🔁 Per-session chat history: bounded ring buffers, optionally persisted to SQLite
+conversations = ConversationStore()
+
+# ⚡ Answers to earlier first questions, matched by meaning; skips both OpenAI and TTS
+answer_cache = SemanticCache()
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
 
 # Request schema
 class AskRequest(BaseModel):
     prompt: str
     language: str  # e.g. 'en', 'hi', 'kn'
+    session_id: Optional[str] = None  # issued by the first answer; send it back to continue
+
+def prompt_landmark(prompt: str) -> Optional[str]:
+    # Answers are only shared between prompts about the same landmark
+    record = get_gazetteer().mentioned_in(prompt)
+    return record["id"] if record is not None else None
+
+def cached_answer(prompt: str, language: str, landmark_id: Optional[str]):
+    cached = answer_cache.get(prompt, language, landmark_id)
+    if cached is not None and audio_store.path(cached["audio_id"]) is None:
+        answer_cache.discard(cached)
+        return None
+    return cached
+
+def session_for(session_id: Optional[str]) -> str:
+    if session_id is None:
+        return uuid.uuid4().hex
+    if not SESSION_ID_PATTERN.match(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+    return session_id
 
 @router.post("/api/ask")
-async def ask(request: AskRequest):
+async def ask(request: AskRequest, http_response: Response):
     prompt = request.prompt
     language = request.language
+    session_id = session_for(request.session_id)
+    http_response.headers["X-Session-ID"] = session_id
 
     try:
-        # 🧠 Build context-aware conversation history
+        # 🧠 Build context from this session's latest turns, within the token budget
         messages = [{"role": "system", "content": "You are a helpful multilingual tour guide."}]
+        context = await io_pool.run(conversations.context_messages, session_id)
+        messages.extend(context)
+
+        # ⚡ A question asked without context has one answer for everyone
+        cached = landmark_id = None
+        if not context:
+            landmark_id = await io_pool.run(prompt_landmark, prompt)
+            cached = await io_pool.run(cached_answer, prompt, language, landmark_id)
 
-        # Add current user input
-        if chat_log != []:
-            messages.append({"role": "user", "content": f"{prompt} Use the following for context: Previous prompt={chat_log[0]["prompt"]} Your response to the previous prompt={chat_log[0]["response"]} in language={chat_log[0]["language"]} in detail and in a way that is easy to understand"})
+        if cached is not None:
+            text, audio_id = cached["text"], cached["audio_id"]
         else:
+            # Add current user input
             messages.append({"role": "user", "content": f"{prompt}, answer this in {language} language in detail and in a way that is easy to understand"})
 
-        # 🎯 Call OpenAI with full context
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            max_tokens=500,
-            temperature=0.7
-        )
-        text = response.choices[0].message.content.strip()
-
-        # 🔊 Generate TTS audio using gTTS
-        filename = f"{uuid.uuid4().hex}_{language}.mp3"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        tts = gTTS(text=text, lang=language)
-        tts.save(filepath)
-
-        # 📝 Store in memory
-        chat_log.append({
-            "prompt": prompt,
-            "response": text,
-            "language": language
-        })
+            # 🎯 Call OpenAI with full context
+            response = await io_pool.run(
+                openai.chat.completions.create,
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=500,
+                temperature=0.7
+            )
+            text = response.choices[0].message.content.strip()
+
+            # 🔊 Generate TTS audio, sentences in parallel
+            audio = await io_pool.run(get_tts().synthesize, text, language)
+            audio_id = await io_pool.run(audio_store.put, audio, audio_extension())
+
+            if not context:
+                await io_pool.run(answer_cache.put, prompt, language, {"text": text, "audio_id": audio_id}, landmark_id)
+
+        # 📝 Store in this session's history
+        await io_pool.run(conversations.append, session_id, prompt, text, language)
 
         return {
             "text": text,
-            "audio_url": f"/download_audio/?path={filepath}"
+            "audio_url": audio_url(audio_id),
+            "session_id": session_id,
+            "cached": cached is not None
         }
 
     except Exception as e:
         return {
             "text": f"Error: {str(e)}",
-            "audio_url": None
+            "audio_url": None,
+            "session_id": session_id
         }
 
-# 🧪 Optional: View in-memory history
+# 🧪 A session's history, newest first; pass X-Next-Cursor back as `cursor` for older turns
 @router.get("/api/history")
-async def get_memory_history():
-    return chat_log
+async def get_memory_history(session_id: str, response: Response, limit: int = 20, cursor: Optional[int] = None):
+    session_id = session_for(session_id)
+    turns, next_cursor = await io_pool.run(conversations.history, session_id, max(1, min(limit, 100)), cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return turns
+
+@router.get("/api/ask/cache")
+async def answer_cache_stats():
+    return answer_cache.stats()
+
+@router.get("/api/conversations/stats")
+async def conversation_stats():
+    return conversations.stats()
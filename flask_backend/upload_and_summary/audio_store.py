@@ -0,0 +1,116 @@
+import hashlib
+import re
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .tts import AUDIO_FORMATS
+    from .artifact_store import ARTIFACT_ROOT, ArtifactStore, get_store
+except ImportError:
+    from tts import AUDIO_FORMATS
+    from artifact_store import ARTIFACT_ROOT, ArtifactStore, get_store
+
+# An id names immutable content, so clients and CDNs may keep it for a year
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+AUDIO_CHUNK_BYTES = 64 * 1024
+
+AUDIO_MEDIA_TYPES = {ext: media_type for ext, media_type, _ in AUDIO_FORMATS.values()}
+AUDIO_ID_PATTERN = re.compile(r"^[0-9a-f]{32}\.(%s)$" % "|".join(AUDIO_MEDIA_TYPES))
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+class AudioStore(ArtifactStore):
+    """
+    Generated audio, content-addressed: a file's id is the first 32 hex
+    digits of its SHA-256 plus its extension. An id therefore always names
+    the same bytes, which makes it safe to cache forever, and it can only
+    ever resolve to a file inside the store, whatever a client sends.
+    Retention and quota are the "audio" artifact policy; an evicted id
+    simply stops resolving and its owner generates the audio again.
+    """
+
+    def __init__(self, root: str = ARTIFACT_ROOT, **policy):
+        super().__init__("audio", root, **policy)
+
+    @staticmethod
+    def _valid(audio_id) -> bool:
+        return isinstance(audio_id, str) and AUDIO_ID_PATTERN.match(audio_id) is not None
+
+    def path(self, audio_id: str) -> Optional[str]:
+        """The file for `audio_id`, or None if the id is malformed or unknown."""
+        if not self._valid(audio_id):
+            return None
+        return super().path(audio_id)
+
+    def put(self, audio: bytes, ext: str) -> str:
+        audio_id = f"{hashlib.sha256(audio).hexdigest()[:32]}.{ext}"
+        if self.path(audio_id) is None:
+            self.write(audio_id, audio)
+        return audio_id
+
+    def put_file(self, src_path: str, ext: str) -> str:
+        """Move a finished file into the store; the source is gone afterwards."""
+        digest = hashlib.sha256()
+        with open(src_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        audio_id = f"{digest.hexdigest()[:32]}.{ext}"
+        self.move_in(audio_id, src_path)
+        return audio_id
+
+    def remove(self, audio_id: str) -> int:
+        return super().remove(audio_id) if self._valid(audio_id) else 0
+
+def get_audio_store() -> AudioStore:
+    """The process-wide AudioStore, shared by summaries and answers so one quota covers both."""
+    return get_store("audio", AudioStore)
+
+def audio_url(audio_id: str) -> str:
+    return f"/audio/{audio_id}"
+
+def audio_etag(audio_id: str) -> str:
+    # Strong: the id is a hash of the exact bytes
+    return f'"{audio_id}"'
+
+def media_type_for(audio_id: str) -> str:
+    return AUDIO_MEDIA_TYPES[audio_id.rsplit(".", 1)[1]]
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end inclusive) for a single `bytes=` range, or None to send the
+    whole file (no header, several ranges, or a range that is not valid,
+    such as start > end, which RFC 7233 says to ignore). Raises
+    RangeNotSatisfiable when the range starts past the end.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            # bytes=-500: the final 500 bytes
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if first and last and start > int(last):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(f"bytes */{size}")
+    return start, end
+
+def iter_file_range(f: BinaryIO, start: int, end: int, chunk_size: int = AUDIO_CHUNK_BYTES) -> Iterator[bytes]:
+    """Bytes start..end of an open file, which is closed once they are sent."""
+    with f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,131 @@
+"""
+Property check and benchmark for geo.py.
+
+Run from this directory:
+    python benchmark_geo.py --check [--trials 200000]
+    python benchmark_geo.py [--sizes 10000,1000000] [--queries 200]
+
+The check compares haversine_km with an independent reference (chord length
+between unit vectors) on random, near-identical, antipodal and
+antimeridian-crossing pairs, and GeoIndex radius / k-nearest answers with a
+brute-force scan.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, GeoIndex, haversine_km, haversine_km_scalar
+
+def reference_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance from the straight chord between the two points."""
+    def unit(lat, lng):
+        lat, lng = np.radians(lat), np.radians(lng)
+        return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)])
+    chord = np.linalg.norm(unit(lat1, lng1) - unit(lat2, lng2), axis=0)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+def random_points(rng, n):
+    # Uniform on the sphere, not in lat/lng
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    lngs = rng.uniform(-180, 180, n)
+    return lats, lngs
+
+def check(trials, seed):
+    rng = np.random.default_rng(seed)
+    lat1, lng1 = random_points(rng, trials)
+    lat2, lng2 = random_points(rng, trials)
+    # Near-identical, antipodal and antimeridian pairs
+    lat2[: trials // 4] = lat1[: trials // 4] + rng.normal(0, 1e-4, trials // 4)
+    lat2[trials // 4: trials // 2] = -lat1[trials // 4: trials // 2]
+    lng2[trials // 4: trials // 2] = (lng1[trials // 4: trials // 2] + 180 + rng.normal(0, 1e-3, trials // 4)) % 360 - 180
+    lng1[trials // 2: 3 * trials // 4] = rng.uniform(179, 180, trials // 4)
+    lng2[trials // 2: 3 * trials // 4] = rng.uniform(-180, -179, trials // 4)
+
+    ours = haversine_km(lat1, lng1, lat2, lng2)
+    expected = reference_km(lat1, lng1, lat2, lng2)
+    # Absolute error: the chord formula loses digits near antipodes, haversine near 0
+    error = np.abs(ours - expected)
+    assert error.max() < 1e-3, f"haversine_km off by {error.max():.6f} km"
+    for i in rng.integers(0, trials, 1000):
+        assert math.isclose(haversine_km_scalar(lat1[i], lng1[i], lat2[i], lng2[i]), ours[i], abs_tol=1e-9)
+    assert abs(haversine_km(0, 0, 0, 1) - 2 * math.pi * EARTH_RADIUS_KM / 360) < 1e-9
+    print(f"haversine: {trials} pairs, max |error| vs chord reference {error.max() * 1e9:.1f} µm")
+
+    for label, cell_km in (("dense", 2.0), ("coarse", 50.0)):
+        index = GeoIndex(cell_km)
+        lats, lngs = random_points(rng, 20000)
+        # Add clusters around a pole and the antimeridian
+        lats = np.concatenate([lats, rng.uniform(89.5, 90, 500), rng.uniform(-10, 10, 500)])
+        lngs = np.concatenate([lngs, rng.uniform(-180, 180, 500), rng.uniform(179.8, 180.2, 500) % 360 - 180])
+        index.extend(lats, lngs, list(range(len(lats))))
+        for _ in range(300):
+            qlat, qlng = float(rng.choice(lats) + rng.normal(0, 0.5)), float(rng.uniform(-180, 180))
+            qlat = max(-90.0, min(90.0, qlat))
+            radius = float(rng.choice([1, 10, 100, 1000, 5000]))
+            distances = haversine_km(qlat, qlng, lats, lngs)
+            expected_ids = set(np.flatnonzero(distances <= radius).tolist())
+            got = index.within(qlat, qlng, radius)
+            assert {item for item, _ in got} == expected_ids, (label, qlat, qlng, radius)
+            k = int(rng.integers(1, 20))
+            got = [d for _, d in index.nearest(qlat, qlng, k)]
+            assert np.allclose(got, np.sort(distances)[:k]), (label, qlat, qlng, k)
+        print(f"GeoIndex ({label}, {cell_km} km cells): radius and k-nearest match brute force")
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark(sizes, queries, seed):
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        # POI-like data: dense around a few cities rather than uniform
+        centers = np.array([[27.17, 78.04], [28.61, 77.21], [19.07, 72.88], [12.97, 77.59], [22.57, 88.36]])
+        picks = centers[rng.integers(0, len(centers), n)]
+        lats = picks[:, 0] + rng.normal(0, 0.3, n)
+        lngs = picks[:, 1] + rng.normal(0, 0.3, n)
+        qlat, qlng = 28.6, 77.2
+        print(f"{n} points")
+
+        if n <= 100000:
+            seconds, _ = timed(lambda: [haversine_km_scalar(qlat, qlng, a, b) for a, b in zip(lats, lngs)], 1)
+            print(f"  scalar loop, one origin       {seconds * 1000:9.2f} ms")
+        seconds, _ = timed(lambda: haversine_km(qlat, qlng, lats, lngs))
+        print(f"  vectorized, one origin        {seconds * 1000:9.2f} ms")
+
+        index = GeoIndex()
+        # The index sorts lazily, so the build includes one (empty) query
+        seconds, _ = timed(lambda: (index.extend(lats, lngs), index.within(0.0, 0.0, 0.0)), 1)
+        print(f"  GeoIndex build                {seconds * 1000:9.2f} ms")
+
+        origins = [(float(lat), float(lng)) for lat, lng in
+                   zip(lats[rng.integers(0, n, queries)], lngs[rng.integers(0, n, queries)])]
+        seconds, _ = timed(lambda: [np.flatnonzero(haversine_km(a, b, lats, lngs) <= 3) for a, b in origins], 1)
+        print(f"  3 km radius, full scan        {seconds * 1000 / queries:9.3f} ms/query")
+        seconds, _ = timed(lambda: [index.within(a, b, 3) for a, b in origins], 1)
+        print(f"  3 km radius, GeoIndex         {seconds * 1000 / queries:9.3f} ms/query")
+        seconds, _ = timed(lambda: [np.argpartition(haversine_km(a, b, lats, lngs), 10)[:10] for a, b in origins], 1)
+        print(f"  10 nearest, full scan         {seconds * 1000 / queries:9.3f} ms/query")
+        seconds, _ = timed(lambda: [index.nearest(a, b, 10) for a, b in origins], 1)
+        print(f"  10 nearest, GeoIndex          {seconds * 1000 / queries:9.3f} ms/query")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark geo.py")
+    parser.add_argument("--check", action="store_true", help="Run the property checks instead of the benchmark")
+    parser.add_argument("--trials", type=int, default=200000)
+    parser.add_argument("--sizes", default="10000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.check:
+        check(args.trials, args.seed)
+    else:
+        benchmark([int(n) for n in args.sizes.split(",")], args.queries, args.seed)
+
+if __name__ == "__main__":
+    main()
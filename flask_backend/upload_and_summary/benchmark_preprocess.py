@@ -0,0 +1,73 @@
+"""
+ms/image for the CNN preprocessing: the original torchvision pipeline vs the
+draft-decode + lookup-normalize path, one image at a time and in batches.
+
+Run from this directory:
+    python benchmark_preprocess.py path/to/sample/images [--repeat 3] [--batch 8]
+"""
+import os
+import argparse
+import time
+
+import torch
+
+from landmark_detection import preprocess_batch, preprocess_image, preprocess_image_reference
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+def load_samples(folder):
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(folder, name), "rb") as f:
+                samples.append((name, f.read()))
+    return samples
+
+def time_per_image(fn, samples, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(samples)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000 / len(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark landmark image preprocessing")
+    parser.add_argument("folder", help="Directory of sample images (e.g. full-size phone photos)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the fastest is reported")
+    parser.add_argument("--batch", type=int, default=8, help="Batch size for the pooled variant")
+    args = parser.parse_args()
+
+    samples = load_samples(args.folder)
+    if not samples:
+        raise SystemExit(f"No images found in {args.folder}")
+    data = [content for _, content in samples]
+    torch.set_num_threads(1)
+
+    def reference(items):
+        for item in items:
+            preprocess_image_reference(item)
+
+    def fast(items):
+        for item in items:
+            preprocess_image(item)
+
+    def fast_batched(items):
+        for i in range(0, len(items), args.batch):
+            preprocess_batch(items[i:i + args.batch])
+
+    print(f"{len(samples)} images, best of {args.repeat} runs")
+    baseline = time_per_image(reference, data, args.repeat)
+    print(f"  torchvision pipeline      {baseline:8.2f} ms/image")
+    for label, fn in (("draft + fused normalize", fast), (f"  ... batched x{args.batch}", fast_batched)):
+        ms = time_per_image(fn, data, args.repeat)
+        print(f"  {label:<25} {ms:8.2f} ms/image  ({baseline / ms:.1f}x)")
+
+    # Draft decoding resamples from a smaller image, so values differ slightly
+    diffs = [(preprocess_image(content) - preprocess_image_reference(content)).abs() for content in data]
+    print(f"  mean |diff| vs reference  {sum(d.mean().item() for d in diffs) / len(diffs):.4f}")
+    print(f"  max  |diff| vs reference  {max(d.max().item() for d in diffs):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Sessions kept in memory; the least recently used one is dropped past this
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+# Turns kept in memory per session (a ring buffer)
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+# Turns kept on disk per session when SQLite persistence is on
+CONVERSATION_DB_MAX_TURNS = int(os.getenv("CONVERSATION_DB_MAX_TURNS", "200"))
+# Optional SQLite file; empty keeps conversations in memory only
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "")
+# Previous turns sent to the model, and the prompt tokens they may take
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer: about four ASCII characters per
+    token, and one token per character for other scripts (Devanagari,
+    Kannada, Tamil...), which tokenize far less densely.
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+class ConversationStore:
+    """
+    Per-session chat turns. Each session is a ring buffer of its last
+    CONVERSATION_MAX_TURNS turns, and sessions are LRU-evicted past
+    CONVERSATION_MAX_SESSIONS, so memory stays flat however many users
+    come and go. With a SQLite path, turns are also written to disk, and
+    an evicted or pre-restart session is reloaded on its next request.
+    """
+
+    def __init__(self, db_path: str = CONVERSATION_DB, max_sessions: int = CONVERSATION_MAX_SESSIONS,
+                 max_turns: int = CONVERSATION_MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.evictions = 0
+        self.loads = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_turns (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    prompt TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    language TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+            """)
+            self._db.commit()
+
+    def _load(self, session_id: str) -> Deque[Dict[str, Any]]:
+        # Caller holds the lock
+        turns = self._sessions.get(session_id)
+        if turns is not None:
+            self._sessions.move_to_end(session_id)
+            return turns
+        turns = deque(maxlen=self.max_turns)
+        if self._db is not None:
+            rows = self._db.execute(
+                "SELECT seq, prompt, response, language, created_at FROM conversation_turns "
+                "WHERE session_id = ? ORDER BY seq DESC LIMIT ?", (session_id, self.max_turns)
+            ).fetchall()
+            if rows:
+                self.loads += 1
+            turns.extend(self._turn(row) for row in reversed(rows))
+        self._sessions[session_id] = turns
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        return turns
+
+    @staticmethod
+    def _turn(row: Tuple) -> Dict[str, Any]:
+        seq, prompt, response, language, created_at = row
+        return {"seq": seq, "prompt": prompt, "response": response, "language": language, "created_at": created_at}
+
+    def append(self, session_id: str, prompt: str, response: str, language: str) -> Dict[str, Any]:
+        with self._lock:
+            turns = self._load(session_id)
+            turn = {"seq": turns[-1]["seq"] + 1 if turns else 1, "prompt": prompt, "response": response,
+                    "language": language, "created_at": time.time()}
+            turns.append(turn)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO conversation_turns (session_id, seq, prompt, response, language, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, turn["seq"], prompt, response, language, turn["created_at"])
+                )
+                self._db.execute("DELETE FROM conversation_turns WHERE session_id = ? AND seq <= ?",
+                                 (session_id, turn["seq"] - CONVERSATION_DB_MAX_TURNS))
+                self._db.commit()
+            return turn
+
+    def context_messages(self, session_id: str, max_turns: int = CONTEXT_MAX_TURNS,
+                         token_budget: int = CONTEXT_TOKEN_BUDGET) -> List[Dict[str, str]]:
+        """
+        The latest turns as chat messages, oldest first: at most `max_turns`,
+        and only as many as fit in `token_budget`, counted from the newest.
+        """
+        with self._lock:
+            recent = list(self._load(session_id))[-max_turns:] if max_turns > 0 else []
+        messages: List[Dict[str, str]] = []
+        used = 0
+        for turn in reversed(recent):
+            cost = estimate_tokens(turn["prompt"]) + estimate_tokens(turn["response"])
+            if used + cost > token_budget:
+                break
+            used += cost
+            messages[:0] = [{"role": "user", "content": turn["prompt"]},
+                            {"role": "assistant", "content": turn["response"]}]
+        return messages
+
+    def history(self, session_id: str, limit: int = 20,
+                before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        A page of turns, newest first, older than seq `before`, and the
+        cursor for the next page (None on the last one). Reads from disk
+        when persisted, so the history reaches past the in-memory buffer.
+        """
+        with self._lock:
+            if self._db is not None:
+                rows = self._db.execute(
+                    "SELECT seq, prompt, response, language, created_at FROM conversation_turns "
+                    "WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                    (session_id, before if before is not None else 2 ** 62, limit + 1)
+                ).fetchall()
+                page = [self._turn(row) for row in rows]
+            else:
+                turns = self._sessions.get(session_id) or ()
+                page = [turn for turn in reversed(turns) if before is None or turn["seq"] < before][:limit + 1]
+        if len(page) > limit:
+            return page[:limit], page[limit - 1]["seq"]
+        return page, None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = sum(len(t) for t in self._sessions.values())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "turns_in_memory": turns,
+                "evictions": self.evictions,
+                "loads_from_disk": self.loads,
+                "persistent": self._db is not None,
+            }
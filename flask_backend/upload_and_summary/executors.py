@@ -0,0 +1,129 @@
+import os
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Blocking network calls: Vision, OpenAI, gTTS, Places, Supabase
+IO_POOL_WORKERS = int(os.getenv("IO_POOL_WORKERS", "32"))
+IO_POOL_QUEUE = int(os.getenv("IO_POOL_QUEUE", "128"))
+IO_POOL_TIMEOUT = float(os.getenv("IO_POOL_TIMEOUT", "60"))
+
+# CNN forward passes; every worker process holds its own copy of the weights
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "1"))
+CPU_POOL_QUEUE = int(os.getenv("CPU_POOL_QUEUE", "16"))
+CPU_POOL_TIMEOUT = float(os.getenv("CPU_POOL_TIMEOUT", "30"))
+
+class PoolError(Exception):
+    pass
+
+class PoolSaturated(PoolError):
+    """Raised instead of queueing when a pool already has `max_queue` jobs waiting."""
+
+class PoolTimeout(PoolError):
+    """Raised when a job does not finish within the pool's timeout."""
+
+class BoundedPool:
+    """
+    An executor with a cap on outstanding jobs and a per-job timeout, so
+    blocking work runs off the event loop without unbounded queueing.
+
+    A slot is held from submission until the job really finishes (not when
+    the caller stops waiting), so timed-out jobs still count against the cap.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int, timeout: float,
+                 initializer: Optional[Callable] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        # Set before the first job to preload state in every worker
+        self.initializer = initializer
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.kind == "thread":
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers,
+                            thread_name_prefix=f"{self.name}-pool",
+                            initializer=self.initializer,
+                        )
+                    else:
+                        # spawn rather than fork: torch and the event loop's threads don't survive fork
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=self.initializer,
+                        )
+        return self._executor
+
+    def _release(self, _future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` in the pool and await its result."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PoolSaturated(f"{self.name} pool is saturated")
+
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            job = self.executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        job.add_done_callback(self._release)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(job), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeout(f"{self.name} pool job timed out after {timeout or self.timeout}s")
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout_s": self.timeout,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+io_pool = BoundedPool("io", "thread", IO_POOL_WORKERS, IO_POOL_QUEUE, IO_POOL_TIMEOUT)
+cpu_pool = BoundedPool("cpu", "process", CPU_POOL_WORKERS, CPU_POOL_QUEUE, CPU_POOL_TIMEOUT)
@@ -0,0 +1,125 @@
+import os
+import difflib
+import json
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .geo import GeoIndex
+except ImportError:
+    from geo import GeoIndex
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         "data", "landmarks.json"))
+# Minimum difflib similarity for a fuzzy name match
+GAZETTEER_FUZZY_CUTOFF = float(os.getenv("GAZETTEER_FUZZY_CUTOFF", "0.8"))
+
+_NUKTA = "\u093c"
+_CHANDRABINDU, _ANUSVARA = "\u0901", "\u0902"
+
+def name_key(name: str) -> str:
+    """
+    Compact match key: case, accents, punctuation and spacing are ignored,
+    so 'tajmahal', 'Taj Mahal' and 'TAJ-MAHAL' share a key. Devanagari keeps
+    its vowel signs; only the nukta and chandrabindu/anusvara spelling
+    variants are folded.
+    """
+    name = unicodedata.normalize("NFKD", name.casefold())
+    # Drop Latin combining accents (U+0300..U+036F) but keep Indic vowel signs
+    name = "".join(ch for ch in name if not "\u0300" <= ch <= "\u036f" and ch != _NUKTA)
+    name = name.replace(_CHANDRABINDU, _ANUSVARA)
+    return "".join(ch for ch in unicodedata.normalize("NFC", name) if unicodedata.category(ch)[0] in "LNM")
+
+class Gazetteer:
+    """
+    The landmark records from `landmarks.json`: canonical id, display name,
+    CNN class key, coordinates and aliases. Names resolve by exact alias key
+    first, then by containment and fuzzy similarity; coordinates resolve
+    through a GeoIndex.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self._by_id = {record["id"]: record for record in records}
+        self._by_class_key = {record["class_key"]: record for record in records if record.get("class_key")}
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            for name in [record["id"], record["name"], record.get("class_key") or "", *record.get("aliases", [])]:
+                key = name_key(name)
+                if key:
+                    self._by_key.setdefault(key, record)
+        self._keys = list(self._by_key)
+        self._index = GeoIndex(cell_km=25)
+        self._index.extend([r["lat"] for r in records], [r["lng"] for r in records], records)
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["landmarks"])
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, landmark_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(landmark_id)
+
+    def by_class_key(self, class_key: str) -> Optional[Dict[str, Any]]:
+        return self._by_class_key.get(class_key)
+
+    def mentioned_in(self, text: str) -> Optional[Dict[str, Any]]:
+        """The record whose name appears in `text` ('How old is the Taj Mahal?'), without fuzzy matching."""
+        key = name_key(text or "")
+        if not key:
+            return None
+        record = self._by_key.get(key)
+        if record is not None:
+            return record
+        # 'Taj Mahal, Agra' or 'The Qutub Minar complex': a known name inside a longer one
+        contained = [k for k in self._keys if len(k) >= 6 and k in key]
+        return self._by_key[max(contained, key=len)] if contained else None
+
+    def resolve(self, name: str) -> Optional[Dict[str, Any]]:
+        """The record a free-text name (any alias or script) refers to, or None."""
+        record = self.mentioned_in(name)
+        if record is not None:
+            return record
+        key = name_key(name or "")
+        if not key:
+            return None
+        close = difflib.get_close_matches(key, self._keys, n=1, cutoff=GAZETTEER_FUZZY_CUTOFF)
+        return self._by_key[close[0]] if close else None
+
+    def nearest(self, lat: float, lng: float, k: int = 1,
+                max_km: Optional[float] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Up to `k` (record, distance km) closest to (lat, lng), optionally within `max_km`."""
+        found = self._index.nearest(lat, lng, k)
+        if max_km is not None:
+            found = [(record, distance) for record, distance in found if distance <= max_km]
+        return found
+
+    def identify(self, name: Optional[str] = None, lat: Optional[float] = None, lng: Optional[float] = None,
+                 max_km: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Record for a detection: by name, else the landmark within `max_km` of its coordinates."""
+        record = self.resolve(name) if name else None
+        if record is None and lat is not None and lng is not None:
+            nearby = self.nearest(lat, lng, 1, max_km=max_km)
+            record = nearby[0][0] if nearby else None
+        return record
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    """Process-wide gazetteer, loaded from GAZETTEER_PATH on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+def landmark_summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The public fields of a record, as returned by the API."""
+    return {key: record[key] for key in ("id", "name", "lat", "lng", "city", "aliases") if key in record}
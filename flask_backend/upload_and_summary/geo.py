@@ -0,0 +1,200 @@
+import os
+import math
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+# Grid cell edge for GeoIndex; about the radius of a typical nearby-places query
+GEO_INDEX_CELL_KM = float(os.getenv("GEO_INDEX_CELL_KM", "2"))
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance in km. Arguments may be scalars or NumPy arrays
+    (broadcast against each other), so one call covers every candidate:
+    haversine_km(lat, lng, poi_lats, poi_lngs).
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    # Rounding can push `a` just past 1 for antipodal points
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def haversine_km_scalar(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Same formula with `math`, for one pair of points."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, Optional[float]]:
+    """
+    (lat_min, lat_max, lng half-width in degrees) enclosing every point within
+    `radius_km`. The half-width is None when the circle reaches a pole, in
+    which case every longitude qualifies.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    lat_min = lat - math.degrees(angular)
+    lat_max = lat + math.degrees(angular)
+    if lat_min <= -90 or lat_max >= 90:
+        return max(lat_min, -90.0), min(lat_max, 90.0), None
+    ratio = math.sin(angular) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return lat_min, lat_max, None
+    return lat_min, lat_max, math.degrees(math.asin(ratio))
+
+class GeoIndex:
+    """
+    Points bucketed in a regular lat/lng grid, stored CSR-style: point ids
+    sorted by cell key, so the points of a run of cells in one grid row are
+    one contiguous slice found with a binary search. Radius queries gather
+    the rows overlapping the query's bounding box and compute exact
+    distances for those points in one vectorized call. k-nearest queries
+    widen a block of cells (counting, not gathering) until it holds k
+    points; if the k-th distance reaches past the block they finish with an
+    exact radius query.
+    """
+
+    def __init__(self, cell_km: float = GEO_INDEX_CELL_KM):
+        # A whole number of columns spans 360 degrees exactly, so wrapped column
+        # numbers at the antimeridian land on the right cells
+        self._cols = max(1, int(round(360 * KM_PER_DEG_LAT / cell_km)))
+        self.cell_deg = 360 / self._cols
+        self._rows = int(math.ceil(180 / self.cell_deg))
+        self._lat_buffer = array("d")
+        self._lng_buffer = array("d")
+        self.items: List[Any] = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._lats = np.empty(0)
+        self._lngs = np.empty(0)
+        self._sorted_keys = np.empty(0, dtype=np.int64)
+        self._order = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _row(self, lat: float) -> int:
+        return min(int((lat + 90) / self.cell_deg), self._rows - 1)
+
+    def _col(self, lng: float) -> int:
+        return int(((lng + 180) % 360) / self.cell_deg) % self._cols
+
+    def add(self, lat: float, lng: float, item: Any = None) -> int:
+        with self._lock:
+            self._lat_buffer.append(lat)
+            self._lng_buffer.append(lng)
+            self.items.append(item)
+            self._dirty = True
+            return len(self.items) - 1
+
+    def extend(self, lats: Sequence[float], lngs: Sequence[float], items: Optional[Sequence[Any]] = None):
+        with self._lock:
+            self._lat_buffer.extend(np.asarray(lats, dtype=np.float64).tolist())
+            self._lng_buffer.extend(np.asarray(lngs, dtype=np.float64).tolist())
+            self.items.extend(items if items is not None else [None] * len(lats))
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._lat_buffer = array("d")
+            self._lng_buffer = array("d")
+            self.items = []
+            self._dirty = True
+
+    def _ensure_sorted(self):
+        # Re-sorted lazily, so a burst of adds costs one sort at the next query
+        if not self._dirty:
+            return
+        self._lats = np.array(self._lat_buffer, dtype=np.float64)
+        self._lngs = np.array(self._lng_buffer, dtype=np.float64)
+        rows = np.minimum(((self._lats + 90) / self.cell_deg).astype(np.int64), self._rows - 1)
+        cols = (((self._lngs + 180) % 360) / self.cell_deg).astype(np.int64) % self._cols
+        keys = rows * self._cols + cols
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+        self._dirty = False
+
+    def _slices(self, row_min: int, row_max: int, col_min: int, col_max: int):
+        """(starts, ends) into the sorted ids for a cell block; columns wrap at the antimeridian."""
+        rows = np.arange(max(row_min, 0), min(row_max, self._rows - 1) + 1, dtype=np.int64)
+        if col_max - col_min + 1 >= self._cols:
+            segments = [(0, self._cols - 1)]
+        else:
+            first, last = col_min % self._cols, col_max % self._cols
+            segments = [(first, last)] if first <= last else [(first, self._cols - 1), (0, last)]
+        lows = np.concatenate([rows * self._cols + lo for lo, _ in segments])
+        highs = np.concatenate([rows * self._cols + hi for _, hi in segments])
+        return (np.searchsorted(self._sorted_keys, lows, "left"),
+                np.searchsorted(self._sorted_keys, highs, "right"))
+
+    def _gather(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        parts = [self._order[a:b] for a, b in zip(starts.tolist(), ends.tolist()) if b > a]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _box_candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        lat_min, lat_max, half_width = bounding_box(lat, lng, radius_km)
+        if half_width is None:
+            col_min, col_max = 0, self._cols - 1
+        else:
+            col_min = int(math.floor((lng - half_width + 180) / self.cell_deg))
+            col_max = int(math.floor((lng + half_width + 180) / self.cell_deg))
+        return self._gather(*self._slices(self._row(lat_min), self._row(lat_max), col_min, col_max))
+
+    def _block_reach_km(self, lat: float, lng: float, row: int, col: int, ring: int) -> float:
+        """Distance from (lat, lng) to the nearest edge of the block `ring` cells around its cell."""
+        lat_low = (row - ring) * self.cell_deg - 90
+        lat_high = (row + ring + 1) * self.cell_deg - 90
+        reach = min(lat - lat_low if lat_low > -90 else math.inf,
+                    lat_high - lat if lat_high < 90 else math.inf) * KM_PER_DEG_LAT
+        if 2 * ring + 1 < self._cols:
+            lng_low = (col - ring) * self.cell_deg - 180
+            lng_offset = min(((lng + 180) % 360 - 180) - lng_low, lng_low + (2 * ring + 1) * self.cell_deg
+                             - ((lng + 180) % 360 - 180))
+            if lng_offset < 90:
+                # Distance to a meridian (a great circle) is the cross-track distance
+                cross = math.asin(min(1.0, math.cos(math.radians(lat)) * math.sin(math.radians(lng_offset))))
+                reach = min(reach, cross * EARTH_RADIUS_KM)
+        return reach
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Any, float]]:
+        """(item, distance km) for every point within `radius_km`, nearest first."""
+        with self._lock:
+            self._ensure_sorted()
+            indices = self._box_candidates(lat, lng, radius_km)
+            return self._ranked(lat, lng, indices, radius_km=radius_km)
+
+    def _ranked(self, lat, lng, indices, radius_km=None, k=None) -> List[Tuple[Any, float]]:
+        if not len(indices):
+            return []
+        distances = haversine_km(lat, lng, self._lats[indices], self._lngs[indices])
+        if radius_km is not None:
+            keep = distances <= radius_km
+            indices, distances = indices[keep], distances[keep]
+        if k is not None and k < len(distances):
+            keep = np.argpartition(distances, k - 1)[:k]
+            indices, distances = indices[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return [(self.items[i], float(d)) for i, d in zip(indices[order].tolist(), distances[order].tolist())]
+
+    def nearest(self, lat: float, lng: float, k: int = 1) -> List[Tuple[Any, float]]:
+        """The `k` closest (item, distance km), nearest first."""
+        if k <= 0 or not self.items:
+            return []
+        with self._lock:
+            self._ensure_sorted()
+            row, col = self._row(lat), self._col(((lng + 180) % 360) - 180)
+            ring = 1
+            while True:
+                starts, ends = self._slices(row - ring, row + ring, col - ring, col + ring)
+                covers_all = (2 * ring + 1 >= self._rows) and (2 * ring + 1 >= self._cols)
+                if int((ends - starts).sum()) >= min(k, len(self.items)) or covers_all:
+                    break
+                ring *= 2
+            nearest = self._ranked(lat, lng, self._gather(starts, ends), k=k)
+            if len(nearest) == k and nearest[-1][1] <= self._block_reach_km(lat, lng, row, col, ring):
+                return nearest
+        # Closer points may sit just outside the block; an exact radius query settles it
+        kth = nearest[-1][1] if len(nearest) == k else math.pi * EARTH_RADIUS_KM
+        return self.within(lat, lng, kth * (1 + 1e-9) + 1e-9)[:k]
@@ -0,0 +1,129 @@
+import os
+import io
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+
+# Recently classified images remembered for near-duplicate lookups
+PHASH_CACHE_SIZE = int(os.getenv("PHASH_CACHE_SIZE", "20000"))
+# Max differing bits (out of 64) for two photos to count as the same shot
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+
+HASH_BITS = 64
+
+def dhash(image_source, hash_size: int = 8) -> int:
+    """
+    64-bit difference hash: shrink to 9x8 greyscale and record whether each
+    pixel is brighter than its right neighbour. Robust to rescaling,
+    recompression and small exposure changes.
+    """
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image_source = io.BytesIO(image_source)
+    image = image_source if isinstance(image_source, Image.Image) else Image.open(image_source)
+    # JPEG draft mode decodes at 1/2..1/8 scale, far cheaper than a full decode
+    image.draft("L", (hash_size * 8, hash_size * 8))
+    image = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(image.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class PerceptualHashIndex:
+    """
+    Bounded LRU map from image hash to detection result with Hamming-radius
+    lookup via multi-index hashing: the 64 bits are cut into
+    `max_distance + 1` chunks, and any hash within `max_distance` bits must
+    match the query exactly on at least one chunk (pigeonhole). Only hashes
+    sharing a chunk are compared, so lookups stay cheap as the index grows.
+    """
+
+    def __init__(self, max_size: int = PHASH_CACHE_SIZE, max_distance: int = PHASH_MAX_DISTANCE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        chunk_count = max_distance + 1
+        bounds = [round(i * HASH_BITS / chunk_count) for i in range(chunk_count + 1)]
+        self._chunks: List[Tuple[int, int]] = [
+            (start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])
+        ]
+        self._tables: List[Dict[int, set]] = [{} for _ in self._chunks]
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.exact_hits = 0
+        self.evictions = 0
+
+    def _chunk_values(self, value: int):
+        for start, mask in self._chunks:
+            yield (value >> start) & mask
+
+    def lookup(self, value: int) -> Optional[Tuple[Any, int]]:
+        """Closest cached (result, distance) within `max_distance`, or None."""
+        with self._lock:
+            self.lookups += 1
+            if value in self._entries:
+                self._entries.move_to_end(value)
+                self.hits += 1
+                self.exact_hits += 1
+                return self._entries[value], 0
+
+            best = None
+            best_distance = self.max_distance + 1
+            seen = set()
+            for table, chunk in zip(self._tables, self._chunk_values(value)):
+                for candidate in table.get(chunk, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = hamming_distance(value, candidate)
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best], best_distance
+
+    def add(self, value: int, result: Any):
+        with self._lock:
+            if value in self._entries:
+                self._entries[value] = result
+                self._entries.move_to_end(value)
+                return
+            self._entries[value] = result
+            for table, chunk in zip(self._tables, self._chunk_values(value)):
+                table.setdefault(chunk, set()).add(value)
+            while len(self._entries) > self.max_size:
+                oldest, _ = self._entries.popitem(last=False)
+                self._unindex(oldest)
+                self.evictions += 1
+
+    def _unindex(self, value: int):
+        for table, chunk in zip(self._tables, self._chunk_values(value)):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del table[chunk]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "evictions": self.evictions,
+        }
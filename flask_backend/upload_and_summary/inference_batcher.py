@@ -0,0 +1,124 @@
+import os
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+# Largest number of images run through the CNN in one forward pass
+MAX_BATCH_SIZE = int(os.getenv("LANDMARK_BATCH_SIZE", "8"))
+# How long the first request of a batch waits for others to join it
+MAX_WAIT_MS = float(os.getenv("LANDMARK_BATCH_WAIT_MS", "10"))
+
+class InferenceBatcher:
+    """
+    Dynamic micro-batching in front of a batched predict function.
+
+    Concurrent `submit` calls are queued; a single worker task collects up to
+    `max_batch_size` items (or whatever arrived within `max_wait_ms` of the
+    first one), runs `predict_batch` once off the event loop and hands each
+    caller its own result. `runner(fn, inputs)` decides where the batch runs,
+    e.g. a process pool; by default it is the loop's thread pool. While a
+    batch is running, new requests pile up in the queue, so batches grow with
+    load without adding latency when idle.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Any]], Sequence[Any]],
+                 max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+                 runner: Optional[Callable[[Callable, List[Any]], Awaitable[Sequence[Any]]]] = None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.runner = runner
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_size_counts = {size: 0 for size in range(1, self.max_batch_size + 1)}
+        self.total_queue_wait_s = 0.0
+        self.total_inference_s = 0.0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one input and wait for its own prediction."""
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting before sleeping on the queue
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            inputs = [item for item, _, _ in batch]
+            started = time.perf_counter()
+            self.total_queue_wait_s += sum(started - queued_at for _, _, queued_at in batch)
+
+            try:
+                if self.runner is not None:
+                    results = await self.runner(self.predict_batch, inputs)
+                else:
+                    results = await asyncio.get_running_loop().run_in_executor(None, self.predict_batch, inputs)
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self.total_inference_s += time.perf_counter() - started
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_size_counts[len(batch)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        avg_batch = self.items / self.batches if self.batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": round(avg_batch, 2),
+            "avg_batch_fill": round(avg_batch / self.max_batch_size, 3),
+            "batch_size_histogram": self.batch_size_counts,
+            "avg_queue_wait_ms": round(self.total_queue_wait_s * 1000 / self.items, 2) if self.items else 0.0,
+            "avg_inference_ms": round(self.total_inference_s * 1000 / self.batches, 2) if self.batches else 0.0,
+        }
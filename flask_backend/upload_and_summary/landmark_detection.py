@@ -1,4 +1,9 @@
 import os
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import torch
 import torch.nn as nn
 import torchvision.transforms as transforms
@@ -7,14 +12,39 @@ from torchvision.models import resnet50
 from PIL import Image
 from google.cloud import vision
 from PIL.ExifTags import TAGS, GPSTAGS
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .gazetteer import get_gazetteer
+except ImportError:
+    from gazetteer import get_gazetteer
+
+def _open_image(image_source):
+    """PIL image from a path, a file object or the raw upload bytes."""
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image_source = io.BytesIO(image_source)
+    return Image.open(image_source)
+
+# One gRPC channel for the whole process instead of one per request
+_vision_client = None
+
+def get_vision_client():
+    global _vision_client
+    if _vision_client is None:
+        _vision_client = vision.ImageAnnotatorClient()
+    return _vision_client
 
 # Vision API detection
-def detect_landmark_google_vision(image_path: str) -> Optional[Tuple[str, Tuple[float, float]]]:
+def detect_landmark_google_vision(image_source) -> Optional[Tuple[str, Tuple[float, float]]]:
+    """`image_source` is the image bytes or a path to the image."""
     try:
-        client = vision.ImageAnnotatorClient()
-        with open(image_path, "rb") as img_file:
-            content = img_file.read()
+        client = get_vision_client()
+        if isinstance(image_source, (bytes, bytearray, memoryview)):
+            content = bytes(image_source)
+        else:
+            with open(image_source, "rb") as img_file:
+                content = img_file.read()
         image = vision.Image(content=content)
 
         response = client.landmark_detection(image=image)
@@ -55,55 +85,311 @@ class SimpleCNN(nn.Module):
         return self.classifier(x)
 
 # CNN inference
-def predict_landmark_custom_model(image_path, model_path="final_detector.pt"):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    
-    class_mapping = {
-        "Ajanta Caves":("Ajanta Caves", 20.5513, 75.7069),
-        "alai_darwaza":("Alai Darwaza", 28.5242, 77.1857),
-        "alai_minar":("Alai Minar", 28.5258, 77.1853),
-        "basilica_of_bom_jesus":("Basilica Of Bom Jesus", 15.5008, 73.9115),
-        "Charar-E- Sharif":("Charar-i-Sharief", 33.8629, 74.7663),
-        "charminar":("Charminar", 17.3616, 78.4747),
-        "Chhota_Imambara":("Chota Imambada", 26.8745, 80.9045),
-        "Ellora Caves":("Ellora Caves", 20.0268, 75.1771),
-        "Fatehpur Sikri":("Fatehpur Sikri", 27.0945, 77.6679),
-        "Gateway of India":("Gateway of India", 18.9220, 72.8347),
-        "golden temple":("Golden Temple", 31.6200, 74.8765),
-        "hawa mahal pics":("Hawa Mahal", 26.9240, 75.8267),
-        "Humayun_s Tomb":("Humayun's Tomb", 28.5933, 77.2507),
-        "India gate pics":("India Gate", 28.6129, 77.2295),
-        "iron_pillar":("Iron Pillar", 28.5247, 77.1850),
-        "jamali_kamali_tomb":("Jamali Kamali Mosque and Tomb", 28.5196, 77.1871),
-        "Khajuraho":("Khajuraho", 24.8318, 79.9199),
-        "lotus_temple":("Lotus Temple", 28.5535, 77.2588),
-        "mysore_palace":("Mysore Palace", 12.3052, 76.6552),
-        "qutub_minar":("Qutub Minar", 28.5245, 77.1855),
-        "Sun Temple Konark":("Sun Temple Konark", 19.8876, 86.0945),
-        "tajmahal":("Taj Mahal", 27.1751, 78.0421),
-        "tanjavur temple":("Brihadisvara Temple", 11.2062, 79.4488),
-        "victoria memorial":("Victoria Memorial", 22.5448, 88.3426)
-    }
-
-    CLASS_NAMES = sorted(list(class_mapping.keys()))
-
-    model = SimpleCNN(24).to(device)
-    model.load_state_dict(torch.load(model_path, map_location=device))
+# "fp32": eager state_dict, "int8": eager with Linear layers dynamically
+# quantized at load time, "torchscript": an artifact made by model_tools.py export
+SERVING_MODES = ("fp32", "int8", "torchscript")
+MODEL_SERVING_MODE = os.getenv("LANDMARK_SERVING_MODE", "fp32")
+FP32_MODEL_PATH = "final_detector.pt"
+SCRIPTED_MODEL_PATH = "final_detector.int8.ts"
+MODEL_PATH = os.getenv("LANDMARK_MODEL_PATH",
+                       SCRIPTED_MODEL_PATH if MODEL_SERVING_MODE == "torchscript" else FP32_MODEL_PATH)
+# Seconds between checks of the weights file's mtime; 0 disables hot reload
+MODEL_RELOAD_INTERVAL = float(os.getenv("LANDMARK_MODEL_RELOAD_INTERVAL", "5"))
+
+# CNN class folder -> (display name, lat, lng), sourced from data/landmarks.json
+CLASS_MAPPING = {
+    record["class_key"]: (record["name"], record["lat"], record["lng"])
+    for record in get_gazetteer().records if record.get("class_key")
+}
+
+CLASS_NAMES = sorted(list(CLASS_MAPPING.keys()))
+
+TRANSFORM = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406],
+                         [0.229, 0.224, 0.225])
+])
+
+# Fast preprocessing (same output as TRANSFORM up to resampling differences)
+INPUT_SIZE = 224
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+# Threads used by preprocess_batch; PIL decoding and numpy gathers release the GIL
+PREPROCESS_WORKERS = int(os.getenv("LANDMARK_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# ToTensor + Normalize fused into one lookup per pixel: channel c maps byte v
+# to (v / 255 - mean[c]) / std[c]
+_NORMALIZE_LUT = np.stack([
+    (np.arange(256, dtype=np.float32) / 255.0 - mean) / std
+    for mean, std in zip(IMAGENET_MEAN, IMAGENET_STD)
+]).astype(np.float32)
+
+_preprocess_pool: Optional[ThreadPoolExecutor] = None
+_preprocess_pool_lock = threading.Lock()
+
+def quantize_int8(model: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of the Linear layers (weights stored as int8, CPU only)."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def build_model(model_path: str, mode: str = "fp32", device=None) -> nn.Module:
+    """Load `model_path` for inference in one of SERVING_MODES."""
+    if mode not in SERVING_MODES:
+        raise ValueError(f"Unknown serving mode {mode!r}, expected one of {SERVING_MODES}")
+    if mode == "torchscript":
+        model = torch.jit.load(model_path, map_location="cpu")
+    else:
+        model = SimpleCNN(len(CLASS_NAMES))
+        model.load_state_dict(torch.load(model_path, map_location="cpu"))
+        model.eval()
+        if mode == "int8":
+            model = quantize_int8(model)
+        elif device is not None:
+            model = model.to(device)
     model.eval()
+    return model
+
+def export_torchscript(weights_path: str = FP32_MODEL_PATH, out_path: str = SCRIPTED_MODEL_PATH,
+                       quantize: bool = True) -> str:
+    """Trace the (optionally int8-quantized) CNN and save it as a TorchScript artifact."""
+    model = build_model(weights_path, "int8" if quantize else "fp32")
+    example = torch.zeros((1, 3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32)
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, example)
+    tmp_path = f"{out_path}.tmp"
+    torch.jit.save(scripted, tmp_path)
+    # Atomic swap, so a serving process polling the mtime never sees half a file
+    os.replace(tmp_path, out_path)
+    return out_path
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    return 0
+
+def model_size_bytes(model: nn.Module) -> int:
+    """Bytes held by weights and buffers, counting int8 packed Linear weights."""
+    return sum(_tensor_bytes(value) for value in model.state_dict().values())
+
+def _resident_memory_bytes() -> Optional[int]:
+    """Current RSS of this process (Linux), or peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+class ModelRegistry:
+    """
+    Holds one loaded SimpleCNN per weights file so requests only pay for the
+    forward pass. The file's mtime is polled every `reload_interval` seconds
+    and a changed file is reloaded in the background; requests keep using
+    the previous model until the new one is swapped in.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, reload_interval: float = MODEL_RELOAD_INTERVAL,
+                 mode: str = MODEL_SERVING_MODE):
+        self.model_path = model_path
+        self.reload_interval = reload_interval
+        self.mode = mode
+        # Quantized kernels are CPU only
+        use_cuda = mode == "fp32" and torch.cuda.is_available()
+        self.device = torch.device("cuda" if use_cuda else "cpu")
+        self._model = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self.load_time_s = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+
+    def load(self) -> nn.Module:
+        """(Re)load the weights from disk and swap them in."""
+        with self._lock:
+            return self._load_locked()
 
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406],
-                             [0.229, 0.224, 0.225])
-    ])
+    def _load_locked(self) -> nn.Module:
+        start = time.perf_counter()
+        mtime = os.stat(self.model_path).st_mtime_ns
+        model = build_model(self.model_path, self.mode, self.device)
 
-    image = Image.open(image_path).convert("RGB")
-    image_tensor = transform(image).unsqueeze(0).to(device)
+        if self._model is not None:
+            self.reloads += 1
+        self._model = model
+        self._mtime = mtime
+        self._last_check = time.monotonic()
+        self.load_time_s = time.perf_counter() - start
+        self.loaded_at = time.time()
+        self.last_error = None
+        return model
 
+    def get(self) -> nn.Module:
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    return self._load_locked()
+                return self._model
+
+        if self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            self._check_for_update()
+        return model
+
+    def _check_for_update(self):
+        self._last_check = time.monotonic()
+        try:
+            mtime = os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime or self._reloading:
+            return
+        self._reloading = True
+        threading.Thread(target=self._reload, daemon=True).start()
+
+    def _reload(self):
+        try:
+            self.load()
+            print(f"Reloaded landmark model from {self.model_path}")
+        except Exception as e:
+            self.last_error = str(e)
+            print("Model reload error:", e)
+        finally:
+            self._reloading = False
+
+    def stats(self) -> Dict[str, Any]:
+        model = self._model
+        parameter_bytes = None
+        if model is not None:
+            parameter_bytes = model_size_bytes(model)
+        return {
+            "model_path": self.model_path,
+            "serving_mode": self.mode,
+            "device": str(self.device),
+            "loaded": model is not None,
+            "load_time_ms": round(self.load_time_s * 1000, 1) if self.load_time_s is not None else None,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "hot_reload_interval_s": self.reload_interval,
+            "parameter_bytes": parameter_bytes,
+            "process_rss_bytes": _resident_memory_bytes(),
+            "last_error": self.last_error,
+        }
+
+_registries: Dict[Tuple[str, str], ModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+def get_model_registry(model_path: str = MODEL_PATH, mode: str = MODEL_SERVING_MODE) -> ModelRegistry:
+    """Process-wide registry for `model_path` served in `mode`, created on first use."""
+    with _registries_lock:
+        registry = _registries.get((model_path, mode))
+        if registry is None:
+            registry = ModelRegistry(model_path, mode=mode)
+            _registries[(model_path, mode)] = registry
+        return registry
+
+def load_model(model_path=MODEL_PATH):
+    """Preload the weights; used as the CPU pool's worker initializer."""
+    try:
+        get_model_registry(model_path).load()
+    except Exception as e:
+        # Never fail the worker; the registry retries on the first prediction
+        print(f"Landmark model not loaded at startup: {str(e)}")
+
+def model_stats(model_path=MODEL_PATH) -> Dict[str, Any]:
+    return get_model_registry(model_path).stats()
+
+def decode_image(image_source, size: int = INPUT_SIZE) -> Image.Image:
+    """
+    Decode straight to a size x size RGB image. JPEG draft mode lets libjpeg
+    decode at 1/2, 1/4 or 1/8 scale (never below `size`), so a 12 MP photo
+    is never fully decoded just to be shrunk to 224 px.
+    """
+    image = _open_image(image_source)
+    image.draft("RGB", (size, size))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.resize((size, size), Image.BILINEAR, reducing_gap=3.0)
+
+def preprocess_image(image_source, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Decode and normalize one image (path or bytes) into a (3, 224, 224) tensor.
+    Pass `out` to fill a preallocated tensor (e.g. one row of a batch).
+    """
+    pixels = np.asarray(decode_image(image_source))
+    if out is None:
+        out = torch.empty((3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32)
+    out_array = out.numpy()
+    for channel in range(3):
+        np.take(_NORMALIZE_LUT[channel], pixels[:, :, channel], out=out_array[channel])
+    return out
+
+def preprocess_image_reference(image_source) -> torch.Tensor:
+    """The original torchvision pipeline, kept for parity checks and benchmarks."""
+    image = _open_image(image_source).convert("RGB")
+    return TRANSFORM(image)
+
+def _get_preprocess_pool() -> ThreadPoolExecutor:
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        with _preprocess_pool_lock:
+            if _preprocess_pool is None:
+                _preprocess_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS,
+                                                      thread_name_prefix="preprocess")
+    return _preprocess_pool
+
+def preprocess_batch(image_sources: Sequence, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Preprocess several images in parallel into one (N, 3, 224, 224) tensor.
+    Each worker writes directly into its row, so nothing is stacked or copied.
+    """
+    count = len(image_sources)
+    if out is None:
+        out = torch.empty((count, 3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32)
+    if count == 1:
+        preprocess_image(image_sources[0], out[0])
+        return out
+    futures = [_get_preprocess_pool().submit(preprocess_image, source, out[i])
+               for i, source in enumerate(image_sources)]
+    for future in futures:
+        future.result()
+    return out
+
+_batch_buffers = threading.local()
+
+def _stack_into_buffer(tensors: List[torch.Tensor]) -> torch.Tensor:
+    """Stack into a per-thread buffer that is reused while batch sizes fit."""
+    buffer = getattr(_batch_buffers, "tensor", None)
+    if buffer is None or buffer.shape[0] < len(tensors):
+        buffer = torch.empty((len(tensors), 3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32)
+        _batch_buffers.tensor = buffer
+    return torch.stack(tensors, out=buffer[:len(tensors)])
+
+def predict_landmark_batch(image_tensors, model_path=MODEL_PATH):
+    """Run one forward pass over preprocessed images; one class tuple per image."""
+    registry = get_model_registry(model_path)
+    model = registry.get()
+
+    if isinstance(image_tensors, torch.Tensor) and image_tensors.dim() == 4:
+        batch = image_tensors
+    else:
+        batch = _stack_into_buffer(list(image_tensors))
+    batch = batch.to(registry.device)
     with torch.no_grad():
-        output = model(image_tensor)
-        pred_idx = torch.argmax(output, dim=1).item()
-        predicted_class = class_mapping[CLASS_NAMES[pred_idx]]
-        
-    return predicted_class 
\ No newline at end of file
+        output = model(batch)
+        pred_idx = torch.argmax(output, dim=1).tolist()
+
+    return [CLASS_MAPPING[CLASS_NAMES[i]] for i in pred_idx]
+
+def predict_landmark_custom_model(image_source, model_path=MODEL_PATH):
+    return predict_landmark_batch([preprocess_image(image_source)], model_path)[0]
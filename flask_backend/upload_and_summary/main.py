@@ -1,13 +1,9 @@
-from fastapi import FastAPI, UploadFile, Form, Body
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import os
-import shutil
 
-from landmark_detection import predict_landmark_custom_model
-from summary_generator import get_openai_summary, generate_audio_summary
-from places import find_nearby_places
-from map_generator import generate_custom_leaflet_map_from_api_output
+from executors import PoolSaturated, PoolTimeout
+from routes import router as media_router
 from ask import router as ask_router  # Import the router from ask.py
 
 app = FastAPI()
@@ -19,43 +15,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-ID", "X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
 # Include the router from ask.py
 app.include_router(ask_router)
+# Landmark detection, summaries, audio, places and maps, shared with the main API
+app.include_router(media_router)
 
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
-@app.post("/detect_landmark/")
-async def detect_landmark(image: UploadFile):
-    file_path = os.path.join(UPLOAD_FOLDER, image.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
-
-    predicted, lat, lng = predict_landmark_custom_model(file_path)
-    return {"name": predicted, "lat": lat, "lng": lng}
-
-@app.post("/generate_summary/")
-async def generate_summary(landmark: str = Form(...), language: str = Form("en")):
-    summary = get_openai_summary(landmark, language)
-    audio_path = f"{UPLOAD_FOLDER}/summary_{landmark}_{language}.mp3"
-    audio_file = generate_audio_summary(summary, language, save_path=audio_path)
-    return {"summary": summary, "audio_file": audio_path}
-
-@app.get("/download_audio/")
-async def download_audio(path: str):
-    return FileResponse(path)
-
-@app.get("/nearby_places/")
-async def nearby_places(lat: float, lng: float):
-    results = find_nearby_places(lat, lng)
-    return results
-
-@app.get("/generate_map/")
-async def generate_map(lat: float, lng: float):
-    results = find_nearby_places(lat, lng)
-    map_ = generate_custom_leaflet_map_from_api_output(results)
-    map_path = f"{UPLOAD_FOLDER}/leaflet_map.html"
-    map_.save(map_path)
-    return FileResponse(map_path) 
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
@@ -0,0 +1,170 @@
+import os
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight
+
+MAP_CACHE_MAX_ENTRIES = int(os.getenv("MAP_CACHE_MAX_ENTRIES", "512"))
+MAP_CACHE_MAX_BYTES = int(os.getenv("MAP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Browser cache lifetime for a map; after it the ETag makes revalidation cheap
+MAP_MAX_AGE = int(os.getenv("MAP_MAX_AGE", "300"))
+
+# The POI fields map_generator draws: marker position and colour, popup text.
+# Distances and directions depend on the viewer and are filled in by the page
+MAP_POI_FIELDS = ["name", "lat", "lng", "type", "address", "marker_color"]
+
+def map_key(tile: str, pois: List[Dict[str, Any]]) -> str:
+    """
+    Hash of the places-cache tile and what the map draws for each of its
+    POIs, in a fixed order. Every caller inside the tile shares the key,
+    and so the rendered HTML; their own position is added by with_origin.
+    """
+    markers = sorted(
+        json.dumps([poi.get(field) for field in MAP_POI_FIELDS], separators=(",", ":"), default=str)
+        for poi in pois
+    )
+    raw = json.dumps([tile, markers], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def with_origin(html: bytes, lat: float, lng: float) -> bytes:
+    """
+    A cached tile map for one caller: declares MAP_ORIGIN, from which the
+    map's own script adds the "you are here" marker, distances and
+    directions links. A string splice, so hits never re-render.
+    """
+    snippet = f"<script>var MAP_ORIGIN = [{float(lat)}, {float(lng)}];</script>".encode("utf-8")
+    head = html.find(b"<head>")
+    if head < 0:
+        return snippet + html
+    return html[:head + 6] + snippet + html[head + 6:]
+
+def tile_map_input(center: Tuple[float, float], pois: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """What render_leaflet_map_html needs for a tile map: its centre and the drawn POI fields only."""
+    return {
+        "landmark_location": {"lat": center[0], "lng": center[1]},
+        "nearby_places": [{field: poi[field] for field in MAP_POI_FIELDS if field in poi} for poi in pois],
+    }
+
+def etag_for(key: str, fmt: str, origin: Optional[Tuple[float, float]] = None) -> str:
+    # Folium gives every element a random id, so two renders of the same map
+    # differ byte for byte; the tag follows the inputs instead of the body
+    if origin is not None:
+        key = hashlib.sha256(f"{key}:{float(origin[0])},{float(origin[1])}".encode("utf-8")).hexdigest()
+    return f'"{key[:32]}-{fmt}"'
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def map_headers(etag: str, places_s: float, render_s: float) -> Dict[str, str]:
+    """Caching headers, plus Server-Timing splitting the Places lookup from the render."""
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={MAP_MAX_AGE}",
+        "Server-Timing": f"places;dur={places_s * 1000:.1f}, render;dur={render_s * 1000:.1f}",
+    }
+
+def to_geojson(results: Dict[str, Any]) -> Dict[str, Any]:
+    """The map's data as a GeoJSON FeatureCollection, for clients that draw the map themselves."""
+    location = results["landmark_location"]
+    features = [{
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [location["lng"], location["lat"]]},
+        "properties": {"role": "origin"},
+    }]
+    for poi in results["nearby_places"]:
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [poi["lng"], poi["lat"]]},
+            "properties": {key: value for key, value in poi.items() if key not in ("lat", "lng")},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+def geojson_body(results: Dict[str, Any]) -> Tuple[str, bytes]:
+    """(key, encoded GeoJSON); the body is deterministic, so it is its own key."""
+    body = json.dumps(to_geojson(results), separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.sha256(body).hexdigest(), body
+
+class MapRenderCache:
+    """
+    Rendered tile maps in memory, LRU-bounded by entry count and total bytes.
+    Nothing is written to disk, so concurrent users can no longer overwrite
+    each other's map; concurrent misses on the same key share one render.
+    """
+
+    def __init__(self, max_entries: int = MAP_CACHE_MAX_ENTRIES, max_bytes: int = MAP_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = SingleFlight()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.total_render_s = 0.0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+            return html
+
+    def put(self, key: str, html: bytes, render_s: float = 0.0):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            self._entries[key] = html
+            self.total_bytes += len(html)
+            self.renders += 1
+            self.total_render_s += render_s
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    async def get_or_render(self, key: str, results: Dict[str, Any],
+                            render: Callable[[Dict[str, Any]], Awaitable[str]]) -> Tuple[bytes, float]:
+        """(html, render seconds) for `results` under `key`; the render time is 0 on a hit."""
+        html = self.get(key)
+        if html is not None:
+            self.hits += 1
+            return html, 0.0
+
+        async def fill():
+            started = time.perf_counter()
+            html = (await render(results)).encode("utf-8")
+            render_s = time.perf_counter() - started
+            self.put(key, html, render_s)
+            return html, render_s
+
+        if key in self._in_flight:
+            self.hits += 1
+        else:
+            self.misses += 1
+        (html, render_s), shared = await self._in_flight.run(key, fill)
+        return html, 0.0 if shared else render_s
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "renders": self.renders,
+            "avg_render_ms": round(self.total_render_s * 1000 / self.renders, 1) if self.renders else 0.0,
+        }
@@ -2,10 +2,11 @@ import folium
 from folium import Popup
 from folium.plugins import MarkerCluster
 
-def generate_custom_leaflet_map_from_api_output(api_output):
+def generate_custom_leaflet_map_from_api_output(api_output, center_marker=True):
     """
     Generate an interactive Leaflet map using the output from find_nearby_places().
     Includes color-coded markers and a directions link for each POI.
+    With center_marker=False the centre is only where the map opens, not the user.
     """
     lat = api_output["landmark_location"]["lat"]
     lng = api_output["landmark_location"]["lng"]
@@ -15,11 +16,12 @@ def generate_custom_leaflet_map_from_api_output(api_output):
     marker_cluster = MarkerCluster().add_to(leaflet_map)
 
     # Add landmark/user marker
-    folium.Marker(
-        [lat, lng],
-        popup="📍 You are here",
-        icon=folium.Icon(color='white')
-    ).add_to(leaflet_map)
+    if center_marker:
+        folium.Marker(
+            [lat, lng],
+            popup="📍 You are here",
+            icon=folium.Icon(color='white')
+        ).add_to(leaflet_map)
 
     # Add each POI marker 
     for poi in poi_list:
@@ -29,15 +31,18 @@ def generate_custom_leaflet_map_from_api_output(api_output):
         distance = poi.get("distance_km", "?")
         type_ = poi.get("type", "unknown")
         address = poi.get("address", "")
-        directions_url = poi.get("route_url", "#")
+        directions_url = poi.get("route_url") or (
+            f"https://www.google.com/maps/dir/?api=1&destination={lat2},{lng2}&travelmode=transit"
+        )
         marker_color = poi.get("marker_color", "gray")
 
+        # data-to lets the page fill in distance and directions for the viewer's own position
         popup_html = f"""
         <b>{name}</b><br>
         Type: {type_}<br>
         Address: {address}<br>
-        Distance: {distance} km<br>
-        <a href="{directions_url}" target="_blank">Get Directions</a>
+        Distance: <span data-to="{lat2},{lng2}">{distance}</span> km<br>
+        <a data-to="{lat2},{lng2}" href="{directions_url}" target="_blank">Get Directions</a>
         """
 
         folium.Marker(
@@ -46,4 +51,49 @@ def generate_custom_leaflet_map_from_api_output(api_output):
             icon=folium.Icon(color=marker_color, icon='info-sign')
         ).add_to(marker_cluster)
 
-    return leaflet_map
\ No newline at end of file
+    return leaflet_map
+
+# Runs after the map is built. When the page defines MAP_ORIGIN = [lat, lng]
+# (see map_cache.with_origin), it marks that position and fills each popup's
+# distance and directions from it, so one rendered map serves every viewer.
+ORIGIN_SCRIPT = """
+<script>
+(function () {
+    var map = %(map)s;
+    var origin = window.MAP_ORIGIN;
+    if (!origin) { return; }
+    var icon = L.AwesomeMarkers ? L.AwesomeMarkers.icon({markerColor: "white", icon: "info-sign", prefix: "glyphicon"})
+                                : new L.Icon.Default();
+    L.marker(origin, {icon: icon}).bindPopup("\ud83d\udccd You are here").addTo(map);
+    map.setView(origin, map.getZoom());
+    function distanceKm(a, b) {
+        var rad = Math.PI / 180;
+        var h = Math.pow(Math.sin((b[0] - a[0]) * rad / 2), 2) +
+                Math.cos(a[0] * rad) * Math.cos(b[0] * rad) * Math.pow(Math.sin((b[1] - a[1]) * rad / 2), 2);
+        return 2 * 6371 * Math.asin(Math.sqrt(Math.min(1, h)));
+    }
+    map.on("popupopen", function (event) {
+        event.popup.getElement().querySelectorAll("[data-to]").forEach(function (el) {
+            var to = el.getAttribute("data-to").split(",").map(Number);
+            if (el.tagName === "A") {
+                el.href = "https://www.google.com/maps/dir/?api=1&origin=" + origin.join(",") +
+                          "&destination=" + to.join(",") + "&travelmode=transit";
+            } else {
+                el.textContent = distanceKm(origin, to).toFixed(2);
+            }
+        });
+    });
+})();
+</script>
+"""
+
+def render_leaflet_map_html(api_output, center_marker=True):
+    """
+    The same map as a standalone HTML document, rendered in memory rather
+    than saved to a file.
+    """
+    leaflet_map = generate_custom_leaflet_map_from_api_output(api_output, center_marker)
+    html = leaflet_map.get_root().render()
+    script = ORIGIN_SCRIPT % {"map": leaflet_map.get_name()}
+    head, end, tail = html.rpartition("</html>")
+    return head + script + end + tail if end else html + script
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Export, parity-check and benchmark the landmark CNN serving modes.
+
+Run from this directory:
+    python model_tools.py export [--no-quantize] [--out final_detector.int8.ts]
+    python model_tools.py parity path/to/labelled/images [--candidate int8|torchscript]
+    python model_tools.py bench [--iterations 50] [--batch 8]
+
+The labelled set uses the training layout: one sub-folder per class, named
+like the keys of CLASS_MAPPING (e.g. `tajmahal/`, `charminar/`).
+
+Serve the result with LANDMARK_SERVING_MODE=int8, or with
+LANDMARK_SERVING_MODE=torchscript and LANDMARK_MODEL_PATH pointing at the export.
+"""
+import os
+import argparse
+import gc
+import time
+
+import torch
+
+from benchmark_preprocess import IMAGE_EXTENSIONS
+from landmark_detection import (
+    CLASS_NAMES,
+    FP32_MODEL_PATH,
+    INPUT_SIZE,
+    SCRIPTED_MODEL_PATH,
+    _resident_memory_bytes,
+    build_model,
+    export_torchscript,
+    model_size_bytes,
+    preprocess_batch,
+)
+
+def candidate_path(mode, args):
+    return args.scripted if mode == "torchscript" else args.weights
+
+def load_labelled_set(folder):
+    samples = []
+    for label in sorted(os.listdir(folder)):
+        class_dir = os.path.join(folder, label)
+        if not os.path.isdir(class_dir):
+            continue
+        if label not in CLASS_NAMES:
+            print(f"skipping {label}/: not a known class")
+            continue
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(class_dir, name), CLASS_NAMES.index(label)))
+    return samples
+
+def cmd_export(args):
+    path = export_torchscript(args.weights, args.out, quantize=not args.no_quantize)
+    print(f"wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB, fp32 weights are "
+          f"{os.path.getsize(args.weights) / 1e6:.1f} MB)")
+
+def cmd_parity(args):
+    samples = load_labelled_set(args.folder)
+    if not samples:
+        raise SystemExit(f"No labelled images found in {args.folder}")
+    reference = build_model(args.weights, "fp32")
+    candidate = build_model(candidate_path(args.candidate, args), args.candidate)
+
+    correct_ref = correct_cand = agree = 0
+    max_logit_diff = 0.0
+    with torch.no_grad():
+        for i in range(0, len(samples), args.batch):
+            chunk = samples[i:i + args.batch]
+            batch = preprocess_batch([path for path, _ in chunk])
+            ref_logits = reference(batch)
+            cand_logits = candidate(batch)
+            max_logit_diff = max(max_logit_diff, (ref_logits - cand_logits).abs().max().item())
+            ref_pred = ref_logits.argmax(dim=1).tolist()
+            cand_pred = cand_logits.argmax(dim=1).tolist()
+            for (_, label), r, c in zip(chunk, ref_pred, cand_pred):
+                correct_ref += r == label
+                correct_cand += c == label
+                agree += r == c
+
+    total = len(samples)
+    print(f"{total} labelled images")
+    print(f"  fp32 top-1              {correct_ref / total:.3%}")
+    print(f"  {args.candidate:<12} top-1       {correct_cand / total:.3%}")
+    print(f"  prediction agreement    {agree / total:.3%}")
+    print(f"  max |logit diff|        {max_logit_diff:.4f}")
+
+def cmd_bench(args):
+    torch.set_num_threads(args.threads)
+    for mode in ("fp32", "int8", "torchscript"):
+        path = candidate_path(mode, args)
+        if not os.path.exists(path):
+            print(f"{mode:<12} skipped: {path} not found")
+            continue
+        gc.collect()
+        rss_before = _resident_memory_bytes() or 0
+        start = time.perf_counter()
+        model = build_model(path, mode)
+        load_ms = (time.perf_counter() - start) * 1000
+        rss_delta = (_resident_memory_bytes() or 0) - rss_before
+
+        row = [f"{mode:<12} load {load_ms:7.0f} ms",
+               f"weights {model_size_bytes(model) / 1e6:7.1f} MB",
+               f"rss +{rss_delta / 1e6:7.1f} MB"]
+        with torch.no_grad():
+            for batch_size in (1, args.batch):
+                inputs = torch.randn(batch_size, 3, INPUT_SIZE, INPUT_SIZE)
+                for _ in range(3):
+                    model(inputs)
+                start = time.perf_counter()
+                for _ in range(args.iterations):
+                    model(inputs)
+                ms = (time.perf_counter() - start) * 1000 / (args.iterations * batch_size)
+                row.append(f"b{batch_size} {ms:6.2f} ms/image")
+        print("  ".join(row))
+        del model
+
+def main():
+    parser = argparse.ArgumentParser(description="Landmark CNN export, parity and benchmark tools")
+    parser.add_argument("--weights", default=FP32_MODEL_PATH, help="fp32 state_dict")
+    parser.add_argument("--scripted", default=SCRIPTED_MODEL_PATH, help="TorchScript artifact")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Write a TorchScript artifact (int8 by default)")
+    export.add_argument("--out", default=SCRIPTED_MODEL_PATH)
+    export.add_argument("--no-quantize", action="store_true")
+    export.set_defaults(func=cmd_export)
+
+    parity = sub.add_parser("parity", help="Compare a serving mode's accuracy with fp32")
+    parity.add_argument("folder")
+    parity.add_argument("--candidate", choices=("int8", "torchscript"), default="int8")
+    parity.add_argument("--batch", type=int, default=16)
+    parity.set_defaults(func=cmd_parity)
+
+    bench = sub.add_parser("bench", help="Load time, memory and ms/image for every mode")
+    bench.add_argument("--iterations", type=int, default=50)
+    bench.add_argument("--batch", type=int, default=8)
+    bench.add_argument("--threads", type=int, default=1)
+    bench.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,21 @@
 import os
+import asyncio
+import httpx
 import requests
-import math
+from typing import Optional
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .geo import haversine_km, haversine_km_scalar
+except ImportError:
+    from geo import haversine_km, haversine_km_scalar
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
     Calculate the great circle distance between two points 
     on the earth (specified in decimal degrees)
     """
-    # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
-    
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = math.sin(dlat/2)*2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)*2
-    c = 2 * math.asin(math.sqrt(a))
-    r = 6371  # Radius of earth in kilometers
-    
-    return c * r
+    return haversine_km_scalar(lat1, lon1, lat2, lon2)
 
 ICON_MAP = {
     "restaurant": "red",
@@ -31,40 +29,119 @@ ICON_MAP = {
 
 TYPES = list(ICON_MAP.keys())
 
-def find_nearby_places(lat, lng, radius=3000):
-    api_key = os.getenv("GOOGLE_PLACES_API_KEY")
-    base_url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+PLACES_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+PLACES_TIMEOUT = float(os.getenv("PLACES_TIMEOUT", "10"))
 
-    results = []
-    for place_type in TYPES:
-        params = {
-            "location": f"{lat},{lng}",
-            "radius": radius,
-            "type": place_type,
-            "key": api_key
-        }
-        response = requests.get(base_url, params=params)
-        data = response.json()
-
-        for place in data.get("results", []):
+# Pooled connections to the Places API, shared by every request
+_session = requests.Session()
+_async_client: Optional[httpx.AsyncClient] = None
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=PLACES_TIMEOUT,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _type_params(lat, lng, radius, place_type):
+    return {
+        "location": f"{lat},{lng}",
+        "radius": radius,
+        "type": place_type,
+        "key": os.getenv("GOOGLE_PLACES_API_KEY")
+    }
+
+def _merge_place_results(results_by_type):
+    """
+    Flatten per-type API results into one list of POIs. A place returned for
+    several types (a lodging that is also a hotel) appears once, with every
+    type it matched in `types`; `type` and `marker_color` come from the first.
+    The POIs carry nothing specific to the caller's position, so they can be
+    cached and localized for anyone nearby.
+    """
+    merged = {}
+    for place_type, places in results_by_type:
+        for place in places:
             lat2 = place["geometry"]["location"]["lat"]
             lng2 = place["geometry"]["location"]["lng"]
-            results.append({
+            key = place.get("place_id") or (place.get("name"), lat2, lng2)
+            if key in merged:
+                if place_type not in merged[key]["types"]:
+                    merged[key]["types"].append(place_type)
+                continue
+
+            merged[key] = {
                 "name": place.get("name"),
                 "type": place_type,
+                "types": [place_type],
                 "lat": lat2,
                 "lng": lng2,
                 "rating": place.get("rating"),
                 "price_level": place.get("price_level"),
                 "address": place.get("vicinity"),
-                "distance_km": round(haversine_distance(lat, lng, lat2, lng2), 2),
-                "route_url": (
-                    f"https://www.google.com/maps/dir/?api=1"
-                    f"&origin={lat},{lng}&destination={lat2},{lng2}&travelmode=transit"
-                ),
                 "marker_color": ICON_MAP.get(place_type, "gray")
-            })
+            }
+    return list(merged.values())
+
+def localize_places(lat, lng, pois, radius=None):
+    """Add distance and directions from (lat, lng) to each POI, dropping those beyond `radius` metres."""
+    results = []
+    if not pois:
+        return {"landmark_location": {"lat": lat, "lng": lng}, "nearby_places": results}
+    # Every POI's distance in one vectorized call
+    distances = haversine_km(lat, lng, [poi["lat"] for poi in pois], [poi["lng"] for poi in pois]).tolist()
+    for poi, distance_km in zip(pois, distances):
+        if radius is not None and distance_km * 1000 > radius:
+            continue
+        place = dict(poi)
+        place["distance_km"] = round(distance_km, 2)
+        place["route_url"] = (
+            f"https://www.google.com/maps/dir/?api=1"
+            f"&origin={lat},{lng}&destination={poi['lat']},{poi['lng']}&travelmode=transit"
+        )
+        results.append(place)
     return {
         "landmark_location": {"lat": lat, "lng": lng},
         "nearby_places": results
-    }
\ No newline at end of file
+    }
+
+def find_nearby_places(lat, lng, radius=3000):
+    results_by_type = []
+    for place_type in TYPES:
+        response = _session.get(PLACES_URL, params=_type_params(lat, lng, radius, place_type), timeout=PLACES_TIMEOUT)
+        results_by_type.append((place_type, response.json().get("results", [])))
+    return localize_places(lat, lng, _merge_place_results(results_by_type))
+
+class PlacesAPIError(Exception):
+    pass
+
+async def _fetch_type_async(client, lat, lng, radius, place_type):
+    try:
+        response = await client.get(PLACES_URL, params=_type_params(lat, lng, radius, place_type))
+    except httpx.HTTPError as e:
+        raise PlacesAPIError(f"Places API request for {place_type} failed: {str(e)}") from e
+    data = response.json()
+    # Fail loudly rather than let a quota or key error pass for "no places here"
+    if data.get("status") not in (None, "OK", "ZERO_RESULTS"):
+        raise PlacesAPIError(f"Places API error for {place_type}: {data.get('status')} {data.get('error_message', '')}")
+    return place_type, data.get("results", [])
+
+async def fetch_nearby_pois_async(lat, lng, radius=3000):
+    """Deduplicated POIs around (lat, lng), with all type queries in flight at once."""
+    client = get_async_client()
+    results_by_type = await asyncio.gather(
+        *(_fetch_type_async(client, lat, lng, radius, place_type) for place_type in TYPES)
+    )
+    return _merge_place_results(results_by_type)
+
+async def find_nearby_places_async(lat, lng, radius=3000):
+    """Same result as find_nearby_places, without the seven sequential round trips."""
+    return localize_places(lat, lng, await fetch_nearby_pois_async(lat, lng, radius))
@@ -0,0 +1,337 @@
+import os
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight
+
+PLACES_CACHE_BACKEND = os.getenv("PLACES_CACHE_BACKEND", "memory")  # "memory" or "disk"
+PLACES_CACHE_TTL = float(os.getenv("PLACES_CACHE_TTL", str(24 * 3600)))
+PLACES_CACHE_MAX_ENTRIES = int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "4096"))
+PLACES_CACHE_DIR = os.getenv("PLACES_CACHE_DIR", os.path.join("uploads", "cache", "places"))
+# Precision 6 tiles are roughly 1.2 km x 0.6 km
+PLACES_CACHE_PRECISION = int(os.getenv("PLACES_CACHE_PRECISION", "6"))
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat: float, lng: float, precision: int = PLACES_CACHE_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+def tile_center_and_half_diagonal_m(geohash: str) -> Tuple[float, float, float]:
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    lat_c = (lat_min + lat_max) / 2
+    lng_c = (lng_min + lng_max) / 2
+    height_m = (lat_max - lat_min) * 111320
+    width_m = (lng_max - lng_min) * 111320 * math.cos(math.radians(lat_c))
+    return lat_c, lng_c, math.hypot(height_m, width_m) / 2
+
+class MemoryBackend:
+    """LRU + TTL dictionary; evicts the least recently used entry when full."""
+
+    blocking = False
+
+    def __init__(self, ttl: float = PLACES_CACHE_TTL, max_entries: int = PLACES_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        # Called with the key of every entry dropped by expiry or eviction
+        self.on_remove: Optional[Callable[[str], None]] = None
+
+    def _removed(self, key: str):
+        if self.on_remove is not None:
+            self.on_remove(key)
+
+    def get_entry(self, key: str) -> Optional[Tuple[float, Any]]:
+        """(stored_at, value), or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._removed(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                self._removed(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskBackend:
+    """
+    One JSON file per tile under `cache_dir`. Recency is tracked through the
+    file mtime (touched on every hit), so the LRU order survives restarts.
+    """
+
+    blocking = True
+
+    def __init__(self, cache_dir: str = PLACES_CACHE_DIR, ttl: float = PLACES_CACHE_TTL,
+                 max_entries: int = PLACES_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.evictions = 0
+        # Called with the key of every entry dropped by expiry or eviction
+        self.on_remove: Optional[Callable[[str], None]] = None
+        os.makedirs(cache_dir, exist_ok=True)
+        # key -> last use, oldest first
+        self._index: "OrderedDict[str, float]" = OrderedDict(sorted(
+            ((name[:-5].replace("_", ":"), os.path.getmtime(os.path.join(cache_dir, name)))
+             for name in os.listdir(cache_dir) if name.endswith(".json")),
+            key=lambda item: item[1],
+        ))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key.replace(":", "_") + ".json")
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        if self.on_remove is not None:
+            self.on_remove(key)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry[1] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[float, Any]]:
+        """(stored_at, value), or None when missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if time.time() - entry["stored_at"] > self.ttl:
+                self._remove(key)
+                return None
+            now = time.time()
+            # Best effort: another worker may have evicted the file since it was read
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+            self._index[key] = now
+            self._index.move_to_end(key)
+        return entry["stored_at"], entry["value"]
+
+    def set(self, key: str, value: Any):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stored_at": time.time(), "value": value}, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._index[key] = time.time()
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_entries:
+                oldest = next(iter(self._index))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._index)
+
+class PlacesCache:
+    """
+    Nearby-POI sets cached per (geohash tile, radius).
+
+    On a miss the Places API is queried once from the tile centre with the
+    radius widened by the tile's half-diagonal, so the cached set covers the
+    radius around any point inside the tile. Callers then localize the POIs
+    (distance, route, radius filter) for their exact coordinates. Concurrent
+    misses on the same tile share one upstream fetch.
+
+    With a `poi_index` (a geo.GeoIndex), the POIs of every live tile are
+    also indexed (once each), so `nearest` / `within` can answer over all
+    cached POIs without scanning them. A tile's POIs leave the index when
+    the backend evicts the tile or its TTL runs out: the next query
+    rebuilds the index from the tiles still cached.
+    """
+
+    def __init__(self, backend=None, precision: int = PLACES_CACHE_PRECISION, poi_index=None):
+        if backend is None:
+            backend = DiskBackend() if PLACES_CACHE_BACKEND == "disk" else MemoryBackend()
+        self.backend = backend
+        self.precision = precision
+        self.poi_index = poi_index
+        # Tiles whose POIs are in poi_index: key -> (stored_at, pois)
+        self._tiles: Dict[str, Tuple[float, List[Dict]]] = {}
+        self._indexed_pois = set()
+        self._index_stale = False
+        self._index_lock = threading.Lock()
+        backend.on_remove = self._drop_tile
+        self._in_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, lat: float, lng: float, radius: int) -> str:
+        return f"{geohash_encode(lat, lng, self.precision)}:{int(radius)}"
+
+    def tile_center(self, key: str) -> Tuple[float, float]:
+        lat_c, lng_c, _ = tile_center_and_half_diagonal_m(key.split(":")[0])
+        return lat_c, lng_c
+
+    async def _backend_call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get_or_fetch(self, lat: float, lng: float, radius: int,
+                           fetch: Callable[[float, float, int], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Cached POIs for the tile containing (lat, lng); `fetch(lat, lng, radius)` fills misses."""
+        key = self.key_for(lat, lng, radius)
+        entry = await self._backend_call(self.backend.get_entry, key)
+        if entry is not None:
+            self.hits += 1
+            self._index_tile(key, *entry)
+            return entry[1]
+
+        async def fill():
+            lat_c, lng_c, half_diagonal_m = tile_center_and_half_diagonal_m(key.split(":")[0])
+            pois = await fetch(lat_c, lng_c, int(radius + half_diagonal_m))
+            stored_at = time.time()
+            await self._backend_call(self.backend.set, key, pois)
+            self._index_tile(key, stored_at, pois)
+            return pois
+
+        # Joining a fetch already under way counts as a hit
+        if key in self._in_flight:
+            self.hits += 1
+        else:
+            self.misses += 1
+        pois, _ = await self._in_flight.run(key, fill)
+        return pois
+
+    def _add_to_index(self, pois: List[Dict]):
+        # Caller holds _index_lock; a POI cached by two overlapping tiles is indexed once
+        fresh = []
+        for poi in pois:
+            poi_key = (poi.get("name"), poi["lat"], poi["lng"])
+            if poi_key not in self._indexed_pois:
+                self._indexed_pois.add(poi_key)
+                fresh.append(poi)
+        if fresh:
+            self.poi_index.extend([p["lat"] for p in fresh], [p["lng"] for p in fresh], fresh)
+
+    def _index_tile(self, key: str, stored_at: float, pois: List[Dict]):
+        if self.poi_index is None:
+            return
+        with self._index_lock:
+            previous = self._tiles.get(key)
+            if previous is not None and previous[0] == stored_at:
+                return
+            self._tiles[key] = (stored_at, pois)
+            if previous is not None:
+                # Re-fetched after expiry: the old POIs go at the next rebuild
+                self._index_stale = True
+            elif not self._index_stale:
+                self._add_to_index(pois)
+
+    def _drop_tile(self, key: str):
+        with self._index_lock:
+            if self._tiles.pop(key, None) is not None:
+                self._index_stale = True
+
+    def _live_index(self):
+        """The POI index with expired and evicted tiles removed."""
+        now = time.time()
+        with self._index_lock:
+            expired = [key for key, (stored_at, _) in self._tiles.items() if now - stored_at > self.backend.ttl]
+            for key in expired:
+                del self._tiles[key]
+            if expired or self._index_stale:
+                self.poi_index.clear()
+                self._indexed_pois = set()
+                for _, pois in self._tiles.values():
+                    self._add_to_index(pois)
+                self._index_stale = False
+        return self.poi_index
+
+    def nearest(self, lat: float, lng: float, k: int = 10) -> List[Tuple[Dict, float]]:
+        """The `k` cached POIs closest to (lat, lng) as (poi, distance km)."""
+        return self._live_index().nearest(lat, lng, k) if self.poi_index is not None else []
+
+    def within(self, lat: float, lng: float, radius: float) -> List[Tuple[Dict, float]]:
+        """Cached POIs within `radius` metres of (lat, lng) as (poi, distance km), nearest first."""
+        return self._live_index().within(lat, lng, radius / 1000) if self.poi_index is not None else []
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "precision": self.precision,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "indexed_tiles": len(self._tiles),
+            "indexed_pois": len(self._indexed_pois) if self.poi_index is not None else None,
+        }
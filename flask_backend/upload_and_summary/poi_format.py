@@ -0,0 +1,124 @@
+import os
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .places import ICON_MAP
+except ImportError:
+    from places import ICON_MAP
+
+POI_FORMATS = ("full", "geojson", "columns")
+# Fields a client can ask for; route_url and marker_color are left out of the
+# compact formats because they follow from the origin and the type
+POI_FIELDS = ["name", "type", "types", "lat", "lng", "rating", "price_level", "address", "distance_km",
+              "route_url", "marker_color"]
+COMPACT_DEFAULT_FIELDS = ["name", "type", "rating", "address", "distance_km"]
+# Decimal places kept for POI coordinates in the compact formats (~0.1 m)
+COORDINATE_DIGITS = 6
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Field names from a comma-separated `fields=` value; raises ValueError on unknown ones."""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in POI_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}; expected any of {', '.join(POI_FIELDS)}")
+    return names
+
+def filter_places(places: List[Dict[str, Any]], types: Optional[str] = None,
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    POIs matching any of the comma-separated `types`. With a `limit`, the
+    nearest ones are kept, nearest first; otherwise the order is unchanged.
+    """
+    if types:
+        wanted = {t.strip() for t in types.split(",") if t.strip()}
+        places = [poi for poi in places if wanted.intersection(poi.get("types") or [poi.get("type")])]
+    if limit is not None:
+        places = sorted(places, key=lambda poi: poi.get("distance_km", 0))[:max(limit, 0)]
+    return places
+
+def format_places(results: Dict[str, Any], fmt: str = "full", fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    localize_places output in one of POI_FORMATS:
+
+    full     the original shape, optionally projected to `fields`
+    geojson  a FeatureCollection; coordinates live in the geometry
+    columns  one array per field, so each key is sent once, not once per POI
+
+    The compact formats carry the origin and the type -> marker colour
+    legend once, instead of a route_url and marker_color on every POI.
+    """
+    location = results["landmark_location"]
+    places = results["nearby_places"]
+    if fmt == "full":
+        if fields:
+            places = [{name: poi.get(name) for name in fields} for poi in places]
+        return {"landmark_location": location, "nearby_places": places}
+
+    fields = fields or COMPACT_DEFAULT_FIELDS
+    compact = {"origin": [location["lat"], location["lng"]], "marker_colors": ICON_MAP}
+    if fmt == "geojson":
+        properties = [name for name in fields if name not in ("lat", "lng")]
+        compact.update(type="FeatureCollection", features=[{
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(poi["lng"], COORDINATE_DIGITS),
+                                                          round(poi["lat"], COORDINATE_DIGITS)]},
+            "properties": {name: poi.get(name) for name in properties},
+        } for poi in places])
+        return compact
+    if fmt == "columns":
+        columns = {"lat": [round(poi["lat"], COORDINATE_DIGITS) for poi in places],
+                   "lng": [round(poi["lng"], COORDINATE_DIGITS) for poi in places]}
+        for name in fields:
+            if name not in columns:
+                columns[name] = [poi.get(name) for poi in places]
+        compact.update(count=len(places), columns=columns)
+        return compact
+    raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(POI_FORMATS)}")
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br' or 'gzip' if the client accepts it (brotli only when installed), else None."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding] = quality
+    for coding in (["br"] if brotli is not None else []) + ["gzip"]:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def encode_json(payload: Any, accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Compact JSON for `payload`, compressed for this client when worthwhile.
+    Returns the body and the headers to send with it.
+    """
+    body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+    coding = accepted_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if coding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif coding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return body, headers
@@ -0,0 +1,413 @@
+from fastapi import APIRouter, Form, HTTPException, Request, Response, BackgroundTasks
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+import os
+import json
+import asyncio
+import time
+import base64
+from typing import Optional
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .landmark_detection import (
+        detect_landmark_google_vision, preprocess_image, predict_landmark_batch, load_model, model_stats
+    )
+    from .inference_batcher import InferenceBatcher
+    from .image_hash import PerceptualHashIndex, dhash
+    from .upload_stream import UPLOAD_PERSIST, UploadError, UploadTooLarge, read_upload, persist_upload
+    from .executors import io_pool, cpu_pool, PoolError
+    from .summary_generator import (
+        PROMPT_VERSION, request_openai_summary, synthesize_audio, synthesize_audio_bytes, stream_summary
+    )
+    from .summary_cache import SummaryCache
+    from .audio_store import (
+        AUDIO_CACHE_CONTROL, RangeNotSatisfiable, get_audio_store, audio_etag, audio_url, iter_file_range,
+        media_type_for, parse_range
+    )
+    from .tts import audio_extension, get_tts
+    from .artifact_store import ArtifactCollector, artifact_stats, get_store
+    from .places import PlacesAPIError, fetch_nearby_pois_async, localize_places, close_async_client
+    from .places_cache import PlacesCache
+    from .geo import GeoIndex
+    from .gazetteer import get_gazetteer, landmark_summary
+    from .map_generator import render_leaflet_map_html
+    from .map_cache import (MapRenderCache, map_key, etag_for, if_none_match, map_headers, geojson_body,
+                            tile_map_input, with_origin)
+    from .poi_format import POI_FORMATS, parse_fields, filter_places, format_places, encode_json
+except ImportError:
+    from landmark_detection import (
+        detect_landmark_google_vision, preprocess_image, predict_landmark_batch, load_model, model_stats
+    )
+    from inference_batcher import InferenceBatcher
+    from image_hash import PerceptualHashIndex, dhash
+    from upload_stream import UPLOAD_PERSIST, UploadError, UploadTooLarge, read_upload, persist_upload
+    from executors import io_pool, cpu_pool, PoolError
+    from summary_generator import (
+        PROMPT_VERSION, request_openai_summary, synthesize_audio, synthesize_audio_bytes, stream_summary
+    )
+    from summary_cache import SummaryCache
+    from audio_store import (
+        AUDIO_CACHE_CONTROL, RangeNotSatisfiable, get_audio_store, audio_etag, audio_url, iter_file_range,
+        media_type_for, parse_range
+    )
+    from tts import audio_extension, get_tts
+    from artifact_store import ArtifactCollector, artifact_stats, get_store
+    from places import PlacesAPIError, fetch_nearby_pois_async, localize_places, close_async_client
+    from places_cache import PlacesCache
+    from geo import GeoIndex
+    from gazetteer import get_gazetteer, landmark_summary
+    from map_generator import render_leaflet_map_html
+    from map_cache import (MapRenderCache, map_key, etag_for, if_none_match, map_headers, geojson_body,
+                           tile_map_input, with_origin)
+    from poi_format import POI_FORMATS, parse_fields, filter_places, format_places, encode_json
+
+# Landmark detection, summaries, audio, places and maps, shared by the main API
+# (main.py) and the standalone upload_and_summary app; both include this router.
+# Set app.state.use_vision = True to try Google Vision before the CNN.
+router = APIRouter()
+
+# Photos and generated audio live in hash-sharded stores under uploads/, each
+# with its own retention and quota, enforced by a background collector
+image_store = get_store("images")
+audio_store = get_audio_store()
+artifact_gc = ArtifactCollector()
+
+# Concurrent /detect_landmark/ requests share batched CNN forward passes,
+# which run in the CPU process pool so inference never blocks the event loop
+landmark_batcher = InferenceBatcher(predict_landmark_batch, runner=cpu_pool.run)
+image_hash_index = PerceptualHashIndex()
+
+@router.on_event("startup")
+async def load_landmark_model():
+    # Every CNN worker process loads the weights once when it starts
+    cpu_pool.initializer = load_model
+    try:
+        await cpu_pool.run(model_stats, timeout=300)
+    except Exception as e:
+        print(f"Failed to start CNN worker: {str(e)}")
+    await landmark_batcher.start()
+    artifact_gc.start()
+
+@router.on_event("shutdown")
+async def stop_workers():
+    artifact_gc.stop()
+    await landmark_batcher.stop()
+    io_pool.shutdown()
+    cpu_pool.shutdown()
+    await close_async_client()
+
+async def read_image_upload(request: Request, background_tasks: BackgroundTasks) -> bytes:
+    # The body is read once into memory; the same bytes feed hashing, Vision and the CNN
+    try:
+        filename, data = await read_upload(request, "image")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if UPLOAD_PERSIST:
+        background_tasks.add_task(persist_upload, data, image_store, filename)
+    return data
+
+# Landmark records (ids, aliases, coordinates) from data/landmarks.json
+gazetteer = get_gazetteer()
+
+def detection_result(name, lat, lng):
+    record = gazetteer.identify(name, lat, lng)
+    return {"name": name, "lat": lat, "lng": lng, "landmark_id": record["id"] if record else None}
+
+def resolve_landmark(landmark):
+    """(display name, canonical id) for free text; unknown landmarks keep their text and no id"""
+    record = gazetteer.resolve(landmark)
+    return (record["name"], record["id"]) if record else (landmark, None)
+
+@router.get("/landmarks/resolve")
+async def resolve_landmark_name(name: str):
+    """Gazetteer record for a landmark name in any spelling, alias or script"""
+    record = gazetteer.resolve(name)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown landmark: {name}")
+    return landmark_summary(record)
+
+@router.get("/landmarks/nearest")
+async def nearest_landmarks(lat: float, lng: float, k: int = 3):
+    """Known landmarks closest to a point"""
+    return [dict(landmark_summary(record), distance_km=round(distance, 3))
+            for record, distance in gazetteer.nearest(lat, lng, max(1, min(k, len(gazetteer))))]
+
+@router.post("/detect_landmark/")
+async def detect_landmark(request: Request, background_tasks: BackgroundTasks):
+    """Multipart form with an 'image' file field, or the raw image as the body"""
+    data = await read_image_upload(request, background_tasks)
+
+    # Near-duplicate photos of the same monument skip Vision and the CNN
+    image_hash = await io_pool.run(dhash, data)
+    cached = image_hash_index.lookup(image_hash)
+    if cached is not None:
+        return cached[0]
+
+    if getattr(request.app.state, "use_vision", False):
+        vision_result = await io_pool.run(detect_landmark_google_vision, data)
+        if vision_result:
+            name, (lat, lng) = vision_result
+            result = detection_result(name, lat, lng)
+            image_hash_index.add(image_hash, result)
+            return result
+
+    # PIL decoding releases the GIL, so preprocessing stays on the I/O threads
+    image_tensor = await io_pool.run(preprocess_image, data)
+    predicted, lat, lng = await landmark_batcher.submit(image_tensor)
+    result = detection_result(predicted, lat, lng)
+    image_hash_index.add(image_hash, result)
+    return result
+
+@router.get("/detect_landmark/cache")
+async def detect_landmark_cache_status():
+    """Hit rate of the near-duplicate image cache"""
+    return image_hash_index.stats()
+
+@router.get("/model/status")
+async def model_status():
+    """Load time and memory footprint of the landmark CNN (as seen by a CPU worker)"""
+    return await cpu_pool.run(model_stats)
+
+@router.get("/model/batching")
+async def model_batching():
+    """How full the CNN micro-batches are"""
+    return landmark_batcher.stats()
+
+@router.get("/executors/status")
+async def executors_status():
+    """Queue depth, timeouts and rejections of the worker pools"""
+    return {"io": io_pool.stats(), "cpu": cpu_pool.stats()}
+
+# Summaries and their audio are nearly static per (landmark, language)
+summary_cache = SummaryCache(prompt_version=PROMPT_VERSION, audio_ext=audio_extension(), audio_store=audio_store)
+
+async def create_summary(landmark, language, audio_path):
+    summary = await io_pool.run(request_openai_summary, landmark, language)
+    await io_pool.run(synthesize_audio, summary, language, save_path=audio_path)
+    return summary
+
+@router.post("/generate_summary/")
+async def generate_summary(landmark: str = Form(...), language: str = Form("en")):
+    """Summary text and audio for a landmark, generated once per (landmark, language)"""
+    try:
+        name, landmark_id = resolve_landmark(landmark)
+        return await summary_cache.get_or_create(name, language, create_summary, landmark_id=landmark_id)
+    except PoolError:
+        raise
+    except Exception as e:
+        print(f"Summary generation error: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Summary generation failed: {str(e)}")
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+@router.post("/generate_summary/stream")
+async def generate_summary_stream(landmark: str = Form(...), language: str = Form("en")):
+    """Server-sent events: summary tokens as they arrive, then audio segments per sentence group"""
+    async def events():
+        try:
+            name, landmark_id = resolve_landmark(landmark)
+            cached = await asyncio.to_thread(summary_cache.get, name, language, landmark_id)
+            if cached is not None:
+                yield sse_event("token", {"text": cached["summary"]})
+                audio = await io_pool.run(read_bytes, cached["audio_file"])
+                yield sse_event("audio", {"index": 0, "data": base64.b64encode(audio).decode("ascii")})
+                yield sse_event("done", cached)
+                return
+
+            segments = []
+            async for kind, payload in stream_summary(name, language, run_blocking=io_pool.run):
+                if kind == "token":
+                    yield sse_event("token", {"text": payload})
+                elif kind == "audio":
+                    index, audio = payload
+                    segments.append(audio)
+                    yield sse_event("audio", {"index": index, "data": base64.b64encode(audio).decode("ascii")})
+                else:
+                    # MP3 frames concatenate cleanly, so the segments form one cacheable file;
+                    # other formats are re-encoded whole, from sentences already in the TTS cache
+                    if audio_extension() == "mp3":
+                        audio = b"".join(segments)
+                    else:
+                        audio = await io_pool.run(synthesize_audio_bytes, payload, language)
+                    result = await asyncio.to_thread(summary_cache.put, name, language, payload, audio, landmark_id)
+                    yield sse_event("done", result)
+        except Exception as e:
+            print(f"Summary stream error: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/summaries/cache")
+async def summary_cache_status():
+    """Hit rate and size of the summary/audio cache"""
+    return summary_cache.stats()
+
+@router.get("/tts/stats")
+async def tts_stats():
+    """TTS engine, output format and segment cache hit rate"""
+    return get_tts().stats()
+
+@router.get("/artifacts/stats")
+async def artifacts_stats():
+    """Disk usage, quotas and garbage collection counts of the artifact stores"""
+    return artifact_stats()
+
+# Audio is served by content id only: an id can never name a file outside the store
+@router.api_route("/audio/{audio_id}", methods=["GET", "HEAD"])
+async def get_audio(audio_id: str, request: Request):
+    """Generated audio by id: Range requests for seeking, strong ETag, cacheable forever"""
+    path = audio_store.path(audio_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    etag = audio_etag(audio_id)
+    headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    # The collector may delete the file at any moment: one that is already gone is a 404
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    size = stat.st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable as e:
+        return Response(status_code=416, headers={**headers, "Content-Range": str(e)})
+    media_type = media_type_for(audio_id)
+    if byte_range is None:
+        # Whole file: FileResponse hands the path to the server (pathsend / sendfile), no copy through Python
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+    # A range is read through Python: ASGI servers offer no zero-copy send of part of a file.
+    # The handle is opened now, so a later delete cannot cut the response short
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(iter_file_range(f, start, end), status_code=206, media_type=media_type,
+                             headers=headers)
+
+@router.get("/download_audio/")
+async def download_audio(path: str):
+    """Deprecated: redirects a stored audio file's path to /audio/{id}; other paths are refused"""
+    audio_id = os.path.basename(path)
+    if audio_store.path(audio_id) is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return RedirectResponse(audio_url(audio_id), status_code=308)
+
+# POIs are cached per geohash tile and re-localized for each caller; every
+# cached POI is also kept in a spatial index for nearest-POI queries
+places_cache = PlacesCache(poi_index=GeoIndex())
+
+def landmark_location(lat, lng, landmark):
+    # A known landmark name pins the canonical coordinates, so every request
+    # for it lands on the same cache tile
+    if landmark:
+        record = gazetteer.resolve(landmark)
+        if record is not None:
+            return record["lat"], record["lng"]
+    if lat is None or lng is None:
+        raise HTTPException(status_code=400, detail="Pass lat and lng, or a known landmark name")
+    return lat, lng
+
+async def get_tile_places(lat, lng, radius=3000):
+    """Every POI cached for the tile holding (lat, lng), not yet localized."""
+    try:
+        return await places_cache.get_or_fetch(lat, lng, radius, fetch_nearby_pois_async)
+    except PlacesAPIError as e:
+        print(f"Places lookup failed: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Places lookup failed: {str(e)}")
+
+async def get_nearby_places(lat, lng, radius=3000):
+    pois = await get_tile_places(lat, lng, radius)
+    return localize_places(lat, lng, pois, radius)
+
+@router.get("/places/cache")
+async def places_cache_status():
+    """Hit rate of the geo-tiled nearby-places cache"""
+    return places_cache.stats()
+
+@router.get("/places/nearest")
+async def nearest_cached_places(lat: float, lng: float, k: int = 10):
+    """Closest POIs among everything already cached, without calling the Places API"""
+    nearest = places_cache.nearest(lat, lng, max(1, min(k, 100)))
+    return localize_places(lat, lng, [poi for poi, _ in nearest])
+
+@router.get("/nearby_places/")
+async def nearby_places(request: Request, lat: Optional[float] = None, lng: Optional[float] = None,
+                        landmark: Optional[str] = None, format: str = "full", fields: Optional[str] = None,
+                        limit: Optional[int] = None, type: Optional[str] = None):
+    """Nearby places; format=geojson|columns, fields, limit and type (comma-separated) shrink the payload"""
+    if format not in POI_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(POI_FORMATS)}")
+    try:
+        names = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    lat, lng = landmark_location(lat, lng, landmark)
+    results = await get_nearby_places(lat, lng)
+    results["nearby_places"] = filter_places(results["nearby_places"], type, limit)
+    # Compressed per response rather than by middleware, which would buffer the SSE streams
+    body, headers = encode_json(format_places(results, format, names), request.headers.get("accept-encoding"))
+    media_type = "application/geo+json" if format == "geojson" else "application/json"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+# Rendered maps are kept in memory, one per places tile and POI set, so
+# requests never share (or overwrite) a file on disk; each caller's position
+# is spliced into the cached page rather than rendered into it
+map_cache = MapRenderCache()
+
+async def render_map(results):
+    # A thread on the I/O pool: the one-process CPU pool is kept for landmark inference
+    return await io_pool.run(render_leaflet_map_html, results, False)
+
+@router.get("/generate_map/")
+async def generate_map(request: Request, lat: Optional[float] = None, lng: Optional[float] = None,
+                       landmark: Optional[str] = None, format: str = "html"):
+    """Map of the nearby places, as Leaflet HTML or as GeoJSON for the client to draw"""
+    if format not in ("html", "geojson"):
+        raise HTTPException(status_code=400, detail="format must be html or geojson")
+    lat, lng = landmark_location(lat, lng, landmark)
+    started = time.perf_counter()
+    pois = await get_tile_places(lat, lng)
+    places_s = time.perf_counter() - started
+
+    if format == "geojson":
+        started = time.perf_counter()
+        key, body = geojson_body(localize_places(lat, lng, pois, 3000))
+        render_s = time.perf_counter() - started
+        headers = map_headers(etag_for(key, format), places_s, render_s)
+        media_type = "application/geo+json"
+    else:
+        tile = places_cache.key_for(lat, lng, 3000)
+        key, body, render_s = map_key(tile, pois), None, 0.0
+        headers = map_headers(etag_for(key, format, (lat, lng)), places_s, render_s)
+        media_type = "text/html; charset=utf-8"
+    # A revalidation that still matches skips the render entirely
+    if if_none_match(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        results = tile_map_input(places_cache.tile_center(tile), pois)
+        html, render_s = await map_cache.get_or_render(key, results, render_map)
+        body = with_origin(html, lat, lng)
+        headers = map_headers(headers["ETag"], places_s, render_s)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@router.get("/maps/cache")
+async def map_cache_status():
+    """Hit rate, size and render time of the in-memory map cache"""
+    return map_cache.stats()
@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Cosine similarity above which a past prompt counts as the same question
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+# Optional sentence-transformers model name; unset uses the built-in hashed n-gram embedding
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "")
+HASHED_EMBEDDING_DIM = 1024
+# LSH: each table hashes a vector to LSH_BITS random-hyperplane signs
+LSH_TABLES = int(os.getenv("SEMANTIC_CACHE_LSH_TABLES", "16"))
+LSH_BITS = int(os.getenv("SEMANTIC_CACHE_LSH_BITS", "8"))
+
+# Filler that changes the wording of a question but not what is asked
+STOPWORDS = {"a", "an", "the", "of", "about", "me", "tell", "please", "can", "you", "could", "i", "want", "to",
+             "know", "is", "was", "are", "some", "give", "explain", "describe"}
+
+# Words that flip or narrow the answer while barely moving the embedding
+# ("open" vs "not open on Friday", Indian vs foreign visitors): two prompts
+# only match when they use exactly the same ones, and the same numbers
+NEGATIONS = {"not", "no", "never", "without", "nor", "none", "neither", "cannot", "closed",
+             "nahi", "nahin", "नहीं", "न", "मत", "बिना", "बंद"}
+VISITOR_GROUPS = {"indian", "indians", "foreign", "foreigner", "foreigners", "domestic", "international",
+                  "nri", "saarc", "bimstec", "local", "locals", "citizen", "citizens", "national", "nationals",
+                  "child", "children", "kids", "adult", "adults", "student", "students", "senior", "seniors",
+                  "भारतीय", "विदेशी"}
+DAYS = {"monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "weekday", "weekdays",
+        "weekend", "weekends", "today", "tomorrow", "tonight", "night", "morning", "evening"}
+KEY_TERMS = NEGATIONS | VISITOR_GROUPS | DAYS
+
+def _words(text: str) -> List[str]:
+    # Letters, digits and combining marks (Indic vowel signs) make up words; anything else splits them
+    text = unicodedata.normalize("NFKC", text.casefold()).replace("n't", " not").replace("n\u2019t", " not")
+    cleaned = "".join(ch if unicodedata.category(ch)[0] in "LNM" else " " for ch in text)
+    return [word for word in cleaned.split() if word not in STOPWORDS]
+
+def key_terms(text: str) -> frozenset:
+    """The negations, visitor groups, days and numbers in `text`; matching prompts must share them exactly."""
+    return frozenset(word for word in _words(text) if word in KEY_TERMS or any(ch.isdigit() for ch in word))
+
+def _feature(token: str) -> Tuple[int, float]:
+    h = zlib.crc32(token.encode("utf-8"))
+    # The top bit picks the sign, so hash collisions cancel out rather than pile up
+    return h % HASHED_EMBEDDING_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+def hashed_embedding(text: str) -> np.ndarray:
+    """
+    Unit vector of hashed word, word-pair and character-trigram features:
+    a dependency-free CPU embedding in which rewordings, reorderings and
+    small typos of a question stay close ("taj mahal history" and
+    "history of the Taj Mahal").
+    """
+    vector = np.zeros(HASHED_EMBEDDING_DIM, dtype=np.float32)
+    words = _words(text)
+    for word in words:
+        index, sign = _feature("w:" + word)
+        vector[index] += sign
+        padded = f"<{word}>"
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for trigram in trigrams:
+            index, sign = _feature("c:" + trigram)
+            vector[index] += sign / len(trigrams)
+    for pair in zip(words, words[1:]):
+        index, sign = _feature("b:" + " ".join(pair))
+        vector[index] += 0.5 * sign
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def make_embedder(model_name: str = SEMANTIC_CACHE_MODEL) -> Tuple[Callable[[str], np.ndarray], int]:
+    """(embed, dimension): a sentence-transformers model when configured and installed, else hashed_embedding."""
+    if model_name:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("sentence-transformers not installed; semantic cache falls back to hashed embeddings")
+        else:
+            model = SentenceTransformer(model_name, device="cpu")
+            def embed(text: str) -> np.ndarray:
+                return model.encode(text, normalize_embeddings=True).astype(np.float32)
+            return embed, model.get_sentence_embedding_dimension()
+    return hashed_embedding, HASHED_EMBEDDING_DIM
+
+class SemanticCache:
+    """
+    Answers keyed by the meaning of the prompt. Prompt embeddings live in
+    one preallocated matrix; random-hyperplane LSH tables, partitioned by
+    language and the landmark the prompt names, narrow a lookup to a few
+    candidate rows. A candidate matches when its key_terms are the same and
+    its exact cosine similarity reaches the threshold: similarity alone
+    cannot tell "open on Friday" from "not open on Friday". Entries expire
+    after `ttl` seconds and the least recently used one makes room when the
+    cache is full.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: float = SEMANTIC_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, embedder=None, seed: int = 0):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed, dim = embedder or make_embedder()
+        self._planes = np.random.default_rng(seed).standard_normal((dim, LSH_TABLES * LSH_BITS)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(LSH_BITS, dtype=np.int64))
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        # slot -> entry, least recently used first
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[Tuple[str, Optional[str]], int], set]] = [{} for _ in range(LSH_TABLES)]
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.term_mismatches = 0
+        self.total_lookup_s = 0.0
+        self.hit_similarity = 0.0
+
+    def _signatures(self, vector: np.ndarray) -> List[int]:
+        bits = (vector @ self._planes > 0).reshape(LSH_TABLES, LSH_BITS)
+        return (bits @ self._bit_weights).tolist()
+
+    def _remove(self, slot: int):
+        # Caller holds the lock
+        entry = self._entries.pop(slot)
+        for table, signature in zip(self._buckets, entry["signatures"]):
+            bucket = table.get((entry["partition"], signature))
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del table[(entry["partition"], signature)]
+        self._free.append(slot)
+
+    def get(self, prompt: str, language: str, landmark_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        The cached value for the closest past prompt in `language` about the
+        same landmark (None: no landmark named), if similar enough.
+        """
+        started = time.perf_counter()
+        vector = self.embed(prompt)
+        signatures = self._signatures(vector)
+        terms = key_terms(prompt)
+        partition = (language, landmark_id)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for table, signature in zip(self._buckets, signatures):
+                candidates.update(table.get((partition, signature), ()))
+            best, best_similarity = None, self.threshold
+            if candidates:
+                slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                similarities = self._vectors[slots] @ vector
+                for slot, similarity in zip(slots.tolist(), similarities.tolist()):
+                    if self._entries[slot]["expires"] <= now:
+                        self._remove(slot)
+                        self.expirations += 1
+                    elif similarity >= best_similarity:
+                        if self._entries[slot]["terms"] != terms:
+                            self.term_mismatches += 1
+                            continue
+                        best, best_similarity = slot, similarity
+            self.total_lookup_s += time.perf_counter() - started
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.hit_similarity += best_similarity
+            self._entries.move_to_end(best)
+            return self._entries[best]["value"]
+
+    def put(self, prompt: str, language: str, value: Any, landmark_id: Optional[str] = None):
+        vector = self.embed(prompt)
+        signatures = self._signatures(vector)
+        partition = (language, landmark_id)
+        with self._lock:
+            if not self._free:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = {"partition": partition, "signatures": signatures, "terms": key_terms(prompt),
+                                   "value": value, "expires": time.time() + self.ttl}
+            for table, signature in zip(self._buckets, signatures):
+                table.setdefault((partition, signature), set()).add(slot)
+
+    def discard(self, value: Any):
+        """Drop every entry holding `value`, e.g. when its audio file has gone."""
+        with self._lock:
+            for slot in [slot for slot, entry in self._entries.items() if entry["value"] is value]:
+                self._remove(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "term_mismatches": self.term_mismatches,
+            "avg_lookup_ms": round(self.total_lookup_s * 1000 / lookups, 3) if lookups else 0.0,
+            "avg_hit_similarity": round(self.hit_similarity / self.hits, 3) if self.hits else 0.0,
+            "threshold": self.threshold,
+        }
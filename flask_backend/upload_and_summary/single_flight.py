@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+class SingleFlight:
+    """
+    Concurrent misses on the same key share one call: the first caller
+    starts `create()` as a task, and every caller, the first included,
+    awaits it through asyncio.shield. A caller that is cancelled (say its
+    client disconnected) stops waiting without cancelling the shared call,
+    which runs to completion for the others. A failure reaches every waiter
+    and is not remembered, so the next caller tries again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._in_flight
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved when no caller was left waiting
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: str, create: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result, shared); `shared` is True when another caller's call produced it."""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(create())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), shared
@@ -0,0 +1,263 @@
+import os
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .audio_store import AudioStore, audio_url, get_audio_store
+    from .single_flight import SingleFlight
+except ImportError:
+    from audio_store import AudioStore, audio_url, get_audio_store
+    from single_flight import SingleFlight
+
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", os.path.join("uploads", "cache", "summaries"))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+def normalize_landmark(name: str) -> str:
+    """'  Taj  MAHAL ' and 'taj mahal' map to the same cache entry."""
+    name = unicodedata.normalize("NFKC", name).casefold()
+    return re.sub(r"\s+", " ", name).strip()
+
+def summary_key(landmark: str, language: str, prompt_version: str) -> str:
+    raw = "\x1f".join([normalize_landmark(landmark), language.lower(), prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """
+    Persistent (landmark, language, prompt version) -> summary text + audio.
+
+    Entries are content-addressed json files `<dir>/<key[:2]>/<key>.json`
+    naming their audio by id in the AudioStore. A non-mp3 audio extension
+    is part of the key. Callers that know the gazetteer id pass it as
+    `landmark_id`, which then becomes the key, so every alias and spelling
+    shares one entry.
+    The audio is stored before the json is written, so a json file always
+    has its audio. Recency is the json's mtime (touched on hits); the least
+    recently used entries are removed once the cache exceeds `max_bytes`.
+    Concurrent requests for the same missing entry share one generation.
+    """
+
+    def __init__(self, cache_dir: str = SUMMARY_CACHE_DIR, max_bytes: int = SUMMARY_CACHE_MAX_BYTES,
+                 prompt_version: str = "1", audio_ext: str = "mp3", audio_store: Optional[AudioStore] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.prompt_version = prompt_version
+        self.audio_ext = audio_ext
+        self.audio_store = audio_store or get_audio_store()
+        # mp3 entries keep the keys they had before the format was configurable
+        self._key_version = prompt_version if audio_ext == "mp3" else f"{prompt_version}.{audio_ext}"
+        self._lock = threading.Lock()
+        self._in_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # key -> [last use, bytes on disk, audio id]
+        self._index: Dict[str, list] = {}
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    key = name[:-5]
+                    entry = self._read(key)
+                    if entry is None or "audio_id" not in entry:
+                        continue
+                    self._index[key] = [os.path.getmtime(os.path.join(root, name)),
+                                        self._entry_size(key, entry["audio_id"]), entry["audio_id"]]
+        self.total_bytes = sum(size for _, size, _ in self._index.values())
+
+    def _json_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._json_path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: str, entry: Dict[str, Any]):
+        json_path = self._json_path(key)
+        tmp_json_path = f"{json_path}.{threading.get_ident()}.tmp"
+        with open(tmp_json_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_json_path, json_path)
+
+    def _entry_size(self, key: str, audio_id: str) -> int:
+        size = 0
+        for path in (self._json_path(key), self.audio_store.path(audio_id)):
+            try:
+                size += os.path.getsize(path)
+            except (OSError, TypeError):
+                pass
+        return size
+
+    def key_for(self, landmark: str, language: str, landmark_id: Optional[str] = None) -> str:
+        return summary_key(landmark_id or landmark, language, self._key_version)
+
+    @staticmethod
+    def _result(summary: str, audio_id: str, audio_path: str) -> Dict[str, Any]:
+        return {"summary": summary, "audio_id": audio_id, "audio_url": audio_url(audio_id), "audio_file": audio_path}
+
+    def get(self, landmark: str, language: str, landmark_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = self.key_for(landmark, language, landmark_id)
+        entry = self._read(key)
+        if entry is None:
+            return None
+        audio_path = self.audio_store.path(entry.get("audio_id"))
+        if audio_path is None:
+            return None
+        json_path = self._json_path(key)
+        now = time.time()
+        try:
+            os.utime(json_path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            if key in self._index:
+                self._index[key][0] = now
+        return self._result(entry["summary"], entry["audio_id"], audio_path)
+
+    def _store(self, key: str, landmark: str, language: str, summary: str, tmp_audio_path: str,
+               landmark_id: Optional[str] = None) -> Dict[str, Any]:
+        audio_id = self.audio_store.put_file(tmp_audio_path, self.audio_ext)
+        self._write(key, {
+            "landmark": landmark,
+            "landmark_id": landmark_id,
+            "language": language,
+            "prompt_version": self.prompt_version,
+            "summary": summary,
+            "audio_id": audio_id,
+            "created_at": time.time(),
+        })
+
+        with self._lock:
+            previous = self._index.get(key)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+                if previous[2] != audio_id:
+                    self.audio_store.remove(previous[2])
+            size = self._entry_size(key, audio_id)
+            self._index[key] = [time.time(), size, audio_id]
+            self.total_bytes += size
+            self._evict_locked(keep=key)
+        return self._result(summary, audio_id, self.audio_store.path(audio_id))
+
+    def _evict_locked(self, keep: str):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, (_, size, audio_id) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self._json_path(key))
+            except OSError:
+                pass
+            # Identical audio under two keys shares one file; the other entry then misses and regenerates
+            self.audio_store.remove(audio_id)
+            del self._index[key]
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def put(self, landmark: str, language: str, summary: str, audio: bytes,
+            landmark_id: Optional[str] = None) -> Dict[str, Any]:
+        """Store an already generated summary, e.g. one assembled from a stream."""
+        key = self.key_for(landmark, language, landmark_id)
+        json_path = self._json_path(key)
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+        tmp_audio_path = f"{json_path[:-5]}.{threading.get_ident()}.{self.audio_ext}.tmp"
+        with open(tmp_audio_path, "wb") as f:
+            f.write(audio)
+        return self._store(key, landmark, language, summary, tmp_audio_path, landmark_id)
+
+    async def get_or_create(self, landmark: str, language: str,
+                            create: Callable[[str, str, str], Awaitable[str]],
+                            landmark_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Cached summary and audio for (landmark, language). On a miss,
+        `create(landmark, language, audio_path)` must write the audio to
+        `audio_path` and return the summary text; failures are not cached.
+        """
+        cached = await asyncio.to_thread(self.get, landmark, language, landmark_id)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        key = self.key_for(landmark, language, landmark_id)
+        async def fill():
+            json_path = self._json_path(key)
+            os.makedirs(os.path.dirname(json_path), exist_ok=True)
+            tmp_audio_path = f"{json_path[:-5]}.{uuid.uuid4().hex}.{self.audio_ext}.tmp"
+            try:
+                summary = await create(landmark, language, tmp_audio_path)
+                return await asyncio.to_thread(self._store, key, landmark, language, summary, tmp_audio_path,
+                                               landmark_id)
+            finally:
+                if os.path.exists(tmp_audio_path):
+                    os.remove(tmp_audio_path)
+
+        if key in self._in_flight:
+            self.hits += 1
+        else:
+            self.misses += 1
+        result, _ = await self._in_flight.run(key, fill)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "prompt_version": self.prompt_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+if __name__ == "__main__":
+    # Offline pre-warm: generate every landmark x language pair ahead of time.
+    # Run from this directory: python summary_cache.py [--languages en,hi] [--concurrency 4]
+    import argparse
+    from gazetteer import get_gazetteer
+    from summary_generator import PROMPT_VERSION, SPOKEN_LANGUAGES, request_openai_summary, synthesize_audio
+    from tts import audio_extension
+
+    parser = argparse.ArgumentParser(description="Pre-generate landmark summaries and audio")
+    parser.add_argument("--languages", default=",".join(SPOKEN_LANGUAGES))
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    cache = SummaryCache(prompt_version=PROMPT_VERSION, audio_ext=audio_extension())
+    landmarks = sorted(get_gazetteer().records, key=lambda record: record["id"])
+    languages = [code.strip() for code in args.languages.split(",") if code.strip()]
+
+    async def create(landmark, language, audio_path):
+        summary = await asyncio.to_thread(request_openai_summary, landmark, language)
+        await asyncio.to_thread(synthesize_audio, summary, language, audio_path)
+        return summary
+
+    async def prewarm():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def warm(landmark, language):
+            async with semaphore:
+                try:
+                    await cache.get_or_create(landmark["name"], language, create, landmark_id=landmark["id"])
+                    print(f"ok    {landmark['name']} [{language}]")
+                except Exception as e:
+                    print(f"error {landmark['name']} [{language}]: {e}")
+
+        await asyncio.gather(*(warm(landmark, language) for landmark in landmarks for language in languages))
+        print(cache.stats())
+
+    asyncio.run(prewarm())
@@ -1,43 +1,136 @@
 import os
+import asyncio
 import openai
-from gtts import gTTS
 # Remove import from config and get directly from env
 # from config import OPENAI_API_KEY
 from config import OPENAI_API_KEY
 
+# Imported both as part of the upload_and_summary package and as a top-level module
+try:
+    from .tts import SENTENCE_END, get_tts
+except ImportError:
+    from tts import SENTENCE_END, get_tts
+
 # Set API key from environment variable
 openai.api_key = OPENAI_API_KEY
+_async_openai = None
+
+# Bump whenever the prompt changes so cached summaries are regenerated
+PROMPT_VERSION = "1"
+
+SPOKEN_LANGUAGES = {
+    "en":"English",
+    "hi":"Hindi",
+    "kn":"Kannada",
+    "ta":"Tamil",
+    "te":"Telugu"
+}
+
+def build_summary_prompt(landmark, language='en'):
+    return f"You are a multilingual tour guide. Write a short, informative, and engaging historical and cultural summary about the landmark called '{landmark}' in {SPOKEN_LANGUAGES[language]}. Ensure the full summary fits within 750 words and is complete."
+
+def request_openai_summary(landmark, language='en'):
+    """Like get_openai_summary, but raises on failure instead of returning the error text."""
+    response = openai.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=_summary_messages(landmark, language),
+        max_tokens=750,
+        temperature=0.7
+    )
+    return response.choices[0].message.content.strip()
+
+def _summary_messages(landmark, language):
+    return [
+        {"role": "system", "content": "You are a travel guide AI."},
+        {"role": "user", "content": build_summary_prompt(landmark, language)}
+    ]
+
+def synthesize_audio(text, language="en", save_path="output_audio.mp3"):
+    """Like generate_audio_summary, but raises on failure."""
+    return get_tts().save(text, language, save_path)
 
 # Generate summary via OpenAI Chat
 def get_openai_summary(landmark, language='en'):
-    spoken_language = {
-        "en":"English",
-        "hi":"Hindi",
-        "kn":"Kannada",
-        "ta":"Tamil",
-        "te":"Telugu"
-    }
-
-    prompt = f"You are a multilingual tour guide. Write a short, informative, and engaging historical and cultural summary about the landmark called '{landmark}' in {spoken_language[language]}. Ensure the full summary fits within 750 words and is complete."
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a travel guide AI."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=750,
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
+        return request_openai_summary(landmark, language)
     except Exception as e:
         return f"OpenAI error: {e}"
 
-# Generate TTS audio using gTTS
+# Generate TTS audio with the configured engine (gTTS by default)
 def generate_audio_summary(text, language="en", save_path="output_audio.mp3"):
     try:
-        tts = gTTS(text=text, lang=language)
-        tts.save(save_path)
-        return save_path
+        return synthesize_audio(text, language, save_path)
     except Exception as e:
-        return f"TTS generation error: {e}" 
\ No newline at end of file
+        return f"TTS generation error: {e}"
+
+def synthesize_audio_bytes(text, language="en"):
+    """Speech straight to memory, for streaming audio segments."""
+    return get_tts().synthesize(text, language)
+
+async def stream_openai_summary(landmark, language='en'):
+    """Yield the summary text as OpenAI produces it."""
+    global _async_openai
+    if _async_openai is None:
+        _async_openai = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+    stream = await _async_openai.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=_summary_messages(landmark, language),
+        max_tokens=750,
+        temperature=0.7,
+        stream=True
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def split_complete_sentences(text, min_chars=40):
+    """
+    Split off the complete sentences at the start of `text`, grouping short
+    ones so each audio segment is at least `min_chars` long. Returns the
+    segments and the unfinished remainder.
+    """
+    segments = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if match.end() - start >= min_chars:
+            segments.append(text[start:match.end()].strip())
+            start = match.end()
+    return segments, text[start:]
+
+async def stream_summary(landmark, language='en', run_blocking=None):
+    """
+    Stream a summary as ("token", text) events while synthesizing audio per
+    sentence group, emitted in order as ("audio", (index, audio_bytes)) as soon
+    as each is ready. Ends with ("done", full_text). `run_blocking(fn, *args)`
+    decides where synthesis runs; the default is a thread.
+    """
+    run_blocking = run_blocking or asyncio.to_thread
+    text = []
+    pending = ""
+    audio_tasks = []
+    next_index = 0
+
+    def synthesize(segment):
+        audio_tasks.append(asyncio.ensure_future(run_blocking(synthesize_audio_bytes, segment, language)))
+
+    try:
+        async for delta in stream_openai_summary(landmark, language):
+            text.append(delta)
+            yield "token", delta
+            segments, pending = split_complete_sentences(pending + delta)
+            for segment in segments:
+                synthesize(segment)
+            while next_index < len(audio_tasks) and audio_tasks[next_index].done():
+                yield "audio", (next_index, audio_tasks[next_index].result())
+                next_index += 1
+
+        if pending.strip():
+            synthesize(pending.strip())
+        while next_index < len(audio_tasks):
+            yield "audio", (next_index, await audio_tasks[next_index])
+            next_index += 1
+    finally:
+        for task in audio_tasks[next_index:]:
+            task.cancel()
+
+    yield "done", "".join(text).strip()
@@ -0,0 +1,229 @@
+import os
+import io
+import hashlib
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# gtts (network, the default) or espeak (local and offline, needs espeak-ng or espeak on PATH)
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")
+# mp3 or opus (Ogg); anything but the engine's own output needs ffmpeg on PATH
+TTS_FORMAT = os.getenv("TTS_FORMAT", "mp3")
+# Encoder bitrate such as 32k; empty keeps gTTS's mp3 as is and uses ffmpeg's default otherwise
+TTS_BITRATE = os.getenv("TTS_BITRATE", "")
+# Segments synthesized at once; gTTS is rate limited, so keep this modest
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "60"))
+
+AUDIO_FORMATS = {
+    # format: (file extension, media type, ffmpeg output arguments)
+    "mp3": ("mp3", "audio/mpeg", ["-c:a", "libmp3lame", "-f", "mp3"]),
+    "opus": ("opus", "audio/ogg", ["-c:a", "libopus", "-application", "voip", "-f", "ogg"]),
+}
+
+class TTSError(Exception):
+    pass
+
+class GTTSEngine:
+    """Google Translate's TTS via gTTS. `voice` is the accent's top-level domain (com, co.in...)."""
+    name = "gtts"
+    native_format = "mp3"
+    # gTTS sends one request per 100 characters, one after another
+    max_chars = 100
+    default_voice = "com"
+
+    def synthesize(self, text: str, language: str, voice: str) -> bytes:
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, tld=voice).write_to_fp(buffer)
+        return buffer.getvalue()
+
+class EspeakEngine:
+    """espeak-ng (or espeak) on this machine: no network, robotic but instant. `voice` is an espeak voice name."""
+    name = "espeak"
+    native_format = "wav"
+    max_chars = 1000
+    default_voice = None
+
+    def __init__(self):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def synthesize(self, text: str, language: str, voice: Optional[str]) -> bytes:
+        if self.binary is None:
+            raise TTSError("espeak-ng is not installed")
+        # A file rather than --stdout, whose WAV header carries no length
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            subprocess.run([self.binary, "-v", voice or language, "-w", path, text],
+                           check=True, capture_output=True, timeout=TTS_TIMEOUT)
+            with open(path, "rb") as f:
+                return f.read()
+        except subprocess.CalledProcessError as e:
+            raise TTSError(f"espeak failed: {e.stderr.decode(errors='replace').strip()}")
+        finally:
+            os.remove(path)
+
+ENGINES = {"gtts": GTTSEngine, "espeak": EspeakEngine}
+
+# Sentence ends: Latin punctuation and the Devanagari danda, plus closing quotes/brackets
+SENTENCE_END = re.compile(r'[.!?\u0964\u0965]+["\')\]\u201d\u2019]*\s+')
+
+def split_for_speech(text: str, max_chars: int) -> List[str]:
+    """
+    Sentences of `text`, with any longer than `max_chars` cut at a comma
+    or, failing that, the last space that fits. Each piece is synthesized
+    (and cached) alone, so a sentence repeated in another text costs
+    nothing the second time.
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    sentences.append(text[start:])
+
+    pieces = []
+    for sentence in sentences:
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(", ", 0, max_chars + 1) + 1
+            if cut < max_chars // 2:
+                cut = sentence.rfind(" ", 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+def join_audio(segments: List[bytes], native_format: str) -> bytes:
+    if native_format == "mp3":
+        # MP3 is a sequence of self-contained frames; gTTS itself concatenates this way
+        return b"".join(segments)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as joined:
+        for index, segment in enumerate(segments):
+            with wave.open(io.BytesIO(segment), "rb") as part:
+                if index == 0:
+                    joined.setparams(part.getparams())
+                joined.writeframes(part.readframes(part.getnframes()))
+    return out.getvalue()
+
+def transcode(audio: bytes, source_format: str, fmt: str, bitrate: str = "") -> bytes:
+    """Re-encode with ffmpeg; a no-op when the engine already produced the requested mp3."""
+    if fmt == source_format and not bitrate:
+        return audio
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise TTSError(f"ffmpeg is required to produce {fmt} from {source_format}")
+    args = [ffmpeg, "-loglevel", "error", "-f", source_format, "-i", "pipe:0", "-ac", "1"]
+    if bitrate:
+        args += ["-b:a", bitrate]
+    result = subprocess.run(args + AUDIO_FORMATS[fmt][2] + ["pipe:1"], input=audio, capture_output=True,
+                            timeout=TTS_TIMEOUT)
+    if result.returncode != 0:
+        raise TTSError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+def audio_extension(fmt: str = TTS_FORMAT) -> str:
+    return AUDIO_FORMATS[fmt][0]
+
+def audio_media_type(fmt: str = TTS_FORMAT) -> str:
+    return AUDIO_FORMATS[fmt][1]
+
+class TextToSpeech:
+    """
+    Splits text into sentences, synthesizes them in parallel with one
+    engine, joins them in the engine's own format and encodes the result
+    once. Segments are cached in memory by (engine, voice, language, text),
+    LRU-bounded by bytes, so phrases shared between texts are synthesized
+    once.
+    """
+
+    def __init__(self, engine: str = TTS_ENGINE, fmt: str = TTS_FORMAT, bitrate: str = TTS_BITRATE,
+                 workers: int = TTS_WORKERS, cache_max_bytes: int = TTS_CACHE_MAX_BYTES):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown TTS engine {engine!r}, expected one of {', '.join(ENGINES)}")
+        if fmt not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown audio format {fmt!r}, expected one of {', '.join(AUDIO_FORMATS)}")
+        self.engine = ENGINES[engine]()
+        self.fmt = fmt
+        self.bitrate = bitrate
+        self.cache_max_bytes = cache_max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._segments: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _segment(self, text: str, language: str, voice: Optional[str]) -> bytes:
+        key = hashlib.sha256("\x1f".join([self.engine.name, voice or "", language, text]).encode("utf-8")).hexdigest()
+        with self._lock:
+            audio = self._segments.get(key)
+            if audio is not None:
+                self._segments.move_to_end(key)
+                self.hits += 1
+                return audio
+            self.misses += 1
+        audio = self.engine.synthesize(text, language, voice)
+        with self._lock:
+            if key not in self._segments:
+                self._segments[key] = audio
+                self._cache_bytes += len(audio)
+            while self._cache_bytes > self.cache_max_bytes and self._segments:
+                _, evicted = self._segments.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+        return audio
+
+    def synthesize(self, text: str, language: str = "en", voice: Optional[str] = None,
+                   fmt: Optional[str] = None, bitrate: Optional[str] = None) -> bytes:
+        """Speech for `text` as `fmt` (default TTS_FORMAT) bytes."""
+        voice = voice or self.engine.default_voice
+        pieces = split_for_speech(text, self.engine.max_chars)
+        if not pieces:
+            raise TTSError("Nothing to synthesize")
+        segments = list(self._executor.map(lambda piece: self._segment(piece, language, voice), pieces))
+        audio = join_audio(segments, self.engine.native_format)
+        return transcode(audio, self.engine.native_format, fmt or self.fmt,
+                         self.bitrate if bitrate is None else bitrate)
+
+    def save(self, text: str, language: str, path: str, **kwargs) -> str:
+        audio = self.synthesize(text, language, **kwargs)
+        with open(path, "wb") as f:
+            f.write(audio)
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "engine": self.engine.name,
+            "format": self.fmt,
+            "bitrate": self.bitrate or "default",
+            "cached_segments": len(self._segments),
+            "cache_bytes": self._cache_bytes,
+            "segment_hits": self.hits,
+            "segment_misses": self.misses,
+            "segment_hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+_tts: Optional[TextToSpeech] = None
+_tts_lock = threading.Lock()
+
+def get_tts() -> TextToSpeech:
+    """Process-wide TextToSpeech configured from the TTS_* environment variables."""
+    global _tts
+    if _tts is None:
+        with _tts_lock:
+            if _tts is None:
+                _tts = TextToSpeech()
+    return _tts
@@ -0,0 +1,126 @@
+import os
+import re
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+# Largest accepted image; bigger uploads are cut off while still streaming
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+# Keep a copy of every upload on disk (written after the response is sent)
+UPLOAD_PERSIST = os.getenv("UPLOAD_PERSIST", "false").lower() in ("1", "true", "yes")
+
+# Room for multipart boundaries and part headers on top of the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadError(Exception):
+    pass
+
+class UploadTooLarge(UploadError):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+async def read_upload(request, field_name: str = "image", max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[str, bytes]:
+    """
+    Read one uploaded file from the request body straight into memory.
+
+    Accepts multipart/form-data (the `field_name` part) or a raw image body.
+    The body is consumed exactly once, never spooled to a temp file, and the
+    request is rejected as soon as it is known to exceed `max_bytes`: from
+    Content-Length up front, otherwise while the bytes are still arriving.
+    Returns (client filename, file bytes).
+    """
+    # python-multipart ships with FastAPI's form support; the Flask app never gets here
+    try:
+        from python_multipart import MultipartParser, parse_options_header
+    except ImportError:  # python-multipart < 0.0.13
+        from multipart.multipart import MultipartParser, parse_options_header
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + _MULTIPART_OVERHEAD:
+        raise UploadTooLarge(max_bytes)
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        chunks: List[bytes] = []
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            chunks.append(chunk)
+        if not size:
+            raise UploadError("Empty upload")
+        return request.headers.get("x-filename", "upload"), b"".join(chunks)
+
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadError("Missing multipart boundary")
+
+    state: Dict[str, object] = {"header_field": b"", "header_value": b"", "headers": {}, "in_field": False}
+    found: Dict[str, object] = {"filename": None, "chunks": [], "size": 0, "done": False}
+
+    def on_part_begin():
+        state["headers"] = {}
+        state["in_field"] = False
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if name == field_name and not found["done"]:
+            state["in_field"] = True
+            found["filename"] = disposition.get(b"filename", b"upload").decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if state["in_field"]:
+            found["size"] += end - start
+            if found["size"] > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            found["chunks"].append(bytes(data[start:end]))
+
+    def on_part_end():
+        if state["in_field"]:
+            found["done"] = True
+            state["in_field"] = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    total = 0
+    async for chunk in request.stream():
+        total += len(chunk)
+        if total > max_bytes + _MULTIPART_OVERHEAD:
+            raise UploadTooLarge(max_bytes)
+        parser.write(chunk)
+    parser.finalize()
+
+    if not found["done"] or not found["size"]:
+        raise UploadError(f"No '{field_name}' file in the upload")
+    return found["filename"], b"".join(found["chunks"])
+
+def unique_upload_name(filename: Optional[str]) -> str:
+    """Random prefix + sanitized basename, so concurrent uploads never clobber each other."""
+    base = os.path.basename((filename or "upload").replace("\\", "/"))
+    base = re.sub(r"[^A-Za-z0-9._-]+", "_", base).strip("._") or "upload"
+    return f"{uuid.uuid4().hex}_{base[-100:]}"
+
+def persist_upload(data: bytes, store, filename: Optional[str]) -> str:
+    """Keep an uploaded photo in `store` (the "images" ArtifactStore), where its retention policy applies."""
+    return store.write(unique_upload_name(filename), data)
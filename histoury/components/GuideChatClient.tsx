@@ -25,6 +25,7 @@ export default function GuideChatClient() {
   const [chatHistory, setChatHistory] = useState<ChatEntry[]>([]);
   const [isListening, setIsListening] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   // 🎤 Handle speech-to-text
   const handleVoiceInput = () => {
@@ -63,10 +64,16 @@ export default function GuideChatClient() {
       const res = await fetch("http://localhost:8000/api/ask", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ prompt: query, language: selectedLanguage }),
+        body: JSON.stringify({
+          prompt: query,
+          language: selectedLanguage,
+          ...(sessionId ? { session_id: sessionId } : {}),
+        }),
       });
 
       const data = await res.json();
+      // 🧵 Keep the conversation going in the same backend session
+      if (data.session_id) setSessionId(data.session_id);
       const newEntry: ChatEntry = {
         query,
         response: data.text,
@@ -39,7 +39,7 @@ export default function StoryNarrator({
       });
       const data = await res.json();
       setStory(data.summary || "No summary returned.");
-      setAudioPath(data.audio_file || null);
+      setAudioPath(data.audio_url || null);
     } catch (err) {
       console.error(err);
       setStory("Failed to fetch summary.");
@@ -112,9 +112,7 @@ export default function StoryNarrator({
           <audio
             ref={audioRef}
             controls
-            src={`http://localhost:8000/download_audio/?path=${encodeURIComponent(
-              audioPath
-            )}`}
+            src={`http://localhost:8000${audioPath}`}
             className="w-full max-w-md mx-auto"
           />
 